@@ -0,0 +1,311 @@
+"""
+AfroVending - Admission Control
+Per-client rate limiting, per-group concurrency caps and priority load shedding
+
+Every request is mapped to a route class (checkout, webhooks, auth, shipping,
+search, admin, stream, browse). Each class has:
+
+    rate / burst     token bucket per client (user id from a valid JWT, else IP)
+    max_concurrent   in-flight cap for the whole group in this worker
+    shed_at          fraction of ADMISSION_MAX_INFLIGHT above which the class
+                     is refused so higher-priority traffic keeps its capacity
+
+Rate limited requests get 429, shed or over-cap requests get 503, both with
+Retry-After and without touching the route. Checkout and webhooks are never
+shed and webhooks are never rate limited.
+
+Token buckets live in memory per worker. Set RATE_LIMIT_REDIS_URL (and
+install `redis`) to share them between workers; concurrency caps stay local.
+Set ADMISSION_CONTROL_ENABLED=false for test runs that log in repeatedly
+from one IP.
+
+Anonymous clients are keyed by the socket peer address. Behind proxies, set
+TRUSTED_PROXY_COUNT to the number of proxies that append to X-Forwarded-For;
+the hop that many entries from the right is used, since everything to its
+left is whatever the client sent. The per-IP limits (and the `auth` class,
+always keyed by IP) assume this is set: with the default of 0 behind a load
+balancer every anonymous visitor shares the balancer's bucket. app.yaml sets
+it to 1 for the App Platform load balancer.
+"""
+from dataclasses import dataclass
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from typing import Optional
+import jwt
+import logging
+import math
+import os
+import time
+
+from auth import JWT_SECRET, JWT_ALGORITHM
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+ADMISSION_CONTROL_ENABLED = os.environ.get("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_INFLIGHT = int(os.environ.get("ADMISSION_MAX_INFLIGHT", "256"))
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", "")
+TRUSTED_PROXY_COUNT = int(os.environ.get("TRUSTED_PROXY_COUNT", "0"))
+
+EXEMPT_PATHS = ("/health",)
+
+
+@dataclass(frozen=True)
+class RouteClass:
+    name: str
+    rate: Optional[float]             # tokens per second; None disables rate limiting
+    burst: int = 0
+    max_concurrent: Optional[int] = None
+    shed_at: Optional[float] = None   # None: never shed
+    key_by_ip: bool = False           # ignore the user, e.g. for login attempts
+    track_inflight: bool = True       # False for long-lived streams
+
+
+ROUTE_CLASSES = {
+    "webhooks": RouteClass("webhooks", rate=None),
+    "checkout": RouteClass("checkout", rate=2.0, burst=20),
+    "auth": RouteClass("auth", rate=0.2, burst=10, max_concurrent=8, shed_at=0.9, key_by_ip=True),
+    "shipping": RouteClass("shipping", rate=1.0, burst=10, max_concurrent=10, shed_at=0.8),
+    "search": RouteClass("search", rate=5.0, burst=20, max_concurrent=16, shed_at=0.7),
+    "admin": RouteClass("admin", rate=5.0, burst=20, max_concurrent=6, shed_at=0.6),
+    "stream": RouteClass("stream", rate=0.5, burst=5, track_inflight=False),
+    "browse": RouteClass("browse", rate=20.0, burst=60, shed_at=0.8),
+}
+
+# (path prefix, class); first match wins, paths are compared without the /api prefix
+PATH_CLASSES = [
+    ("/webhooks/", "webhooks"),
+    ("/checkout/webhook", "webhooks"),
+    ("/checkout/", "checkout"),
+    ("/auth/login", "auth"),
+    ("/auth/register", "auth"),
+    ("/auth/forgot-password", "auth"),
+    ("/auth/reset-password", "auth"),
+    ("/auth/google/session", "auth"),
+    ("/shipping/rates", "shipping"),
+    ("/shipping/verify-address", "shipping"),
+    ("/shipping/purchase", "shipping"),
+    ("/products/facets", "search"),
+    ("/admin/", "admin"),
+]
+
+
+def classify(path: str, query_string: bytes = b"") -> RouteClass:
+    """Route class for a request path"""
+    if path.startswith("/api/"):
+        path = path[4:]
+    if path.startswith("/notifications/") and path.endswith("/stream"):
+        return ROUTE_CLASSES["stream"]
+    if path.startswith("/admin/export/") or path.endswith("/export"):
+        return ROUTE_CLASSES["stream"]  # long downloads: rate limited, not counted in flight
+    searching = query_string.startswith(b"search=") or b"&search=" in query_string
+    if path.rstrip("/") in ("/products", "/services") and searching:
+        return ROUTE_CLASSES["search"]
+    for prefix, name in PATH_CLASSES:
+        if path.startswith(prefix):
+            return ROUTE_CLASSES[name]
+    return ROUTE_CLASSES["browse"]
+
+
+def client_key(headers: Headers, scope, route_class: RouteClass) -> str:
+    """User id from a valid token, falling back to the client IP"""
+    if not route_class.key_by_ip:
+        token = None
+        authorization = headers.get("authorization", "")
+        if authorization.startswith("Bearer "):
+            token = authorization[7:]
+        else:
+            for part in headers.get("cookie", "").split(";"):
+                name, _, value = part.strip().partition("=")
+                if name == "access_token":
+                    token = value
+        if token:
+            try:
+                user_id = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM]).get("sub")
+                if user_id:
+                    return f"user:{user_id}"
+            except jwt.InvalidTokenError:
+                pass
+
+    # Only hops appended by our own proxies can be trusted; the leftmost
+    # entries are client controlled
+    if TRUSTED_PROXY_COUNT:
+        hops = [hop.strip() for hop in headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if len(hops) >= TRUSTED_PROXY_COUNT:
+            return f"ip:{hops[-TRUSTED_PROXY_COUNT]}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+# ==================== TOKEN BUCKET STORES ====================
+
+class MemoryBucketStore:
+    """Token buckets in this worker's memory"""
+
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        self._buckets = {}
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """Take a token; returns 0 when allowed, else seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+
+        if len(self._buckets) > self.MAX_KEYS:
+            self._prune(now)
+        return wait
+
+    def _prune(self, now: float):
+        # Buckets idle for a minute have refilled for every class; forgetting them is lossless
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 60}
+
+
+class RedisBucketStore:
+    """Token buckets shared by all workers through Redis"""
+
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local tokens = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str):
+        self._redis = aioredis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+        self._fallback = MemoryBucketStore()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        try:
+            wait = await self._script(keys=[f"ratelimit:{key}"], args=[rate, burst, time.time()])
+            return float(wait)
+        except Exception as e:
+            # Keep limiting locally rather than failing requests when Redis is down
+            logger.warning(f"Rate limit store unavailable, using local buckets: {e}")
+            return await self._fallback.take(key, rate, burst)
+
+
+def create_bucket_store():
+    if RATE_LIMIT_REDIS_URL:
+        if aioredis is None:
+            logger.warning("RATE_LIMIT_REDIS_URL is set but redis is not installed; using local buckets")
+        else:
+            return RedisBucketStore(RATE_LIMIT_REDIS_URL)
+    return MemoryBucketStore()
+
+
+# ==================== CONTROLLER ====================
+
+class AdmissionController:
+    """Decides whether a request may run; keeps in-flight counts and stats"""
+
+    def __init__(self, store=None, max_inflight: int = ADMISSION_MAX_INFLIGHT):
+        self.store = store if store is not None else create_bucket_store()
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.group_inflight = {name: 0 for name in ROUTE_CLASSES}
+        self.counters = {name: {"admitted": 0, "rate_limited": 0, "shed": 0} for name in ROUTE_CLASSES}
+
+    async def admit(self, route_class: RouteClass, key: str):
+        """None when admitted (caller must release()), else (status, retry_after, detail)"""
+        counters = self.counters[route_class.name]
+
+        if route_class.track_inflight:
+            if route_class.shed_at is not None and self.inflight >= self.max_inflight * route_class.shed_at:
+                counters["shed"] += 1
+                return 503, 1, "Server busy, please retry shortly"
+            if (route_class.max_concurrent is not None
+                    and self.group_inflight[route_class.name] >= route_class.max_concurrent):
+                counters["shed"] += 1
+                return 503, 1, "Too many concurrent requests for this operation"
+
+        if route_class.rate is not None:
+            wait = await self.store.take(f"{route_class.name}:{key}", route_class.rate, route_class.burst)
+            if wait > 0:
+                counters["rate_limited"] += 1
+                return 429, max(1, math.ceil(wait)), "Too many requests"
+
+        counters["admitted"] += 1
+        if route_class.track_inflight:
+            self.inflight += 1
+            self.group_inflight[route_class.name] += 1
+        return None
+
+    def release(self, route_class: RouteClass):
+        if route_class.track_inflight:
+            self.inflight -= 1
+            self.group_inflight[route_class.name] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ADMISSION_CONTROL_ENABLED,
+            "store": type(self.store).__name__,
+            "max_inflight": self.max_inflight,
+            "inflight": self.inflight,
+            "classes": {
+                name: {
+                    **self.counters[name],
+                    "inflight": self.group_inflight[name],
+                    "rate_per_second": rc.rate,
+                    "burst": rc.burst,
+                    "max_concurrent": rc.max_concurrent,
+                    "shed_at": rc.shed_at,
+                }
+                for name, rc in ROUTE_CLASSES.items()
+            },
+        }
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the admission controller to HTTP requests"""
+
+    def __init__(self, app, controller: AdmissionController = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not ADMISSION_CONTROL_ENABLED
+                or scope["method"] == "OPTIONS" or scope["path"].removeprefix("/api") in EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify(scope["path"], scope.get("query_string", b""))
+        key = client_key(Headers(scope=scope), scope, route_class)
+        rejection = await self.controller.admit(route_class, key)
+
+        if rejection:
+            status_code, retry_after, detail = rejection
+            response = JSONResponse(
+                {"detail": detail},
+                status_code=status_code,
+                headers={"Retry-After": str(retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
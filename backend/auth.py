@@ -36,13 +36,18 @@ def create_access_token(data: dict) -> str:
 
 async def get_current_user(request: Request) -> dict:
     """Extract and validate the current user from JWT token"""
-    db = get_db()
     auth_header = request.headers.get("Authorization")
     token = request.cookies.get("access_token")
     
     if auth_header and auth_header.startswith("Bearer "):
         token = auth_header.split(" ")[1]
     
+    return await get_user_from_token(token)
+
+
+async def get_user_from_token(token: str) -> dict:
+    """Validate a raw JWT and load its user (used where headers can't be set, e.g. EventSource)"""
+    db = get_db()
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -0,0 +1,149 @@
+"""
+AfroVending - Date Bucket Benchmark
+Daily order/revenue buckets over ISO-string vs native BSON `created_at`
+
+Usage:
+    python benchmark_date_buckets.py                 # 200k orders, 10 runs per case
+    python benchmark_date_buckets.py --orders 1000000 --runs 20 --keep
+
+Cases (30-day window, as in the admin analytics chart):
+    per-day queries     the old chart: count + revenue query per day, string ranges
+    string $substr      one $group keyed on the first 10 characters of the string
+    dual $toDate        one $group via date_value() - what the API runs during rollout
+    native $dateTrunc   one $group on BSON dates (MongoDB 5.0+)
+
+Orders go to a separate `<DB_NAME>_bench` database (dropped at the end unless
+--keep is given): `orders_iso` stores strings, `orders_native` BSON dates.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from datetime import datetime, timezone, timedelta
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+load_dotenv()
+
+from datetimes import date_value
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+BENCH_DB_NAME = os.environ.get('DB_NAME', 'afrovending_db') + "_bench"
+
+DAYS = 30
+
+
+async def seed(db, total: int, batch_size: int = 10000):
+    now = datetime.now(timezone.utc)
+    for start in range(0, total, batch_size):
+        docs = []
+        for _ in range(min(batch_size, total - start)):
+            created = now - timedelta(seconds=random.randrange(365 * 86400))
+            docs.append({
+                "total": round(random.lognormvariate(3.5, 0.8), 2),
+                "payment_status": "paid" if random.random() < 0.8 else "pending",
+                "created_at": created,
+            })
+        await db.orders_native.insert_many(docs)
+        await db.orders_iso.insert_many([
+            {**{k: v for k, v in d.items() if k != "_id"}, "created_at": d["created_at"].isoformat()} for d in docs
+        ])
+    await db.orders_native.create_index([("created_at", -1)])
+    await db.orders_iso.create_index([("created_at", -1)])
+
+
+def bucket_group(key) -> dict:
+    return {"$group": {
+        "_id": key,
+        "orders": {"$sum": 1},
+        "revenue": {"$sum": {"$cond": [{"$eq": ["$payment_status", "paid"]}, "$total", 0]}}
+    }}
+
+
+async def per_day_queries(db, start: datetime, end: datetime):
+    rows = []
+    for i in range(DAYS):
+        day_start, day_end = start + timedelta(days=i), start + timedelta(days=i + 1)
+        match = {"created_at": {"$gte": day_start.isoformat(), "$lt": day_end.isoformat()}}
+        orders = await db.orders_iso.count_documents(match)
+        revenue = await db.orders_iso.aggregate([
+            {"$match": {**match, "payment_status": "paid"}},
+            {"$group": {"_id": None, "total": {"$sum": "$total"}}}
+        ]).to_list(1)
+        rows.append((orders, revenue))
+    return rows
+
+
+async def string_substr(db, start: datetime, end: datetime):
+    return await db.orders_iso.aggregate([
+        {"$match": {"created_at": {"$gte": start.isoformat(), "$lt": end.isoformat()}}},
+        bucket_group({"$substrBytes": ["$created_at", 0, 10]})
+    ]).to_list(DAYS + 1)
+
+
+async def dual_to_date(db, start: datetime, end: datetime):
+    return await db.orders_iso.aggregate([
+        {"$match": {"created_at": {"$gte": start.isoformat(), "$lt": end.isoformat()}}},
+        bucket_group({"$dateToString": {"format": "%Y-%m-%d", "date": date_value("created_at")}})
+    ]).to_list(DAYS + 1)
+
+
+async def native_date_trunc(db, start: datetime, end: datetime):
+    return await db.orders_native.aggregate([
+        {"$match": {"created_at": {"$gte": start, "$lt": end}}},
+        bucket_group({"$dateTrunc": {"date": "$created_at", "unit": "day"}})
+    ]).to_list(DAYS + 1)
+
+
+CASES = {
+    "per-day queries": per_day_queries,
+    "string $substr": string_substr,
+    "dual $toDate": dual_to_date,
+    "native $dateTrunc": native_date_trunc,
+}
+
+
+async def run(orders: int, runs: int, keep: bool):
+    client = AsyncIOMotorClient(MONGO_URL, tz_aware=True)
+    db = client[BENCH_DB_NAME]
+
+    if await db.orders_native.estimated_document_count() != orders:
+        print(f"Seeding {orders:,} orders (x2) into {BENCH_DB_NAME}...")
+        await client.drop_database(BENCH_DB_NAME)
+        started = time.perf_counter()
+        await seed(db, orders)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=DAYS)
+
+    print(f"\n{'case':<24}{'median ms':>12}{'p95 ms':>12}")
+    for name, case in CASES.items():
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            try:
+                await case(db, start, end)
+            except Exception as e:
+                print(f"{name:<24}{'n/a':>12}  ({e})")
+                break
+            timings.append((time.perf_counter() - started) * 1000)
+        else:
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{name:<24}{statistics.median(timings):>12.1f}{p95:>12.1f}")
+
+    if not keep:
+        await client.drop_database(BENCH_DB_NAME)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark date-bucketed order aggregations")
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark database for the next run")
+    args = parser.parse_args()
+    asyncio.run(run(args.orders, args.runs, args.keep))
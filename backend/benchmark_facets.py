@@ -0,0 +1,104 @@
+"""
+AfroVending - Facet Benchmark
+Times /products/facets style queries against a large synthetic catalogue
+
+Usage:
+    python benchmark_facets.py                 # 500k products, 20 runs per case
+    python benchmark_facets.py --products 100000 --runs 50 --keep
+
+Products are written to a separate `<DB_NAME>_bench` database (dropped at the
+end unless --keep is given) so the benchmark never touches real data.
+"""
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import uuid
+
+load_dotenv()
+
+from database import INDEXES
+from routes.products import build_product_query, get_product_facets
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+BENCH_DB_NAME = os.environ.get('DB_NAME', 'afrovending_db') + "_bench"
+
+CATEGORIES = [f"bench-category-{i}" for i in range(12)]
+COUNTRIES = ["Nigeria", "Ghana", "Kenya", "South Africa", "Ethiopia", "Senegal", "Morocco", "Egypt"]
+
+CASES = {
+    "all products": {},
+    "category": {"category_id": CATEGORIES[0]},
+    "country": {"country": "Ghana"},
+    "price range": {"min_price": 25, "max_price": 250},
+    "category + country + price": {"category_id": CATEGORIES[1], "country": "Kenya", "max_price": 100},
+    "search": {"search": "kente"},
+}
+
+
+async def seed(db, total: int, batch_size: int = 10000):
+    await db.categories.insert_many([{"id": c, "name": c.replace("-", " ").title()} for c in CATEGORIES])
+    words = ["kente", "ankara", "shea", "beaded", "woven", "carved", "coffee", "spice", "leather", "basket"]
+    for start in range(0, total, batch_size):
+        await db.products.insert_many([
+            {
+                "id": str(uuid.uuid4()),
+                "name": f"{random.choice(words).title()} {random.choice(words)} #{start + i}",
+                "description": " ".join(random.choices(words, k=12)),
+                "tags": random.sample(words, 3),
+                "category_id": random.choice(CATEGORIES),
+                "vendor_id": f"bench-vendor-{random.randrange(2000)}",
+                "vendor_country": random.choice(COUNTRIES),
+                "vendor_is_verified": random.random() < 0.3,
+                "price": round(random.lognormvariate(3.8, 0.9), 2),
+                "average_rating": round(random.uniform(0, 5), 1),
+                "sales_count": random.randrange(500),
+                "is_active": random.random() < 0.95,
+                "created_at": f"2026-01-01T00:00:{start + i:09d}"
+            }
+            for i in range(min(batch_size, total - start))
+        ])
+    for collection, keys, options in INDEXES:
+        if collection == "products":
+            await db[collection].create_index(keys, **options)
+
+
+async def run(products: int, runs: int, keep: bool):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[BENCH_DB_NAME]
+
+    if await db.products.estimated_document_count() != products:
+        print(f"Seeding {products:,} products into {BENCH_DB_NAME}...")
+        await client.drop_database(BENCH_DB_NAME)
+        started = time.perf_counter()
+        await seed(db, products)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    print(f"\n{'case':<30}{'median ms':>12}{'p95 ms':>12}{'total':>12}")
+    for name, params in CASES.items():
+        query = build_product_query(**params)
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            result = await get_product_facets(db, query, "newest", 0, 20)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name:<30}{statistics.median(timings):>12.1f}{p95:>12.1f}{result['total']:>12,}")
+
+    if not keep:
+        await client.drop_database(BENCH_DB_NAME)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark product facet aggregation")
+    parser.add_argument("--products", type=int, default=500000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark database for the next run")
+    args = parser.parse_args()
+    asyncio.run(run(args.products, args.runs, args.keep))
@@ -0,0 +1,444 @@
+"""
+AfroVending - Load Test
+Scripted user journeys against the app in-process, with latency percentiles per endpoint
+
+Usage:
+    python benchmark_load.py                                     # seed defaults, ramp 10,25,50 users
+    python benchmark_load.py --ramp 10,50,100 --duration 60 --products 50000 --orders 200000
+    python benchmark_load.py --journeys browse,checkout --json results/$(git rev-parse --short HEAD).json
+    python benchmark_load.py --compare results/before.json results/after.json
+
+The app is imported with DB_NAME pointed at `<DB_NAME>_loadtest` on the
+local mongod (MONGO_URL) and driven through httpx's ASGI transport: the full
+middleware stack, lifespan, webhook worker and scheduler run, but there is
+no network or uvicorn in the measurement. Data is generated by
+synthetic_data.py (Zipfian popularity, multi-vendor orders, review skew), kept
+between runs and only regenerated when the volumes change (or with --reseed).
+
+External services are replaced by local stand-ins before the app is imported:
+
+    Stripe     Checkout sessions are created locally; the checkout journey
+               posts the `checkout.session.completed` webhook itself
+    SendGrid   SendGridAPIClient.send counts the message and returns 202
+    EasyPost   shipment.create returns fixed carrier rates
+
+Journeys (weights with --mix browse=70,checkout=15,vendor=10,admin=5):
+
+    browse     homepage bundle -> categories -> listing -> facets -> PDP -> reviews -> add to cart
+    checkout   add to cart -> cart -> shipping rates -> Stripe checkout -> webhook -> order
+    vendor     vendor profile -> products -> orders -> earnings -> low stock
+    admin      stats -> analytics -> orders -> notification center
+
+Each ramp stage runs `concurrency` virtual users for --duration seconds and
+reports p50/p95/p99 latency, throughput and errors per endpoint. --json
+writes the report with the commit it ran on; --compare diffs two reports.
+"""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+import uuid
+
+load_dotenv()
+
+BENCH_DB_NAME = os.environ.get("DB_NAME", "afrovending_db") + "_loadtest"
+
+# Seeded through synthetic_data, smaller than its production-sized defaults
+LOAD_VOLUMES = {"users": 20000, "vendors": 200, "products": 20000, "carts": 2000,
+                "orders": 50000, "reviews": 20000, "notifications": 50000}
+
+DEFAULT_MIX = {"browse": 70, "checkout": 15, "vendor": 10, "admin": 5}
+
+
+SHIPPING_ADDRESS = {
+    "name": "Load Test", "street1": "1 Bench Street", "city": "Austin", "state": "TX",
+    "zip": "78701", "country": "US"
+}
+
+
+# ==================== STAND-INS ====================
+
+class StripeStandIn:
+    """Checkout sessions kept in memory; webhooks are built from them"""
+
+    def __init__(self):
+        self.sessions = {}
+
+    def create_session(self, **kwargs):
+        session_id = f"cs_bench_{uuid.uuid4().hex}"
+        self.sessions[session_id] = kwargs.get("metadata", {})
+        return SimpleNamespace(id=session_id, url=f"http://stripe.local/pay/{session_id}", payment_status="unpaid")
+
+    def retrieve_session(self, session_id, **kwargs):
+        return SimpleNamespace(id=session_id, payment_status="paid", metadata=self.sessions.get(session_id, {}))
+
+    def completed_event(self, session_id: str) -> dict:
+        return {
+            "id": f"evt_bench_{uuid.uuid4().hex}",
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "id": session_id,
+                "payment_status": "paid",
+                "payment_intent": f"pi_bench_{uuid.uuid4().hex[:16]}",
+                "metadata": self.sessions.get(session_id, {}),
+            }},
+        }
+
+    def install(self):
+        import stripe
+        stripe.checkout.Session.create = self.create_session
+        stripe.checkout.Session.retrieve = self.retrieve_session
+
+
+class SendGridStandIn:
+    """Drop-in for SendGridAPIClient"""
+    sent = 0
+
+    def __init__(self, api_key=None):
+        pass
+
+    def send(self, message):
+        SendGridStandIn.sent += 1
+        return SimpleNamespace(status_code=202)
+
+    @classmethod
+    def install(cls):
+        import email_service as email_module
+        email_module.SendGridAPIClient = cls
+        email_module.email_service.api_key = "bench"
+
+
+class EasyPostStandIn:
+    """Drop-in for the EasyPost client used by routes.shipping"""
+
+    RATES = [("USPS", "Priority", "12.40", 3), ("UPS", "Ground", "15.90", 5), ("DHL", "Express", "41.00", 2)]
+
+    def __init__(self):
+        self.shipment = SimpleNamespace(create=self._create_shipment)
+        self.address = SimpleNamespace(create_and_verify=lambda **kw: SimpleNamespace(id="adr_bench", **kw))
+
+    def _create_shipment(self, **kwargs):
+        return SimpleNamespace(id=f"shp_bench_{uuid.uuid4().hex[:12]}", rates=[
+            SimpleNamespace(id=f"rate_{carrier.lower()}", carrier=carrier, service=service, rate=rate,
+                            list_rate=None, retail_rate=None, currency="USD", delivery_days=days)
+            for carrier, service, rate, days in self.RATES
+        ])
+
+    def install(self):
+        from routes import shipping
+        shipping.get_easypost_client = lambda: self
+
+
+def prepare_environment(admission: bool):
+    """Point the app at the load test database; must run before the app is imported"""
+    os.environ["DB_NAME"] = BENCH_DB_NAME
+    os.environ["STRIPE_WEBHOOK_SECRET"] = ""
+    os.environ["ADMISSION_CONTROL_ENABLED"] = "true" if admission else "false"
+    # Virtual users send X-Forwarded-For as a single load balancer would append it
+    os.environ["TRUSTED_PROXY_COUNT"] = "1"
+
+
+# ==================== SEEDING ====================
+
+async def ensure_seeded(volumes: dict, seed: int, reseed: bool, workers: int) -> dict:
+    """Generate the data set with synthetic_data unless the database already holds it"""
+    from database import get_db, get_client
+    from synthetic_data import generate, generation_state, resolve_params
+    db = get_db()
+    params = resolve_params(volumes, {"seed": seed})
+    state = await generation_state(db)
+    if state and (reseed or any(state["params"].get(k) != v for k, v in volumes.items())):
+        print(f"Dropping {BENCH_DB_NAME}")
+        await get_client().drop_database(BENCH_DB_NAME)
+    state = await generate(db, params, workers=workers)
+    return state["params"]
+
+
+# ==================== JOURNEYS ====================
+
+class Recorder:
+    """Latency samples and status counts per endpoint for one stage"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.statuses = {}
+        self.journeys = 0
+
+    def record(self, name: str, seconds: float, status: int):
+        self.samples.setdefault(name, []).append(seconds * 1000)
+        self.statuses.setdefault(name, {}).setdefault(status, 0)
+        self.statuses[name][status] += 1
+        if status >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+
+class VirtualUser:
+    def __init__(self, client, recorder: Recorder, rng: random.Random, params: dict, stripe_standin, index: int):
+        from auth import create_access_token
+        from synthetic_data import ADMIN_INDEX, Generator
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.params = params
+        self.stripe = stripe_standin
+        self.generator = Generator(params)
+        self.tokens = {
+            "customer": create_access_token({"sub": self.entity_id("users", rng.randrange(1, params["users"]))}),
+            "vendor": create_access_token({"sub": self.entity_id("vendor_users", rng.randrange(params["vendors"]))}),
+            "admin": create_access_token({"sub": self.entity_id("users", ADMIN_INDEX)}),
+        }
+        # Distinct client address per virtual user, as the one trusted proxy would report it
+        self.forwarded_for = f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"
+
+    async def call(self, name: str, method: str, url: str, role: str = None, **kwargs):
+        headers = {"X-Forwarded-For": self.forwarded_for, "Accept-Encoding": "gzip"}
+        if role:
+            headers["Authorization"] = f"Bearer {self.tokens[role]}"
+        started = time.perf_counter()
+        response = await self.client.request(method, url, headers=headers, **kwargs)
+        self.recorder.record(name, time.perf_counter() - started, response.status_code)
+        return response
+
+    def entity_id(self, collection: str, index: int) -> str:
+        return self.generator.id(collection, index)
+
+    def product_id(self) -> str:
+        """Drawn by the same Zipf popularity the order history was generated with"""
+        return self.entity_id("products", self.generator.popular(self.rng, "products"))
+
+    async def browse(self):
+        await self.call("GET /homepage/bundle", "GET", "/api/homepage/bundle")
+        await self.call("GET /categories", "GET", "/api/categories")
+        category = self.entity_id("categories", self.rng.randrange(self.params["categories"]))
+        listing = await self.call("GET /products", "GET", f"/api/products?category_id={category}&limit=20&view=card")
+        await self.call("GET /products/facets", "GET", f"/api/products/facets?category_id={category}&limit=20")
+        products = listing.json() if listing.status_code == 200 else []
+        product_id = products[self.rng.randrange(len(products))]["id"] if products else self.product_id()
+        await self.call("GET /products/{id}", "GET", f"/api/products/{product_id}")
+        await self.call("GET /reviews/product/{id}", "GET", f"/api/reviews/product/{product_id}")
+        if self.rng.random() < 0.3:
+            await self.call("POST /cart/add", "POST", "/api/cart/add", role="customer",
+                            json={"product_id": product_id, "quantity": 1})
+
+    async def checkout(self):
+        items = [{"product_id": self.product_id(), "quantity": self.rng.randint(1, 2)}
+                 for _ in range(self.rng.randint(1, 3))]
+        for item in items:
+            await self.call("POST /cart/add", "POST", "/api/cart/add", role="customer", json=item)
+        await self.call("GET /cart", "GET", "/api/cart", role="customer")
+        await self.call("POST /shipping/rates", "POST", "/api/shipping/rates", json={
+            "from_address": {**SHIPPING_ADDRESS, "name": "Bench Store"},
+            "to_address": SHIPPING_ADDRESS,
+            "parcel": {"length": 10, "width": 8, "height": 4, "weight": 16}
+        })
+        session = await self.call("POST /checkout/cart", "POST", "/api/checkout/cart", role="customer", json={
+            "items": items, "shipping": SHIPPING_ADDRESS, "shipping_cost": 12.40,
+            "origin_url": "http://loadtest.local"
+        })
+        if session.status_code != 200:
+            return
+        session = session.json()
+        await self.call("POST /checkout/webhook", "POST", "/api/checkout/webhook",
+                        content=json.dumps(self.stripe.completed_event(session["session_id"])))
+        await self.call("GET /orders/{id}", "GET", f"/api/orders/{session['order_id']}", role="customer")
+        await self.call("DELETE /cart", "DELETE", "/api/cart", role="customer")
+
+    async def vendor(self):
+        await self.call("GET /vendors/me", "GET", "/api/vendors/me", role="vendor")
+        await self.call("GET /vendor/products", "GET", "/api/vendor/products?limit=50", role="vendor")
+        await self.call("GET /vendor/orders", "GET", "/api/vendor/orders", role="vendor")
+        await self.call("GET /stripe-connect/earnings-summary", "GET", "/api/stripe-connect/earnings-summary", role="vendor")
+        await self.call("GET /vendors/me/low-stock", "GET", "/api/vendors/me/low-stock", role="vendor")
+
+    async def admin(self):
+        await self.call("GET /admin/stats", "GET", "/api/admin/stats", role="admin")
+        await self.call("GET /admin/analytics", "GET", "/api/admin/analytics?period=30d", role="admin")
+        await self.call("GET /admin/orders", "GET", "/api/admin/orders?limit=50", role="admin")
+        await self.call("GET /admin/notification-center", "GET", "/api/admin/notification-center", role="admin")
+
+
+# ==================== RUNNER ====================
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(recorder: Recorder, concurrency: int, elapsed: float) -> dict:
+    endpoints = {}
+    for name, samples in sorted(recorder.samples.items()):
+        samples.sort()
+        endpoints[name] = {
+            "count": len(samples),
+            "errors": recorder.errors.get(name, 0),
+            "statuses": {str(k): v for k, v in recorder.statuses[name].items()},
+            "p50_ms": round(percentile(samples, 0.50), 2),
+            "p95_ms": round(percentile(samples, 0.95), 2),
+            "p99_ms": round(percentile(samples, 0.99), 2),
+        }
+    requests_total = sum(e["count"] for e in endpoints.values())
+    all_samples = sorted(s for samples in recorder.samples.values() for s in samples)
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "requests": requests_total,
+        "journeys": recorder.journeys,
+        "throughput_rps": round(requests_total / elapsed, 1) if elapsed else 0,
+        "error_rate": round(sum(e["errors"] for e in endpoints.values()) / requests_total, 4) if requests_total else 0,
+        "p50_ms": round(percentile(all_samples, 0.50), 2),
+        "p95_ms": round(percentile(all_samples, 0.95), 2),
+        "p99_ms": round(percentile(all_samples, 0.99), 2),
+        "endpoints": endpoints,
+    }
+
+
+async def run_stage(client, params: dict, mix: dict, concurrency: int, duration: float,
+                    think: float, stripe_standin, seed: int) -> dict:
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    names, weights = list(mix), list(mix.values())
+
+    async def worker(index: int):
+        rng = random.Random(seed * 100003 + index)
+        user = VirtualUser(client, recorder, rng, params, stripe_standin, index)
+        while time.perf_counter() < deadline:
+            journey = rng.choices(names, weights)[0]
+            try:
+                await getattr(user, journey)()
+            except Exception as e:
+                recorder.record(f"{journey} (exception)", 0, 599)
+                print(f"  {journey} failed: {type(e).__name__}: {e}")
+            recorder.journeys += 1
+            if think:
+                await asyncio.sleep(rng.expovariate(1 / think))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return summarize(recorder, concurrency, time.perf_counter() - started)
+
+
+def print_stage(stage: dict):
+    print(f"\n== {stage['concurrency']} users, {stage['seconds']}s: {stage['requests']} requests, "
+          f"{stage['throughput_rps']} req/s, {stage['journeys']} journeys, error rate {stage['error_rate']:.2%}")
+    print(f"{'endpoint':<40}{'count':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, e in stage["endpoints"].items():
+        print(f"{name:<40}{e['count']:>8}{e['errors']:>6}{e['p50_ms']:>10.1f}{e['p95_ms']:>10.1f}{e['p99_ms']:>10.1f}")
+    print(f"{'all':<40}{stage['requests']:>8}{'':>6}{stage['p50_ms']:>10.1f}{stage['p95_ms']:>10.1f}{stage['p99_ms']:>10.1f}")
+
+
+def compare(before_path: str, after_path: str):
+    """p95 and throughput change per stage and endpoint between two --json reports"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"before: {before.get('commit')} ({before.get('started_at')})")
+    print(f"after:  {after.get('commit')} ({after.get('started_at')})")
+    before_stages = {s["concurrency"]: s for s in before["stages"]}
+    for stage in after["stages"]:
+        old = before_stages.get(stage["concurrency"])
+        if not old:
+            continue
+        change = (stage["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] if old["throughput_rps"] else 0
+        print(f"\n== {stage['concurrency']} users: {old['throughput_rps']} -> {stage['throughput_rps']} req/s ({change:+.1%})")
+        print(f"{'endpoint':<40}{'p95 before':>12}{'p95 after':>12}{'change':>10}")
+        for name, e in stage["endpoints"].items():
+            if name not in old["endpoints"]:
+                continue
+            was = old["endpoints"][name]["p95_ms"]
+            delta = (e["p95_ms"] - was) / was if was else 0
+            print(f"{name:<40}{was:>12.1f}{e['p95_ms']:>12.1f}{delta:>+10.1%}")
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+async def run(args):
+    prepare_environment(args.admission)
+    import httpx
+    from server_modular import app
+
+    stripe_standin = StripeStandIn()
+    stripe_standin.install()
+    SendGridStandIn.install()
+    EasyPostStandIn().install()
+
+    volumes = {name: getattr(args, name) for name in LOAD_VOLUMES}
+    mix = {name: weight for name, weight in args.mix.items() if not args.journeys or name in args.journeys}
+
+    report = {
+        "commit": current_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "params": None,
+        "mix": mix,
+        "duration": args.duration,
+        "admission": args.admission,
+        "stages": [],
+    }
+    async with app.router.lifespan_context(app):
+        params = report["params"] = await ensure_seeded(volumes, args.seed, args.reseed, args.workers)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest.local", timeout=60) as client:
+            if args.warmup:
+                await run_stage(client, params, mix, min(args.ramp), args.warmup, 0, stripe_standin, args.seed)
+            for concurrency in args.ramp:
+                stage = await run_stage(client, params, mix, concurrency, args.duration, args.think,
+                                        stripe_standin, args.seed)
+                report["stages"].append(stage)
+                print_stage(stage)
+    report["emails_sent"] = SendGridStandIn.sent
+
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown journey '{name}'")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the API in-process against a local mongod")
+    for name, default in LOAD_VOLUMES.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and journeys")
+    parser.add_argument("--workers", type=int, default=4, help="synthetic data writer processes")
+    parser.add_argument("--reseed", action="store_true", help="drop and regenerate the load test database")
+    parser.add_argument("--ramp", type=lambda v: [int(c) for c in v.split(",")], default=[10, 25, 50],
+                        help="comma-separated concurrency stages")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per stage")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of unrecorded traffic first")
+    parser.add_argument("--think", type=float, default=0, help="mean think time between journeys (s)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="journey weights, e.g. browse=80,checkout=20")
+    parser.add_argument("--journeys", type=lambda v: v.split(","), help="only run these journeys")
+    parser.add_argument("--no-admission", dest="admission", action="store_false",
+                        help="disable admission control (rate limits and shedding)")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two --json reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        asyncio.run(run(args))
@@ -0,0 +1,141 @@
+"""
+AfroVending - Serialization Benchmark
+Per-endpoint response serialization cost for 20 / 100 / 1000 item lists
+
+Compares, for product, vendor and order list payloads:
+    stock       jsonable_encoder + json.dumps (FastAPI's default JSONResponse)
+    validated   response_model style validation + dump (List[ProductResponse] etc.)
+    orjson      jsonable_encoder + orjson (FastJSONResponse as default_response_class)
+    trusted     orjson straight from the documents (fast_response)
+
+Usage:
+    python benchmark_serialization.py [--runs 50]
+
+No database needed: documents are synthetic but shaped like the stored ones.
+"""
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from typing import List
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+
+from models import ProductResponse, VendorResponse, OrderResponse
+from serialization import dumps
+
+SIZES = [20, 100, 1000]
+
+
+def product_doc(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "vendor_id": str(uuid.uuid4()),
+        "name": f"Handwoven Kente Table Runner #{i}",
+        "description": "Authentic handwoven kente cloth table runner made by artisans in Bonwire. " * 4,
+        "price": round(random.uniform(5, 500), 2),
+        "compare_price": None,
+        "category_id": str(uuid.uuid4()),
+        "images": [f"https://res.cloudinary.com/afrovending/image/upload/v1/products/{uuid.uuid4()}.jpg" for _ in range(4)],
+        "stock": random.randrange(100),
+        "tags": ["kente", "handwoven", "ghana", "decor", "table runner"],
+        "fulfillment_option": "FBV",
+        "is_active": True,
+        "average_rating": round(random.uniform(0, 5), 1),
+        "review_count": random.randrange(200),
+        "sales_count": random.randrange(500),
+        "vendor_country": "Ghana",
+        "vendor_is_verified": True,
+        "created_at": "2026-01-01T12:00:00+00:00"
+    }
+
+
+def vendor_doc(i: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "store_name": f"Accra Artisans {i}",
+        "description": "Family-run workshop producing kente, beads and carvings since 1985. " * 3,
+        "country": "Ghana",
+        "city": "Accra",
+        "logo_url": None,
+        "banner_url": None,
+        "is_verified": True,
+        "is_approved": True,
+        "subscription_plan": "free",
+        "commission_rate": 15,
+        "product_count": random.randrange(50),
+        "total_sales": random.randrange(10000),
+        "created_at": "2026-01-01T12:00:00+00:00"
+    }
+
+
+def order_doc(i: int) -> dict:
+    items = [
+        {"product_id": str(uuid.uuid4()), "name": "Shea Butter 500g", "price": 12.5,
+         "quantity": random.randrange(1, 4), "image": None, "vendor_id": str(uuid.uuid4())}
+        for _ in range(3)
+    ]
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": str(uuid.uuid4()),
+        "items": items,
+        "subtotal": 37.5,
+        "shipping_cost": 5,
+        "total": 42.5,
+        "status": "confirmed",
+        "payment_status": "paid",
+        "shipping_address": "12 Independence Ave",
+        "shipping_city": "Accra",
+        "timeline": [{"status": "confirmed", "timestamp": "2026-01-01T12:00:00+00:00", "note": "Payment received"}],
+        "created_at": "2026-01-01T12:00:00+00:00"
+    }
+
+
+ENDPOINTS = {
+    "GET /products": (product_doc, ProductResponse),
+    "GET /vendors": (vendor_doc, VendorResponse),
+    "GET /orders": (order_doc, OrderResponse),
+}
+
+
+def strategies(model):
+    adapter = TypeAdapter(List[model])
+    return {
+        "stock": lambda docs: json.dumps(jsonable_encoder(docs), ensure_ascii=False, separators=(",", ":")).encode(),
+        "validated": lambda docs: adapter.dump_json(adapter.validate_python(docs)),
+        "orjson": lambda docs: dumps(jsonable_encoder(docs)),
+        "trusted": lambda docs: dumps(docs),
+    }
+
+
+def time_call(fn, docs, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(docs)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def run(runs: int):
+    for endpoint, (make_doc, model) in ENDPOINTS.items():
+        print(f"\n{endpoint}")
+        print(f"{'items':>8}{'bytes':>12}" + "".join(f"{name + ' ms':>14}" for name in strategies(model)))
+        for size in SIZES:
+            docs = [make_doc(i) for i in range(size)]
+            row = f"{size:>8}{len(dumps(docs)):>12,}"
+            for name, fn in strategies(model).items():
+                try:
+                    row += f"{time_call(fn, docs, runs):>14.3f}"
+                except Exception:
+                    row += f"{'n/a':>14}"
+            print(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark response serialization")
+    parser.add_argument("--runs", type=int, default=50)
+    run(parser.parse_args().runs)
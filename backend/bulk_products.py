@@ -0,0 +1,467 @@
+"""
+AfroVending - Bulk Product Import/Export
+Streams vendor product catalogues in and out as CSV or JSON Lines
+
+Import reads the request body as it arrives, validates rows against
+`ProductCreate` in batches of IMPORT_BATCH_SIZE and writes each batch with
+one unordered bulk_write. Rows carrying an `id` of one of the vendor's
+products update it; other rows create products. Invalid rows are reported
+by row number and never stop the rest of the file. `vendors.product_count`
+is incremented once at the end, and the caller runs one price-alert sweep
+over the updated products whose price dropped.
+
+CSV columns are EXPORT_FIELDS; list fields (images, tags) are separated by
+"|". JSON Lines rows are objects with the same keys. Export writes the same
+format from a cursor, so an export can be edited and imported back
+(`is_active` is exported for reference and ignored on import).
+
+Bulk edit applies one price/stock/visibility change to a selection of the
+vendor's products: plain assignments with one update_many, relative changes
+with one bulk_write per batch. Activation follows reactivate_product: it
+skips products left without stock and clears auto-deactivation. The caller
+runs a single price-alert sweep over the products whose price dropped.
+"""
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import AsyncIterator, Optional
+import asyncio
+import csv
+import io
+import itertools
+import json
+import os
+import uuid
+
+from datetimes import timestamp
+from models import ProductCreate, ProductBulkEdit, ProductSelection
+from vendor_attributes import vendor_attributes
+from conditional import version_fields, versioned
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ROWS = int(os.environ.get("PRODUCT_IMPORT_MAX_ROWS", "50000"))
+CSV_PARSE_BATCH = 500
+IMPORT_MAX_ERRORS = 1000  # reported; later failures are only counted
+
+EDIT_BATCH_SIZE = 1000
+EDIT_PREVIEW_SIZE = 50
+PRICE_FLOOR = 0.01
+
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+EXPORT_FIELDS = ["id", *ProductCreate.model_fields, "is_active"]
+LIST_FIELDS = {"images", "tags"}
+LIST_SEPARATOR = "|"
+
+
+class ImportAborted(Exception):
+    """The upload can't be read any further (bad header, too many rows)"""
+
+
+def detect_format(content_type: Optional[str], requested: Optional[str] = None) -> Optional[str]:
+    if requested:
+        return requested if requested in FORMATS else None
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/x-jsonlines"):
+        return "jsonl"
+    return None
+
+
+# ==================== PARSING ====================
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decoded lines from a byte stream, without holding more than one line"""
+    buffer = b""
+    first = True
+    async for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for raw in complete:
+            line = raw.decode("utf-8-sig" if first else "utf-8").rstrip("\r")
+            first = False
+            yield line
+    if buffer:
+        yield buffer.decode("utf-8-sig" if first else "utf-8").rstrip("\r")
+
+
+async def _csv_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple]:
+    """(row_number, dict) per CSV record; quoted fields may span lines"""
+    loop = asyncio.get_running_loop()
+
+    def line_source():
+        # Runs on the parser thread; each line is read on the event loop
+        while True:
+            try:
+                line = asyncio.run_coroutine_threadsafe(lines.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+            yield line + "\n"
+
+    # csv.reader applies the real quoting rules (a bare " inside an unquoted
+    # field is literal); it is driven off the loop, CSV_PARSE_BATCH records at a time
+    reader = csv.reader(line_source())
+    header = None
+    row_number = 0
+    while True:
+        records = await asyncio.to_thread(list, itertools.islice(reader, CSV_PARSE_BATCH))
+        if not records:
+            break
+        for values in records:
+            if not values:
+                continue  # blank line
+            if header is None:
+                header = [h.strip() for h in values]
+                unknown = set(header) - set(EXPORT_FIELDS)
+                if unknown:
+                    raise ImportAborted(f"Unknown CSV columns: {', '.join(sorted(unknown))}")
+                continue
+            row_number += 1
+            row = {}
+            for name, value in zip(header, values):
+                if value == "":
+                    continue  # blank cell: keep the model default
+                row[name] = [v.strip() for v in value.split(LIST_SEPARATOR) if v.strip()] if name in LIST_FIELDS else value
+            yield row_number, row
+
+
+async def _jsonl_records(lines: AsyncIterator[str]) -> AsyncIterator[tuple]:
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid JSON: {e}")
+            continue
+        yield row_number, row if isinstance(row, dict) else ValueError("Each line must be a JSON object")
+
+
+def read_rows(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[tuple]:
+    """(row_number, dict or the exception that made the row unreadable)"""
+    records = _csv_records if fmt == "csv" else _jsonl_records
+    return records(_lines(chunks))
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+
+# ==================== IMPORT ====================
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        self.price_dropped = []  # updated products now cheaper than before
+
+    def fail(self, row_number: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "price_dropped": self.price_dropped,
+        }
+
+
+async def _write_batch(db, vendor: dict, batch: list, category_ids: set, report: ImportReport, dry_run: bool):
+    """Validate one batch and write it with a single unordered bulk_write"""
+    valid = []
+    for row_number, row in batch:
+        if isinstance(row, Exception):
+            report.fail(row_number, str(row))
+            continue
+        product_id = row.pop("id", None)
+        row.pop("is_active", None)
+        try:
+            product = ProductCreate.model_validate(row)
+        except ValidationError as e:
+            report.fail(row_number, _validation_message(e))
+            continue
+        if product.category_id not in category_ids:
+            report.fail(row_number, f"category_id: unknown category '{product.category_id}'")
+            continue
+        valid.append((row_number, product_id, product))
+
+    # Rows with an id must name one of this vendor's products
+    requested_ids = [product_id for _, product_id, _ in valid if product_id]
+    owned = {}  # id -> current price
+    if requested_ids:
+        owned = {
+            p["id"]: p.get("price", 0) async for p in db.products.find(
+                {"id": {"$in": requested_ids}, "vendor_id": vendor["id"]}, {"_id": 0, "id": 1, "price": 1}
+            )
+        }
+
+    operations, row_numbers, price_dropped = [], [], {}
+    shared = {**vendor_attributes(vendor), "vendor_id": vendor["id"]}
+    for row_number, product_id, product in valid:
+        data = product.model_dump()
+        if product_id and product_id not in owned:
+            report.fail(row_number, f"id: product '{product_id}' not found")
+            continue
+        if product_id:
+            if data["price"] < owned[product_id]:
+                price_dropped[len(operations)] = product_id
+            operations.append(UpdateOne({"id": product_id, "vendor_id": vendor["id"]}, versioned({"$set": data})))
+        else:
+            operations.append(InsertOne({
+                "id": str(uuid.uuid4()),
+                **data,
+                **shared,
+                "is_active": True,
+                "average_rating": 0,
+                "review_count": 0,
+                "sales_count": 0,
+                "created_at": timestamp(),
+                **version_fields()
+            }))
+        row_numbers.append(row_number)
+
+    if dry_run or not operations:
+        report.created += sum(isinstance(op, InsertOne) for op in operations)
+        report.updated += sum(isinstance(op, UpdateOne) for op in operations)
+        return
+
+    failed_indexes = set()
+    try:
+        await db.products.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            failed_indexes.add(error["index"])
+            report.fail(row_numbers[error["index"]], error.get("errmsg", "write failed"))
+    for index, op in enumerate(operations):
+        if index not in failed_indexes:
+            if isinstance(op, InsertOne):
+                report.created += 1
+            else:
+                report.updated += 1
+                if index in price_dropped:
+                    report.price_dropped.append(price_dropped[index])
+
+
+async def import_products(db, vendor: dict, chunks: AsyncIterator[bytes], fmt: str, dry_run: bool = False) -> dict:
+    """Stream rows from `chunks` into the vendor's catalogue; returns the per-row report"""
+    category_ids = {c["id"] async for c in db.categories.find({}, {"_id": 0, "id": 1})}
+    report = ImportReport()
+    batch = []
+    try:
+        async for row_number, row in read_rows(chunks, fmt):
+            if row_number > IMPORT_MAX_ROWS:
+                raise ImportAborted(f"Imports are limited to {IMPORT_MAX_ROWS} rows")
+            batch.append((row_number, row))
+            report.rows = row_number
+            if len(batch) == IMPORT_BATCH_SIZE:
+                await _write_batch(db, vendor, batch, category_ids, report, dry_run)
+                batch = []
+        if batch:
+            await _write_batch(db, vendor, batch, category_ids, report, dry_run)
+        aborted = None
+    except (ImportAborted, UnicodeDecodeError, csv.Error) as e:
+        aborted = str(e)
+        # Rows already written stay; the report says where reading stopped
+
+    if report.created and not dry_run:
+        await db.vendors.update_one({"id": vendor["id"]}, versioned({"$inc": {"product_count": report.created}}))
+    return {**report.as_dict(), "dry_run": dry_run, "aborted": aborted}
+
+
+# ==================== EXPORT ====================
+
+def _export_row(product: dict) -> dict:
+    return {name: product.get(name) for name in EXPORT_FIELDS}
+
+
+async def export_products(db, vendor_id: str, fmt: str, batch_size: int = 1000) -> AsyncIterator[bytes]:
+    """The vendor's products as CSV / JSON Lines chunks, read from a cursor"""
+    projection = {"_id": 0, **{name: 1 for name in EXPORT_FIELDS}}
+    cursor = db.products.find({"vendor_id": vendor_id}, projection).sort("created_at", 1).batch_size(batch_size)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(EXPORT_FIELDS)
+
+    rows = 0
+    async for product in cursor:
+        row = _export_row(product)
+        if fmt == "csv":
+            writer.writerow([
+                LIST_SEPARATOR.join(value or []) if name in LIST_FIELDS else ("" if value is None else value)
+                for name, value in row.items()
+            ])
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+        rows += 1
+        if rows % batch_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+# ==================== BULK EDIT ====================
+
+def selection_query(vendor_id: str, selection: ProductSelection) -> dict:
+    query = {"vendor_id": vendor_id}
+    if selection.product_ids is not None:
+        query["id"] = {"$in": selection.product_ids}
+    if selection.category_id:
+        query["category_id"] = selection.category_id
+    if selection.tag:
+        query["tags"] = selection.tag
+    if selection.is_active is not None:
+        query["is_active"] = selection.is_active
+    if selection.max_stock is not None:
+        query["stock"] = {"$lte": selection.max_stock}
+    price = {}
+    if selection.min_price is not None:
+        price["$gte"] = selection.min_price
+    if selection.max_price is not None:
+        price["$lte"] = selection.max_price
+    if price:
+        query["price"] = price
+    return query
+
+
+def validate_edit(edit: ProductBulkEdit):
+    """Raise ValueError for an empty or contradictory edit"""
+    if edit.price_change_percent is not None and edit.price_change_amount is not None:
+        raise ValueError("Use either price_change_percent or price_change_amount")
+    if edit.stock is not None and edit.stock_change is not None:
+        raise ValueError("Use either stock or stock_change")
+    if edit.is_active and edit.stock == 0:
+        raise ValueError("Cannot activate products with zero stock")
+    if all(v is None for v in (edit.price_change_percent, edit.price_change_amount,
+                               edit.stock, edit.stock_change, edit.is_active)):
+        raise ValueError("Nothing to change")
+
+
+def new_price(price: float, edit: ProductBulkEdit) -> float:
+    if edit.price_change_percent is not None:
+        price = price * (1 + edit.price_change_percent / 100)
+    elif edit.price_change_amount is not None:
+        price = price + edit.price_change_amount
+    return max(PRICE_FLOOR, round(price, 2))
+
+
+def _product_update(product: dict, edit: ProductBulkEdit, assigned: dict, unset: dict):
+    """(filter, update, new price, new stock) for one product under a relative edit"""
+    match = {"id": product["id"]}
+    update = {"$set": dict(assigned)}
+    price, stock = product.get("price", 0), product.get("stock", 0)
+
+    if edit.price_change_percent is not None or edit.price_change_amount is not None:
+        price = new_price(price, edit)
+        update["$set"]["price"] = price
+        match["price"] = product.get("price")  # skip if the price changed meanwhile
+
+    if edit.stock_change is not None:
+        delta = edit.stock_change
+        if stock + delta >= 0:
+            # $inc so concurrent orders decrementing stock are never lost
+            update["$inc"] = {"stock": delta}
+            if delta < 0:
+                match["stock"] = {"$gte": -delta}
+            stock = stock + delta
+        else:
+            update["$set"]["stock"] = 0
+            match["stock"] = {"$lt": -delta}
+            stock = 0
+
+    if assigned.get("is_active"):
+        if assigned.get("stock", stock) <= 0:
+            # Same rule as reactivate_product: products without stock stay inactive
+            update["$set"].pop("is_active")
+            update["$set"].pop("auto_deactivated")
+        else:
+            if edit.stock is None:
+                match["stock"] = {"$gt": -(edit.stock_change or 0)}
+            update["$unset"] = dict(unset)
+    return match, versioned(update), price, stock
+
+
+async def bulk_edit_products(db, vendor_id: str, edit: ProductBulkEdit) -> dict:
+    """Apply one edit to the selected products; returns counts and the price-dropped ids"""
+    validate_edit(edit)
+    query = selection_query(vendor_id, edit.selection)
+
+    assigned = {}
+    if edit.stock is not None:
+        assigned["stock"] = edit.stock
+    unset = {}
+    if edit.is_active is not None:
+        assigned["is_active"] = edit.is_active
+    if edit.is_active:
+        # Activation clears auto-deactivation like reactivate_product and
+        # skips products that are out of stock
+        assigned["auto_deactivated"] = False
+        unset = {"auto_deactivated_at": "", "auto_deactivated_reason": ""}
+    relative = any(v is not None for v in (edit.price_change_percent, edit.price_change_amount, edit.stock_change))
+
+    if not relative:
+        if edit.is_active and edit.stock is None:
+            query.setdefault("stock", {})["$gt"] = 0
+        if edit.dry_run:
+            matched = await db.products.count_documents(query)
+            return {"matched": matched, "modified": 0, "conflicts": 0, "price_dropped": [], "dry_run": True}
+        update = {"$set": assigned, "$unset": unset} if unset else {"$set": assigned}
+        result = await db.products.update_many(query, versioned(update))
+        return {"matched": result.matched_count, "modified": result.modified_count,
+                "conflicts": 0, "price_dropped": [], "dry_run": False}
+
+    matched = modified = 0
+    price_dropped, preview = [], []
+    cursor = db.products.find(query, {"_id": 0, "id": 1, "name": 1, "price": 1, "stock": 1}).batch_size(EDIT_BATCH_SIZE)
+    batch = []
+
+    async def flush(batch):
+        nonlocal modified
+        if batch and not edit.dry_run:
+            result = await db.products.bulk_write([UpdateOne(m, u) for m, u in batch], ordered=False)
+            modified += result.modified_count
+
+    async for product in cursor:
+        match, update, price, stock = _product_update(product, edit, assigned, unset)
+        matched += 1
+        if price < product.get("price", 0):
+            price_dropped.append(product["id"])
+        if len(preview) < EDIT_PREVIEW_SIZE:
+            preview.append({
+                "id": product["id"],
+                "name": product.get("name"),
+                "price": [product.get("price"), price],
+                "stock": [product.get("stock"), assigned.get("stock", stock)],
+            })
+        batch.append((match, update))
+        if len(batch) == EDIT_BATCH_SIZE:
+            await flush(batch)
+            batch = []
+    await flush(batch)
+
+    return {
+        "matched": matched,
+        "modified": modified,
+        # Products whose price/stock moved between the read and the write are left alone
+        "conflicts": 0 if edit.dry_run else matched - modified,
+        "price_dropped": price_dropped,
+        "preview": preview,
+        "dry_run": edit.dry_run,
+    }
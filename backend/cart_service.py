@@ -0,0 +1,102 @@
+"""
+AfroVending - Cart Pricing Service
+Prices a whole cart with one $in query and caches the result on the cart
+
+Every cart mutation increments `carts.version` and drops the cached
+`priced` snapshot. A snapshot is reused while its version still matches
+the cart and it is younger than CART_SNAPSHOT_TTL_SECONDS (prices can
+change underneath a cart without bumping its version).
+"""
+from datetime import datetime, timezone
+import os
+import time
+
+from datetimes import timestamp
+
+# Only what the cart, checkout and order lines need
+CART_PRODUCT_PROJECTION = {"_id": 0, "id": 1, "name": 1, "price": 1, "stock": 1, "images": 1, "vendor_id": 1}
+
+CART_SNAPSHOT_TTL_SECONDS = int(os.environ.get("CART_SNAPSHOT_TTL_SECONDS", "120"))
+
+# Update fragment that every cart write applies
+INVALIDATE_SNAPSHOT = {"$inc": {"version": 1}, "$unset": {"priced": ""}}
+
+
+def cart_update(**operators) -> dict:
+    """Merge a cart write with the version bump / snapshot invalidation"""
+    update = {op: dict(fields) for op, fields in operators.items()}
+    for op, fields in INVALIDATE_SNAPSHOT.items():
+        update.setdefault(op, {}).update(fields)
+    # Activity stamp for the abandoned-cart sweep (see retention.py)
+    update.setdefault("$set", {})["updated_at"] = timestamp()
+    return update
+
+
+async def price_items(db, items: list) -> dict:
+    """Price a list of {product_id, quantity} with a single bulk product fetch"""
+    product_ids = list({item["product_id"] for item in items})
+    products = {
+        p["id"]: p async for p in db.products.find(
+            {"id": {"$in": product_ids}}, CART_PRODUCT_PROJECTION
+        )
+    }
+
+    lines = []
+    unavailable = []
+    total = 0
+    for item in items:
+        product = products.get(item["product_id"])
+        if not product:
+            unavailable.append(item["product_id"])
+            continue
+        quantity = int(item.get("quantity", 1))
+        subtotal = float(product["price"]) * quantity
+        lines.append({
+            "product_id": item["product_id"],
+            "quantity": quantity,
+            "product": product,
+            "subtotal": subtotal
+        })
+        total += subtotal
+
+    return {"items": lines, "total": total, "unavailable": unavailable}
+
+
+def _snapshot_is_valid(cart: dict, max_age: int) -> bool:
+    priced = cart.get("priced")
+    return bool(
+        priced
+        and priced.get("version") == cart.get("version", 0)
+        and time.time() - priced.get("priced_at_ts", 0) < max_age
+    )
+
+
+async def get_priced_cart(db, user_id: str, max_age: int = CART_SNAPSHOT_TTL_SECONDS):
+    """The user's priced cart, from the cached snapshot when still valid (None if no cart)"""
+    cart = await db.carts.find_one({"user_id": user_id}, {"_id": 0})
+    if not cart:
+        return None
+
+    if _snapshot_is_valid(cart, max_age):
+        return cart["priced"]
+
+    priced = await price_items(db, cart.get("items", []))
+    priced["version"] = cart.get("version", 0)
+    priced["priced_at"] = datetime.now(timezone.utc).isoformat()
+    priced["priced_at_ts"] = time.time()
+
+    # Only store if nothing changed the cart while we were pricing it
+    await db.carts.update_one(
+        {"user_id": user_id, "version": cart.get("version", {"$exists": False})},
+        {"$set": {"priced": priced}}
+    )
+    return priced
+
+
+def same_items(priced: dict, items: list) -> bool:
+    """True when a priced snapshot covers exactly the requested product/quantity pairs"""
+    if priced.get("unavailable"):
+        return False
+    requested = sorted((i["product_id"], int(i.get("quantity", 1))) for i in items)
+    snapshot = sorted((line["product_id"], line["quantity"]) for line in priced["items"])
+    return requested == snapshot
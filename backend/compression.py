@@ -0,0 +1,212 @@
+"""
+AfroVending - Response Compression
+gzip / brotli / zstd compression for API responses and precompressed caches
+
+`CompressionMiddleware` compresses buffered responses whose content type is
+on the allowlist and whose size falls between COMPRESSION_MIN_SIZE and
+COMPRESSION_MAX_SIZE. Dynamic responses use fast compression levels so the
+CPU cost stays small; streamed responses (SSE, exports) pass through as-is.
+
+Cached payloads (e.g. the homepage snapshot) call `precompress()` once when
+the cache is filled, at high levels, and are served with
+`precompressed_response()` so no request pays for compression.
+
+An encoded response gets its own strong ETag: the identity ETag with an
+encoding suffix ("<hash>-gz", "-br", "-zstd"), since its bytes differ.
+`conditional.is_not_modified` strips the suffix before comparing.
+
+brotli and zstd are optional: install `brotli` / `zstandard` to enable them,
+otherwise only gzip is offered.
+"""
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+import gzip
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+# CPU budget: larger buffered bodies are sent uncompressed rather than stall the worker
+COMPRESSION_MAX_SIZE = int(os.environ.get("COMPRESSION_MAX_SIZE", str(4 * 1024 * 1024)))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "text/xml",
+)
+
+# encoding -> (dynamic level, precompressed level)
+_LEVELS = {
+    "br": (4, 11),
+    "zstd": (3, 19),
+    "gzip": (5, 9),
+}
+
+
+# encoding -> suffix appended inside the ETag's quotes
+ETAG_SUFFIXES = {
+    "br": "-br",
+    "zstd": "-zstd",
+    "gzip": "-gz",
+}
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of the `encoding` representation of a body tagged `etag`"""
+    if not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}{ETAG_SUFFIXES[encoding]}"'
+
+
+def identity_etag(etag: str) -> str:
+    """Undo encoded_etag, so a validator of any representation matches the resource"""
+    for suffix in ETAG_SUFFIXES.values():
+        if etag.endswith(f'{suffix}"'):
+            return f'{etag[:-len(suffix) - 1]}"'
+    return etag
+
+
+def _compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def available_encodings() -> list:
+    """Supported encodings in server preference order"""
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate(accept_encoding: str):
+    """Best encoding the client accepts (None for identity)"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower() in COMPRESSIBLE_TYPES
+
+
+def precompress(body: bytes) -> dict:
+    """Every available encoding of a cached body, compressed once at high levels"""
+    variants = {}
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return variants
+    for encoding in available_encodings():
+        variants[encoding] = _compress(body, encoding, _LEVELS[encoding][1])
+    return variants
+
+
+def precompressed_response(request, body: bytes, variants: dict, media_type: str = "application/json",
+                           headers: dict = None, status_code: int = 200) -> Response:
+    """Serve the client's preferred precompressed variant (or the raw body)"""
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    encoding = negotiate(request.headers.get("accept-encoding", "")) if COMPRESSION_ENABLED else None
+    if encoding in variants:
+        headers["Content-Encoding"] = encoding
+        if "ETag" in headers:
+            headers["ETag"] = encoded_etag(headers["ETag"], encoding)
+        body = variants[encoding]
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing buffered, allowlisted responses"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, maximum_size: int = COMPRESSION_MAX_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.maximum_size = maximum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough or start_message is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            compress = (
+                not message.get("more_body", False)
+                and "content-encoding" not in headers
+                and start_message["status"] not in (204, 304)
+                and is_compressible(headers.get("content-type", ""))
+                and self.minimum_size <= len(body) <= self.maximum_size
+            )
+
+            if compress:
+                body = _compress(body, encoding, _LEVELS[encoding][0])
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": body}
+
+            # Streams (more_body) and everything after the first chunk go out untouched
+            passthrough = True
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
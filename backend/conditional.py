@@ -0,0 +1,165 @@
+"""
+AfroVending - Conditional GET
+Version stamps, strong ETags and 304 responses for catalogue resources
+
+Product, vendor and category documents carry a `version` counter and an
+`updated_at` timestamp. Every write goes through `versioned()` (updates) or
+`version_fields()` (inserts):
+
+    await db.products.update_one({"id": product_id}, versioned({"$set": data}))
+
+Detail routes declare `conditional_document(...)` as a dependency. It reads
+only the stamp fields, answers `If-None-Match` / `If-Modified-Since` with a
+304 before the route loads the document, and otherwise sets ETag and
+Last-Modified on the route's response.
+
+Static reference lists are wrapped in `StaticResource`, which serializes,
+hashes and precompresses them once at import.
+"""
+from fastapi import HTTPException, Request, Response
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+import hashlib
+
+from database import get_db
+from datetimes import timestamp, as_datetime
+from serialization import dumps
+from compression import precompress, precompressed_response, identity_etag
+
+STAMP_PROJECTION = {"_id": 0, "id": 1, "version": 1, "updated_at": 1, "created_at": 1}
+
+STATIC_CACHE_MAX_AGE = 86400
+
+
+# ==================== VERSION STAMPS ====================
+
+def version_fields() -> dict:
+    """Stamp for a newly inserted document"""
+    return {"version": 1, "updated_at": timestamp()}
+
+
+def versioned(update: dict) -> dict:
+    """Add the version bump to a Mongo update document"""
+    return {
+        **update,
+        "$set": {**update.get("$set", {}), "updated_at": timestamp()},
+        "$inc": {**update.get("$inc", {}), "version": 1},
+    }
+
+
+# ==================== VALIDATORS ====================
+
+def make_etag(*parts) -> str:
+    """Strong ETag over the given stamp parts"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """RFC 7232 evaluation: If-None-Match wins, If-Modified-Since is the fallback"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [identity_etag(t.strip().removeprefix("W/")) for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def _apply(request: Request, response: Response, etag: str, last_modified: Optional[datetime]):
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+# ==================== DEPENDENCIES ====================
+
+def conditional_document(collection: str, param: str, related: tuple = ()):
+    """
+    Dependency for a detail route serving one document by `id`.
+
+    `related` lists (collection, field) pairs embedded in the response, e.g.
+    the product's vendor, so their versions are part of the ETag. The stamps
+    are read before the route reads the body, so a concurrent write can only
+    make the ETag stale (forcing a 200 next time), never the body.
+    """
+    async def dependency(request: Request, response: Response):
+        db = get_db()
+        projection = {**STAMP_PROJECTION, **{field: 1 for _, field in related}}
+        stamp = await db[collection].find_one({"id": request.path_params[param]}, projection)
+        if not stamp:
+            return  # the route reports the 404
+
+        stamps = [stamp]
+        for related_collection, field in related:
+            if stamp.get(field):
+                related_stamp = await db[related_collection].find_one({"id": stamp[field]}, STAMP_PROJECTION)
+                if related_stamp:
+                    stamps.append(related_stamp)
+
+        etag = make_etag(collection, *(
+            f"{s['id']}:{s.get('version', 0)}:{s.get('updated_at') or s.get('created_at')}" for s in stamps
+        ))
+        modified = [t for t in (as_datetime(s.get("updated_at") or s.get("created_at")) for s in stamps) if t]
+        _apply(request, response, etag, max(modified) if modified else None)
+    return dependency
+
+
+def conditional_collection(collection: str):
+    """
+    Dependency for a route listing a small collection (e.g. categories).
+
+    One $group over the collection: count, summed versions and the newest
+    timestamp change whenever a document is inserted, updated or deleted.
+    The query string is part of the ETag since it selects the representation.
+    """
+    async def dependency(request: Request, response: Response):
+        db = get_db()
+        stamps = await db[collection].aggregate([
+            {"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "version": {"$sum": {"$ifNull": ["$version", 0]}},
+                "updated_at": {"$max": {"$ifNull": ["$updated_at", "$created_at"]}}
+            }}
+        ]).to_list(1)
+        stamp = stamps[0] if stamps else {"count": 0, "version": 0, "updated_at": None}
+
+        etag = make_etag(collection, request.url.query, stamp["count"], stamp["version"], stamp["updated_at"])
+        _apply(request, response, etag, as_datetime(stamp["updated_at"]))
+    return dependency
+
+
+# ==================== STATIC REFERENCE DATA ====================
+
+class StaticResource:
+    """Reference data serialized, hashed and compressed once at import"""
+
+    def __init__(self, content):
+        self.content = content
+        self.body = dumps(content)
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.encoded = precompress(self.body)
+        self.headers = {"ETag": self.etag, "Cache-Control": f"public, max-age={STATIC_CACHE_MAX_AGE}"}
+
+    def respond(self, request: Request) -> Response:
+        if is_not_modified(request, self.etag):
+            return Response(status_code=304, headers=self.headers)
+        return precompressed_response(request, self.body, self.encoded, headers=self.headers)
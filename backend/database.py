@@ -1,11 +1,27 @@
 """
 AfroVending - Database Connection
 MongoDB connection and shared database instance
+
+Workloads get their own client (and so their own connection pool):
+
+    transactional   checkout, orders, auth, every write (the default)
+    catalogue       product/service/vendor listings and search
+    analytics       admin dashboards, reports and heavy aggregations
+
+Routes pick one with `get_db("catalogue")`; `get_db()` stays transactional.
+Catalogue and analytics read from secondaries when the deployment is a
+replica set (secondaryPreferred behaves like primary on a standalone) and
+carry a timeoutMS budget so a runaway query cannot hold a connection.
 """
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from dotenv import load_dotenv
+from collections import deque
+from datetime import timezone
 import os
 import logging
+import threading
+import time
 
 load_dotenv()
 
@@ -19,21 +35,177 @@ if not mongo_url:
 
 db_name = os.environ.get('DB_NAME', 'afrovending_db')
 
+SECONDARY_READS = os.environ.get("MONGO_SECONDARY_READS", "true").lower() == "true"
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+# Client options per workload; timeoutMS of 0 means no budget
+CLIENT_PROFILES = {
+    "transactional": {
+        "maxPoolSize": _env_int("MONGO_TRANSACTIONAL_POOL_SIZE", 50),
+        "minPoolSize": 5,
+        "readPreference": "primary",
+        "timeoutMS": _env_int("MONGO_TRANSACTIONAL_TIMEOUT_MS", 0),
+    },
+    "catalogue": {
+        "maxPoolSize": _env_int("MONGO_CATALOGUE_POOL_SIZE", 40),
+        "minPoolSize": 2,
+        "readPreference": "secondaryPreferred" if SECONDARY_READS else "primary",
+        "timeoutMS": _env_int("MONGO_CATALOGUE_TIMEOUT_MS", 10000),
+    },
+    "analytics": {
+        "maxPoolSize": _env_int("MONGO_ANALYTICS_POOL_SIZE", 10),
+        "minPoolSize": 0,
+        "readPreference": "secondaryPreferred" if SECONDARY_READS else "primary",
+        "timeoutMS": _env_int("MONGO_ANALYTICS_TIMEOUT_MS", 60000),
+    },
+}
+
+
+class PoolWaitMonitor(monitoring.ConnectionPoolListener):
+    """Time spent waiting for a pooled connection, per profile"""
+
+    SAMPLES = 1000
+
+    def __init__(self, profile: str):
+        self.profile = profile
+        self._started = threading.local()
+        self.checkouts = 0
+        self.failures = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.samples = deque(maxlen=self.SAMPLES)
+
+    def connection_check_out_started(self, event):
+        # Motor runs each operation on one executor thread, so start/finish share a thread
+        self._started.value = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._started, "value", None)
+        if started is None:
+            return
+        wait_ms = (time.perf_counter() - started) * 1000
+        self.checkouts += 1
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.samples.append(wait_ms)
+
+    def connection_check_out_failed(self, event):
+        self.failures += 1
+
+    def stats(self) -> dict:
+        recent = sorted(self.samples)
+        return {
+            "checkouts": self.checkouts,
+            "failures": self.failures,
+            "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0,
+            "p95_wait_ms": round(recent[int(len(recent) * 0.95) - 1], 3) if recent else 0,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+        }
+
+    # Remaining pool events are not needed for wait metrics
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_checked_in(self, event): pass
+
+
+clients = {}
+databases = {}
+pool_monitors = {}
+
 try:
-    client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=5000)
-    db = client[db_name]
-    logger.info(f"MongoDB client initialized for database: {db_name}")
+    for profile, options in CLIENT_PROFILES.items():
+        pool_monitors[profile] = PoolWaitMonitor(profile)
+        client_options = {k: v for k, v in options.items() if not (k == "timeoutMS" and not v)}
+        clients[profile] = AsyncIOMotorClient(
+            mongo_url,
+            serverSelectionTimeoutMS=5000,
+            appname=f"afrovending-{profile}",
+            # Native dates come back as aware UTC datetimes, so they serialize like the ISO strings
+            tz_aware=True,
+            tzinfo=timezone.utc,
+            event_listeners=[pool_monitors[profile]],
+            **client_options
+        )
+        databases[profile] = clients[profile][db_name]
+    client = clients["transactional"]
+    db = databases["transactional"]
+    logger.info(f"MongoDB clients initialized for database: {db_name} ({', '.join(clients)})")
 except Exception as e:
     logger.error(f"Failed to initialize MongoDB client: {e}")
     client = None
     db = None
 
 
-def get_db():
-    """Get database instance"""
-    return db
+def get_db(profile: str = "transactional"):
+    """Get database instance for a workload profile"""
+    if profile == "transactional":
+        return db
+    if profile not in CLIENT_PROFILES:
+        raise ValueError(f"Unknown database profile '{profile}'")
+    return databases.get(profile, db)
 
 
 def get_client():
     """Get MongoDB client"""
     return client
+
+
+def pool_stats() -> dict:
+    """Pool configuration and connection wait metrics per profile"""
+    return {
+        profile: {
+            "max_pool_size": options["maxPoolSize"],
+            "read_preference": options["readPreference"],
+            "timeout_ms": options["timeoutMS"] or None,
+            **pool_monitors[profile].stats(),
+        }
+        for profile, options in CLIENT_PROFILES.items()
+        if profile in pool_monitors
+    }
+
+
+def close_clients():
+    for profile_client in clients.values():
+        profile_client.close()
+
+
+# Indexes backing hot query paths - (collection, keys, options)
+INDEXES = [
+    ("price_alerts", [("product_id", 1), ("triggered", 1), ("target_price", 1)], {}),
+    ("rating_summaries", [("product_id", 1)], {"unique": True}),
+    ("reviews", [("product_id", 1), ("created_at", -1)], {}),
+    ("carts", [("user_id", 1)], {"unique": True}),
+    ("vendor_orders", [("vendor_id", 1), ("created_at", -1)], {}),
+    ("vendor_orders", [("order_id", 1), ("vendor_id", 1)], {"unique": True}),
+    ("vendor_ledger", [("key", 1)], {"unique": True}),
+    ("vendor_ledger", [("vendor_id", 1), ("created_at", 1)], {}),
+    ("vendor_ledger", [("order_id", 1)], {"sparse": True}),
+    ("vendor_balances", [("vendor_id", 1)], {"unique": True}),
+    ("webhook_events", [("event_id", 1)], {"unique": True}),
+    ("webhook_events", [("status", 1), ("available_at", 1)], {}),
+    ("products", [("is_active", 1), ("vendor_country", 1), ("created_at", -1)], {}),
+    ("products", [("is_active", 1), ("category_id", 1), ("created_at", -1)], {}),
+    ("services", [("is_active", 1), ("vendor_country", 1)], {}),
+    ("image_audits", [("status", 1), ("started_at", -1)], {}),
+    ("image_audit_findings", [("audit_id", 1), ("vendor_id", 1)], {}),
+    ("image_url_checks", [("url", 1)], {"unique": True}),
+    ("scheduler_leases", [("id", 1)], {"unique": True}),
+]
+
+
+async def ensure_indexes():
+    """Create the indexes declared in INDEXES (idempotent, run at startup)"""
+    for collection, keys, options in INDEXES:
+        try:
+            await db[collection].create_index(keys, **options)
+        except Exception as e:
+            logger.error(f"Failed to create index on {collection} {keys}: {e}")
@@ -0,0 +1,160 @@
+"""
+AfroVending - Datetime Migration
+Converts ISO-string datetime fields to native BSON dates in resumable batches
+
+Usage:
+    python datetime_migration.py                      # every collection
+    python datetime_migration.py --collection orders --batch-size 1000 --pause 0.2
+    python datetime_migration.py --dry-run            # count what would change
+    python datetime_migration.py --status             # remaining string values
+    python datetime_migration.py --restart            # rescan from the beginning
+
+Documents are scanned in `_id` order and the last `_id` of every batch is
+checkpointed in `migrations`, so an interrupted run picks up where it
+stopped. Each update is conditioned on the field still holding the string
+that was read, so concurrent writes are never overwritten.
+
+Top-level fields ending in `_at` (plus DATETIME_FIELDS extras) are converted.
+See datetimes.py for the rollout order.
+"""
+from pymongo import UpdateOne
+import argparse
+import asyncio
+import logging
+
+from database import get_db
+from datetimes import as_datetime, timestamp
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "bson_datetimes"
+
+COLLECTIONS = [
+    "users", "vendors", "products", "services", "categories", "orders", "vendor_orders",
+    "bookings", "reviews", "review_votes", "wishlists", "price_alerts", "payouts", "shipments",
+    "notifications", "admin_notifications", "notification_preferences", "push_subscriptions",
+    "stock_alerts", "password_resets", "google_sessions", "carts",
+    "vendor_ledger", "vendor_balances",
+]
+
+# Datetime fields that don't follow the *_at naming
+DATETIME_FIELDS = {"last_login", "identity_verification_started"}
+
+# webhook_events compares its own string timestamps in the claim query and
+# homepage_snapshots matches built_at by equality; both stay as they are.
+# scheduler_logs is capped (retention.py), and a capped collection rejects
+# updates that change a document's size, so its string dates are left to age out.
+
+
+def is_datetime_field(name: str) -> bool:
+    return name.endswith("_at") or name in DATETIME_FIELDS
+
+
+def converted_fields(doc: dict) -> dict:
+    """{field: datetime} for every string datetime field of a document"""
+    converted = {}
+    for name, value in doc.items():
+        if isinstance(value, str) and is_datetime_field(name):
+            parsed = as_datetime(value)
+            if parsed is not None:
+                converted[name] = parsed
+    return converted
+
+
+async def migrate_collection(db, collection: str, batch_size: int = 500, pause: float = 0.0,
+                             dry_run: bool = False) -> dict:
+    """Convert one collection, resuming from its checkpoint"""
+    checkpoint_id = f"{MIGRATION_ID}:{collection}"
+    checkpoint = await db.migrations.find_one({"id": checkpoint_id}, {"_id": 0}) or {}
+    if checkpoint.get("done") and not dry_run:
+        return {"collection": collection, "scanned": 0, "converted": 0, "skipped": "already done"}
+
+    last_id = None if dry_run else checkpoint.get("last_id")
+    scanned = converted = 0
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = await db[collection].find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            fields = converted_fields(doc)
+            if fields:
+                original = {name: doc[name] for name in fields}
+                operations.append(UpdateOne({"_id": doc["_id"], **original}, {"$set": fields}))
+        scanned += len(batch)
+        last_id = batch[-1]["_id"]
+
+        if dry_run:
+            converted += len(operations)
+            continue
+
+        batch_converted = 0
+        if operations:
+            result = await db[collection].bulk_write(operations, ordered=False)
+            batch_converted = result.modified_count
+        converted += batch_converted
+        await db.migrations.update_one(
+            {"id": checkpoint_id},
+            {"$set": {"last_id": last_id, "updated_at": timestamp()},
+             "$inc": {"scanned": len(batch), "converted": batch_converted},
+             "$setOnInsert": {"started_at": timestamp()}},
+            upsert=True
+        )
+        if pause:
+            await asyncio.sleep(pause)
+
+    if not dry_run:
+        await db.migrations.update_one(
+            {"id": checkpoint_id},
+            {"$set": {"done": True, "finished_at": timestamp()}},
+            upsert=True
+        )
+    logger.info(f"{collection}: scanned {scanned}, converted {converted}")
+    return {"collection": collection, "scanned": scanned, "converted": converted}
+
+
+async def migration_status(db=None) -> list:
+    """Checkpoint and remaining string `created_at` values per collection"""
+    db = db if db is not None else get_db()
+    status = []
+    for collection in COLLECTIONS:
+        checkpoint = await db.migrations.find_one({"id": f"{MIGRATION_ID}:{collection}"}, {"_id": 0}) or {}
+        status.append({
+            "collection": collection,
+            "done": checkpoint.get("done", False),
+            "scanned": checkpoint.get("scanned", 0),
+            "converted": checkpoint.get("converted", 0),
+            "string_created_at": await db[collection].count_documents({"created_at": {"$type": "string"}}),
+        })
+    return status
+
+
+async def run_migration(collections=None, batch_size: int = 500, pause: float = 0.0,
+                        dry_run: bool = False, restart: bool = False, db=None) -> list:
+    db = db if db is not None else get_db()
+    collections = collections or COLLECTIONS
+    if restart and not dry_run:
+        await db.migrations.delete_many({"id": {"$in": [f"{MIGRATION_ID}:{c}" for c in collections]}})
+    return [await migrate_collection(db, c, batch_size, pause, dry_run) for c in collections]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Convert ISO-string datetimes to BSON dates")
+    parser.add_argument("--collection", action="append", choices=COLLECTIONS, help="limit to a collection (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and rescan")
+    parser.add_argument("--status", action="store_true")
+    args = parser.parse_args()
+
+    if args.status:
+        for row in asyncio.run(migration_status()):
+            print(row)
+    else:
+        for row in asyncio.run(run_migration(args.collection, args.batch_size, args.pause, args.dry_run, args.restart)):
+            print(row)
@@ -0,0 +1,73 @@
+"""
+AfroVending - Datetime Storage
+Native BSON dates with dual-format reads while ISO-string documents are migrated
+
+Rollout:
+    1. Deploy with NATIVE_DATETIMES=false: writes stay ISO strings, every
+       date query already matches both formats (`date_range`).
+    2. Set NATIVE_DATETIMES=true: `timestamp()` writes BSON dates.
+    3. Run `python datetime_migration.py` until every collection reports done.
+    4. Set DATETIME_DUAL_READS=false to drop the string branch from queries.
+
+The API keeps returning ISO-8601 strings: orjson and jsonable_encoder render
+aware datetimes as ISO, and `IsoDateTime` does the same for response models.
+"""
+from datetime import datetime, timezone
+from pydantic import BeforeValidator
+from typing import Annotated, Optional, Union
+import os
+
+NATIVE_DATETIMES = os.environ.get("NATIVE_DATETIMES", "false").lower() == "true"
+DATETIME_DUAL_READS = os.environ.get("DATETIME_DUAL_READS", "true").lower() == "true"
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def timestamp(value: Optional[datetime] = None) -> Union[datetime, str]:
+    """Value to store for a datetime field (now by default), in the configured format"""
+    value = value or utcnow()
+    return value if NATIVE_DATETIMES else value.isoformat()
+
+
+def as_datetime(value) -> Optional[datetime]:
+    """Aware datetime from a stored value in either format (None if unparseable)"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return None
+
+
+def to_iso(value):
+    """ISO string for API output; non-datetime values pass through"""
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+    return value
+
+
+# Response model field type for stored dates of either format
+IsoDateTime = Annotated[str, BeforeValidator(to_iso)]
+
+
+def date_range(field: str, gte: Optional[datetime] = None, lt: Optional[datetime] = None) -> dict:
+    """Query clause for a datetime range matching native and ISO-string values"""
+    native = {}
+    if gte is not None:
+        native["$gte"] = gte
+    if lt is not None:
+        native["$lt"] = lt
+    if not DATETIME_DUAL_READS:
+        return {field: native}
+    legacy = {op: value.isoformat() for op, value in native.items()}
+    return {"$or": [{field: native}, {field: legacy}]}
+
+
+def date_value(field: str) -> dict:
+    """Aggregation expression reading a datetime field stored in either format"""
+    return {"$toDate": f"${field}"}
@@ -0,0 +1,146 @@
+"""
+AfroVending - Realtime Event Bus
+In-process pub/sub that feeds the notification and order tracking streams
+"""
+from datetime import datetime, timezone
+from collections import defaultdict
+from contextlib import contextmanager
+import asyncio
+import logging
+import os
+
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+# When several API workers run against a replica set, events are written to a
+# small collection and every worker fans them out from a Mongo change stream.
+USE_CHANGE_STREAMS = os.environ.get("EVENT_BUS_CHANGE_STREAMS", "false").lower() == "true"
+EVENTS_COLLECTION = "realtime_events"
+EVENTS_TTL_SECONDS = 300
+
+# Slow consumers drop their oldest events instead of growing without bound
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def user_topic(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def order_topic(order_id: str) -> str:
+    return f"order:{order_id}"
+
+
+class EventBus:
+    """Topic based fan-out to asyncio queues, one queue per open stream"""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)  # topic -> set of queues
+        self._watch_task = None
+
+    @contextmanager
+    def subscribe(self, *topics: str):
+        """Register a queue for the given topics for the lifetime of the block"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        for topic in topics:
+            self._subscribers[topic].add(queue)
+        try:
+            yield queue
+        finally:
+            for topic in topics:
+                queues = self._subscribers.get(topic)
+                if queues is not None:
+                    queues.discard(queue)
+                    if not queues:
+                        del self._subscribers[topic]
+
+    def _dispatch(self, topic: str, event: dict):
+        """Deliver an event to every local subscriber of a topic"""
+        for queue in list(self._subscribers.get(topic, ())):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    async def publish(self, topic: str, event: dict):
+        """Publish an event; never raises so callers can fire and forget"""
+        try:
+            if USE_CHANGE_STREAMS:
+                db = get_db()
+                await db[EVENTS_COLLECTION].insert_one({
+                    "topic": topic,
+                    "event": event,
+                    "created_at": datetime.now(timezone.utc)
+                })
+            else:
+                self._dispatch(topic, event)
+        except Exception as e:
+            logger.error(f"Failed to publish event on {topic}: {e}")
+
+    async def start(self):
+        """Start the change stream source when multi-worker mode is enabled"""
+        if not USE_CHANGE_STREAMS or self._watch_task is not None:
+            return
+        db = get_db()
+        await db[EVENTS_COLLECTION].create_index("created_at", expireAfterSeconds=EVENTS_TTL_SECONDS)
+        self._watch_task = asyncio.create_task(self._watch_change_stream())
+        logger.info("Event bus change stream source started")
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch_change_stream(self):
+        """Relay inserts on the events collection to local subscribers"""
+        db = get_db()
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with db[EVENTS_COLLECTION].watch(pipeline) as stream:
+                    async for change in stream:
+                        doc = change["fullDocument"]
+                        self._dispatch(doc["topic"], doc["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event bus change stream error, retrying: {e}")
+                await asyncio.sleep(5)
+
+    def stats(self) -> dict:
+        return {
+            "topics": len(self._subscribers),
+            "subscribers": sum(len(q) for q in self._subscribers.values()),
+            "change_streams": USE_CHANGE_STREAMS
+        }
+
+
+event_bus = EventBus()
+
+
+async def publish_notification(notification: dict):
+    """Push a newly created in-app notification to the owning user's streams"""
+    await event_bus.publish(user_topic(notification["user_id"]), {
+        "type": "notification",
+        "notification": {k: v for k, v in notification.items() if k != "_id"}
+    })
+
+
+async def publish_order_update(order_id: str, user_id: str, status: str, **fields):
+    """Push an order status change to the tracking stream and the customer"""
+    event = {
+        "type": "order_update",
+        "order_id": order_id,
+        "status": status,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        **fields
+    }
+    await event_bus.publish(order_topic(order_id), event)
+    if user_id:
+        await event_bus.publish(user_topic(user_id), event)
@@ -0,0 +1,186 @@
+"""
+AfroVending - Streaming Exports
+CSV / NDJSON dumps of whole collections with constant memory
+
+    return export_response(db, "orders", query, "csv", compress=True)
+
+The cursor is read in EXPORT_BATCH_SIZE batches in `_id` order (always
+indexed, so no in-memory sort however many documents match) and every batch
+is encoded and handed to the StreamingResponse before the next one is read.
+With `compress` the stream is gzipped incrementally and downloaded as a
+.gz file.
+
+CSV exports the dataset's declared columns; nested values (order items,
+addresses) are written as JSON in their cell. NDJSON writes the same
+projection as one JSON document per line.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Callable, Optional
+import csv
+import io
+import zlib
+
+from datetimes import as_datetime, date_range, to_iso
+from serialization import dumps
+
+EXPORT_BATCH_SIZE = 2000
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+@dataclass
+class ExportSpec:
+    collection: str
+    columns: list                       # CSV columns, also the projection
+    date_field: str = "created_at"
+    filters: dict = field(default_factory=dict)   # query parameter -> field
+    enrich: Optional[Callable] = None   # async (db, docs) -> None, per batch
+
+
+async def _vendor_owner_emails(db, vendors: list):
+    """Owner email per vendor, one $in query per batch"""
+    user_ids = [v.get("user_id") for v in vendors if v.get("user_id")]
+    emails = {
+        u["id"]: u.get("email") async for u in db.users.find(
+            {"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "email": 1}
+        )
+    }
+    for vendor in vendors:
+        vendor["owner_email"] = emails.get(vendor.get("user_id"))
+
+
+EXPORTS = {
+    "orders": ExportSpec(
+        "orders",
+        ["id", "user_id", "status", "payment_status", "subtotal", "shipping_cost", "total",
+         "shipping_name", "shipping_city", "shipping_state", "shipping_country", "items", "created_at"],
+        filters={"status": "status", "payment_status": "payment_status", "user_id": "user_id"},
+    ),
+    "users": ExportSpec(
+        "users",
+        ["id", "email", "first_name", "last_name", "role", "vendor_id", "is_active", "created_at", "last_login"],
+        filters={"role": "role"},
+    ),
+    "vendors": ExportSpec(
+        "vendors",
+        ["id", "user_id", "owner_email", "store_name", "country", "city", "is_approved", "is_verified",
+         "product_count", "average_rating", "stripe_payouts_enabled", "created_at"],
+        filters={"is_approved": "is_approved", "is_verified": "is_verified", "country": "country"},
+        enrich=_vendor_owner_emails,
+    ),
+    "reviews": ExportSpec(
+        "reviews",
+        ["id", "product_id", "vendor_id", "user_id", "user_name", "rating", "title", "comment",
+         "verified_purchase", "helpful_votes", "created_at"],
+        filters={"product_id": "product_id", "vendor_id": "vendor_id"},
+    ),
+    "payouts": ExportSpec(
+        "payouts",
+        ["id", "vendor_id", "amount", "currency", "status", "type", "arrival_date", "created_at"],
+        filters={"vendor_id": "vendor_id", "status": "status"},
+    ),
+}
+
+BOOLEAN_VALUES = {"true": True, "false": False}
+
+
+def parse_date(value: Optional[str], name: str) -> Optional[datetime]:
+    """ISO date or datetime from a query parameter; naive values are UTC"""
+    if not value:
+        return None
+    parsed = as_datetime(value)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date or datetime")
+    return parsed
+
+
+def build_export_query(spec: ExportSpec, params, date_from: Optional[str] = None,
+                       date_to: Optional[str] = None) -> dict:
+    """Equality filters from the declared query parameters plus the date range"""
+    query = {}
+    for param, field_name in spec.filters.items():
+        value = params.get(param)
+        if value is not None and value != "":
+            query[field_name] = BOOLEAN_VALUES.get(value, value)
+    start, end = parse_date(date_from, "date_from"), parse_date(date_to, "date_to")
+    if start or end:
+        query.update(date_range(spec.date_field, gte=start, lt=end))
+    return query
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return to_iso(value)
+    if isinstance(value, (dict, list)):
+        return dumps(value).decode("utf-8")
+    return value
+
+
+async def stream_rows(db, spec: ExportSpec, query: dict, fmt: str,
+                      batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Encoded export, one chunk per cursor batch"""
+    projection = {"_id": 0, **{c: 1 for c in spec.columns}}
+    cursor = db[spec.collection].find(query, projection).sort("_id", 1).batch_size(batch_size)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(spec.columns)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    batch = []
+
+    async def encode(batch) -> bytes:
+        if spec.enrich:
+            await spec.enrich(db, batch)
+        if fmt == "ndjson":
+            return b"".join(dumps({c: doc.get(c) for c in spec.columns}) + b"\n" for doc in batch)
+        for doc in batch:
+            writer.writerow([_cell(doc.get(c)) for c in spec.columns])
+        chunk = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield await encode(batch)
+            batch = []
+    if batch:
+        yield await encode(batch)
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(db, dataset: str, query: dict, fmt: str, compress: bool = False,
+                    filename: Optional[str] = None) -> StreamingResponse:
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    spec = EXPORTS[dataset]
+    body = stream_rows(db, spec, query, fmt)
+    filename = f"{filename or dataset}.{fmt}"
+    media_type = FORMATS[fmt]
+    if compress:
+        body = gzip_stream(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
@@ -0,0 +1,348 @@
+"""
+AfroVending - Product Image Audit
+Streams the catalogue, verifies image URLs and stores the findings
+
+Usage:
+    python image_audit.py                      # run an audit now
+    python image_audit.py --concurrency 50
+
+Each URL is first classified by shape (local /uploads/ paths, localhost,
+private IP and relative URLs are broken without a request). Remote URLs get
+an async HEAD request, at most IMAGE_AUDIT_CONCURRENCY at a time, and the
+result is cached
+in `image_url_checks` for IMAGE_URL_CACHE_HOURS so the nightly audit only
+re-requests what changed.
+
+URLs are vendor supplied, so the host is resolved before every request and
+every redirect hop (followed by hand, at most IMAGE_CHECK_MAX_REDIRECTS);
+hosts resolving to loopback, private, link-local or otherwise non-public
+addresses are reported broken and never requested.
+
+An audit is one `image_audits` document (status, summary, affected vendors)
+plus one `image_audit_findings` document per product needing attention. The
+admin endpoints read the latest completed audit instead of rescanning.
+"""
+from datetime import timedelta
+from pymongo import UpdateOne
+from typing import Optional
+import argparse
+import asyncio
+import httpx
+import ipaddress
+import logging
+import os
+import uuid
+
+from database import get_db
+from datetimes import utcnow, timestamp, as_datetime
+
+logger = logging.getLogger(__name__)
+
+IMAGE_AUDIT_CONCURRENCY = int(os.environ.get("IMAGE_AUDIT_CONCURRENCY", "20"))
+IMAGE_URL_CACHE_HOURS = int(os.environ.get("IMAGE_URL_CACHE_HOURS", "24"))
+IMAGE_CHECK_TIMEOUT = float(os.environ.get("IMAGE_CHECK_TIMEOUT", "5"))
+IMAGE_CHECK_MAX_REDIRECTS = 5
+
+AUDIT_BATCH_SIZE = 500
+# A "running" audit older than this is assumed dead and no longer blocks a new one
+AUDIT_STALE_AFTER = timedelta(hours=2)
+
+PRODUCT_PROJECTION = {"_id": 0, "id": 1, "name": 1, "images": 1, "vendor_id": 1, "is_active": 1}
+
+RECOMMENDATION = (
+    "Vendors need to re-upload images for products listed above. "
+    "New uploads will use Cloudinary and persist across deployments."
+)
+
+
+# ==================== URL CHECKS ====================
+
+def image_url(image) -> str:
+    return image if isinstance(image, str) else (image or {}).get("url", "")
+
+
+def is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def classify_url(url: str) -> Optional[str]:
+    """Reason a URL is broken by its shape alone, None if it has to be requested"""
+    if "/uploads/" in url or url.startswith("/uploads"):
+        return "local ephemeral storage"
+    if url.startswith("http://localhost") or url.startswith("https://localhost"):
+        return "localhost URL"
+    if not url.startswith("http"):
+        return "relative path"
+    try:
+        host = httpx.URL(url).host
+    except httpx.InvalidURL:
+        return "invalid URL"
+    if host == "localhost" or host.endswith(".localhost"):
+        return "localhost URL"
+    try:
+        if not is_public_address(host):
+            return "private network address"
+    except ValueError:
+        pass  # a host name, resolved before it is requested
+    return None
+
+
+async def resolve_blocked(url: httpx.URL) -> Optional[str]:
+    """Reason not to request `url`, None when every address of its host is public"""
+    if url.scheme not in ("http", "https") or not url.host:
+        return "invalid URL"
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(url.host, url.port or (443 if url.scheme == "https" else 80))
+    except (UnicodeError, ValueError):
+        # e.g. an empty or over-long label that IDNA encoding rejects
+        return "invalid URL"
+    except OSError:
+        return "unreachable (DNS lookup failed)"
+    if not all(is_public_address(info[4][0]) for info in addresses):
+        return "private network address"
+    return None
+
+
+def is_cloudinary(url: str) -> bool:
+    return "cloudinary.com" in url
+
+
+class UrlChecker:
+    """Bounded-concurrency HEAD checks with a per-run and a persisted cache"""
+
+    def __init__(self, db, concurrency: int = IMAGE_AUDIT_CONCURRENCY):
+        self.db = db
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.results = {}
+        self.requested = 0
+        self.client = None
+
+    async def __aenter__(self):
+        # Redirects are followed in _fetch so every hop's host is checked first
+        self.client = httpx.AsyncClient(timeout=IMAGE_CHECK_TIMEOUT, follow_redirects=False)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    async def _fetch(self, method: str, url: str, headers: dict = None):
+        """Final response after redirects, or the reason the chain was stopped"""
+        request_url = httpx.URL(url)
+        for _ in range(IMAGE_CHECK_MAX_REDIRECTS + 1):
+            blocked = await resolve_blocked(request_url)
+            if blocked:
+                return blocked
+            self.requested += 1
+            response = await self.client.request(method, request_url, headers=headers)
+            if not response.next_request:
+                return response
+            request_url = response.next_request.url
+        return "too many redirects"
+
+    async def _request(self, url: str) -> Optional[str]:
+        async with self.semaphore:
+            try:
+                response = await self._fetch("HEAD", url)
+                if not isinstance(response, str) and response.status_code in (403, 405, 501):
+                    # Some CDNs refuse HEAD; ask for the first byte instead
+                    response = await self._fetch("GET", url, {"Range": "bytes=0-0"})
+            except httpx.HTTPError as e:
+                return f"unreachable ({type(e).__name__})"
+            except (httpx.InvalidURL, UnicodeError, ValueError):
+                # A malformed URL (or redirect target) is a finding, not an audit failure
+                return "invalid URL"
+        if isinstance(response, str):
+            return response
+        if response.status_code >= 400:
+            return f"HTTP {response.status_code}"
+        content_type = response.headers.get("content-type", "")
+        if content_type and not content_type.startswith("image/"):
+            return f"not an image ({content_type.split(';')[0]})"
+        return None
+
+    async def check_many(self, urls) -> dict:
+        """{url: reason or None} for remote URLs, requesting only uncached ones"""
+        pending = [u for u in set(urls) if u not in self.results]
+        if pending:
+            fresh_after = utcnow() - timedelta(hours=IMAGE_URL_CACHE_HOURS)
+            async for cached in self.db.image_url_checks.find({"url": {"$in": pending}}, {"_id": 0}):
+                checked_at = as_datetime(cached.get("checked_at"))
+                if checked_at and checked_at >= fresh_after:
+                    self.results[cached["url"]] = cached.get("reason")
+
+            to_request = [u for u in pending if u not in self.results]
+            reasons = await asyncio.gather(*(self._request(u) for u in to_request))
+            checked_at = utcnow()
+            for url, reason in zip(to_request, reasons):
+                self.results[url] = reason
+            if to_request:
+                # Native dates so the retention TTL index expires old entries
+                await self.db.image_url_checks.bulk_write([
+                    UpdateOne({"url": url}, {"$set": {"reason": reason, "checked_at": checked_at}}, upsert=True)
+                    for url, reason in zip(to_request, reasons)
+                ], ordered=False)
+        return {u: self.results[u] for u in urls}
+
+
+# ==================== AUDIT ====================
+
+async def _audit_batch(checker: UrlChecker, products: list) -> tuple:
+    """Findings for one batch of products, plus how many use Cloudinary only"""
+    remote = [
+        url for p in products for url in map(image_url, p.get("images") or [])
+        if classify_url(url) is None
+    ]
+    checked = await checker.check_many(remote)
+
+    findings = []
+    cloudinary = 0
+    for product in products:
+        images = [image_url(i) for i in product.get("images") or []]
+        base = {
+            "product_id": product["id"],
+            "product_name": product.get("name", ""),
+            "vendor_id": product.get("vendor_id"),
+            "is_active": product.get("is_active", True),
+        }
+        if not images:
+            findings.append({**base, "kind": "no_images", "issue": "No images uploaded"})
+            continue
+
+        broken = []
+        for url in images:
+            reason = classify_url(url) or checked.get(url)
+            if reason:
+                broken.append({"url": url, "reason": reason})
+        if broken:
+            local = all(classify_url(b["url"]) for b in broken)
+            findings.append({
+                **base,
+                "kind": "broken_images",
+                "issue": "Local/ephemeral storage images" if local else "Unreachable images",
+                "broken_urls": [b["url"] for b in broken],
+                "broken": broken,
+            })
+        elif any(is_cloudinary(url) for url in images):
+            cloudinary += 1
+    return findings, cloudinary
+
+
+async def _vendor_contacts(db, vendor_ids) -> dict:
+    """{vendor_id: {store_name, email, first_name}} with one query per collection"""
+    vendors = await db.vendors.find(
+        {"id": {"$in": list(vendor_ids)}}, {"_id": 0, "id": 1, "store_name": 1, "user_id": 1}
+    ).to_list(None)
+    users = {
+        u["id"]: u async for u in db.users.find(
+            {"id": {"$in": [v.get("user_id") for v in vendors]}}, {"_id": 0, "id": 1, "email": 1, "first_name": 1}
+        )
+    }
+    contacts = {}
+    for vendor in vendors:
+        user = users.get(vendor.get("user_id"), {})
+        contacts[vendor["id"]] = {
+            "vendor_id": vendor["id"],
+            "store_name": vendor.get("store_name", "Unknown"),
+            "email": user.get("email", "Unknown"),
+            "first_name": user.get("first_name"),
+        }
+    return contacts
+
+
+async def _claim_audit(db) -> Optional[str]:
+    """Insert a running audit, or None when another one is still in progress"""
+    running = await db.image_audits.find_one({"status": "running"}, {"_id": 0, "id": 1, "started_at": 1})
+    if running:
+        started = as_datetime(running.get("started_at"))
+        if started and utcnow() - started < AUDIT_STALE_AFTER:
+            return None
+        await db.image_audits.update_one({"id": running["id"]}, {"$set": {"status": "abandoned"}})
+
+    audit_id = str(uuid.uuid4())
+    await db.image_audits.insert_one({"id": audit_id, "status": "running", "started_at": timestamp()})
+    return audit_id
+
+
+async def run_image_audit(db=None, concurrency: int = IMAGE_AUDIT_CONCURRENCY) -> Optional[dict]:
+    """Audit every product's images; returns the finished audit (None if one is already running)"""
+    db = db if db is not None else get_db()
+    audit_id = await _claim_audit(db)
+    if audit_id is None:
+        logger.info("Image audit already running, skipping")
+        return None
+
+    summary = {"total_products": 0, "products_with_cloudinary_images": 0,
+               "products_with_broken_images": 0, "products_with_no_images": 0}
+    vendor_ids = set()
+
+    async def audit_batch(checker, batch):
+        findings, cloudinary = await _audit_batch(checker, batch)
+        summary["total_products"] += len(batch)
+        summary["products_with_cloudinary_images"] += cloudinary
+        for finding in findings:
+            summary[f"products_with_{finding['kind']}"] += 1
+            vendor_ids.add(finding["vendor_id"])
+        if findings:
+            await db.image_audit_findings.insert_many([{**f, "audit_id": audit_id} for f in findings])
+
+    try:
+        async with UrlChecker(db, concurrency) as checker:
+            batch = []
+            async for product in db.products.find({}, PRODUCT_PROJECTION).batch_size(AUDIT_BATCH_SIZE):
+                batch.append(product)
+                if len(batch) == AUDIT_BATCH_SIZE:
+                    await audit_batch(checker, batch)
+                    batch = []
+            if batch:
+                await audit_batch(checker, batch)
+            summary["urls_requested"] = checker.requested
+
+        contacts = await _vendor_contacts(db, vendor_ids)
+    except Exception as e:
+        logger.error(f"Image audit {audit_id} failed: {e}")
+        await db.image_audits.update_one(
+            {"id": audit_id}, {"$set": {"status": "failed", "error": str(e), "finished_at": timestamp()}}
+        )
+        raise
+
+    audit = {
+        "status": "completed",
+        "finished_at": timestamp(),
+        "summary": {
+            **summary,
+            "total_needing_attention": summary["products_with_broken_images"] + summary["products_with_no_images"],
+        },
+        "vendors": list(contacts.values()),
+    }
+    await db.image_audits.update_one({"id": audit_id}, {"$set": audit})
+    # Only the latest completed audit is ever read
+    await db.image_audit_findings.delete_many({"audit_id": {"$ne": audit_id}})
+    logger.info(f"Image audit {audit_id}: {audit['summary']}")
+    return {"id": audit_id, **audit}
+
+
+# ==================== READS ====================
+
+async def latest_audit(db=None, status: Optional[str] = "completed") -> Optional[dict]:
+    db = db if db is not None else get_db()
+    query = {"status": status} if status else {}
+    return await db.image_audits.find_one(query, {"_id": 0}, sort=[("started_at", -1)])
+
+
+async def audit_findings(audit: dict, db=None) -> list:
+    db = db if db is not None else get_db()
+    return await db.image_audit_findings.find(
+        {"audit_id": audit["id"]}, {"_id": 0, "audit_id": 0}
+    ).sort("vendor_id", 1).to_list(None)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Audit product image URLs")
+    parser.add_argument("--concurrency", type=int, default=IMAGE_AUDIT_CONCURRENCY)
+    args = parser.parse_args()
+    result = asyncio.run(run_image_audit(concurrency=args.concurrency))
+    print(result["summary"] if result else "An audit is already running")
@@ -12,6 +12,8 @@ from io import BytesIO
 from datetime import datetime
 import os
 
+from datetimes import as_datetime
+
 # AfroVending brand colors
 BRAND_RED = colors.HexColor('#DC2626')
 BRAND_DARK = colors.HexColor('#1F2937')
@@ -88,7 +90,7 @@ class InvoiceGenerator:
         order_date = order_data.get('created_at', '')
         if order_date:
             try:
-                order_date = datetime.fromisoformat(order_date.replace('Z', '+00:00')).strftime("%B %d, %Y")
+                order_date = as_datetime(order_date).strftime("%B %d, %Y")
             except:
                 order_date = invoice_date
         
@@ -0,0 +1,240 @@
+"""
+AfroVending - Vendor Ledger Service
+Append-only vendor earnings ledger with a materialized balance per vendor
+
+Every money movement for a vendor is one entry in `vendor_ledger`:
+    sale            vendor's subtotal of a paid order (starts as pending revenue)
+    commission      platform commission on that sale
+    settlement      sale delivered/completed, pending revenue becomes settled
+    refund          order refunded (commission is returned with it)
+    payout          payout sent to the vendor's Stripe account
+    payout_reversal payout failed or was canceled
+
+Entries carry a unique `key` so replayed webhooks and retries post once.
+Each posted entry $inc's the vendor's `vendor_balances` document, so the
+earnings summary is a single document read.
+
+Run `python ledger_service.py` to replay the ledger into fresh balances, or
+`python ledger_service.py --backfill` to first post entries for paid
+sub-orders and payouts recorded before the ledger existed.
+"""
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from collections import defaultdict
+import asyncio
+import logging
+import sys
+import uuid
+
+from database import get_db
+from datetimes import timestamp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMMISSION_RATE = 15
+SETTLED_STATUSES = ("delivered", "completed")
+
+BALANCE_FIELDS = ["sales", "commission", "refunds", "payouts", "pending_revenue", "settled_sales"]
+
+
+def balance_delta(entry: dict) -> dict:
+    """How one ledger entry moves the vendor's balance counters"""
+    amount = entry["amount"]
+    entry_type = entry["type"]
+    if entry_type == "sale":
+        return {"sales": amount, "pending_revenue": amount}
+    if entry_type == "commission":
+        return {"commission": amount}
+    if entry_type == "settlement":
+        return {"pending_revenue": -amount, "settled_sales": amount}
+    if entry_type == "refund":
+        bucket = "settled_sales" if entry.get("settled") else "pending_revenue"
+        return {"refunds": amount, "commission": -entry.get("commission", 0), bucket: -amount}
+    if entry_type == "payout":
+        return {"payouts": amount}
+    if entry_type == "payout_reversal":
+        return {"payouts": -amount}
+    raise ValueError(f"Unknown ledger entry type: {entry_type}")
+
+
+async def post_entry(db, vendor_id: str, entry_type: str, amount: float, key: str, **fields) -> bool:
+    """Append an entry and apply it to the vendor balance; False if the key was already posted"""
+    entry = {
+        "id": str(uuid.uuid4()),
+        "key": key,
+        "vendor_id": vendor_id,
+        "type": entry_type,
+        "amount": round(float(amount), 2),
+        "created_at": timestamp(),
+        **fields
+    }
+    try:
+        await db.vendor_ledger.insert_one(dict(entry))
+    except DuplicateKeyError:
+        return False
+
+    await db.vendor_balances.update_one(
+        {"vendor_id": vendor_id},
+        {
+            "$inc": {**balance_delta(entry), "entry_count": 1},
+            "$set": {"updated_at": entry["created_at"]}
+        },
+        upsert=True
+    )
+    return True
+
+
+async def _commission_rates(db, vendor_ids) -> dict:
+    vendors = db.vendors.find(
+        {"id": {"$in": list(vendor_ids)}},
+        {"_id": 0, "id": 1, "commission_rate": 1}
+    )
+    return {v["id"]: v.get("commission_rate", DEFAULT_COMMISSION_RATE) async for v in vendors}
+
+
+async def record_order_sales(db, order_id: str):
+    """Post sale + commission entries for every vendor slice of a paid order"""
+    sub_orders = await db.vendor_orders.find({"order_id": order_id}, {"_id": 0}).to_list(None)
+    rates = await _commission_rates(db, {s["vendor_id"] for s in sub_orders})
+
+    for sub_order in sub_orders:
+        vendor_id = sub_order["vendor_id"]
+        rate = rates.get(vendor_id, DEFAULT_COMMISSION_RATE)
+        subtotal = sub_order["subtotal"]
+        await post_entry(db, vendor_id, "sale", subtotal, f"sale:{order_id}:{vendor_id}", order_id=order_id)
+        await post_entry(
+            db, vendor_id, "commission", subtotal * rate / 100, f"commission:{order_id}:{vendor_id}",
+            order_id=order_id, commission_rate=rate
+        )
+
+
+async def record_order_settlements(db, order_id: str, vendor_id: str = None):
+    """Move delivered sales from pending to settled revenue"""
+    query = {"order_id": order_id, "type": "sale"}
+    if vendor_id:
+        query["vendor_id"] = vendor_id
+    async for sale in db.vendor_ledger.find(query, {"_id": 0}):
+        await post_entry(
+            db, sale["vendor_id"], "settlement", sale["amount"],
+            f"settlement:{order_id}:{sale['vendor_id']}", order_id=order_id
+        )
+
+
+async def record_order_refunds(db, order_id: str):
+    """Reverse every vendor's sale (and the platform's commission) for a refunded order"""
+    entries = await db.vendor_ledger.find({"order_id": order_id}, {"_id": 0}).to_list(None)
+    by_vendor = defaultdict(dict)
+    for entry in entries:
+        by_vendor[entry["vendor_id"]][entry["type"]] = entry
+
+    for vendor_id, posted in by_vendor.items():
+        if "sale" not in posted:
+            continue
+        await post_entry(
+            db, vendor_id, "refund", posted["sale"]["amount"], f"refund:{order_id}:{vendor_id}",
+            order_id=order_id,
+            commission=posted.get("commission", {}).get("amount", 0),
+            settled="settlement" in posted
+        )
+
+
+async def record_payout(db, payout: dict):
+    """Post a payout (manual, automatic or seen first in a webhook)"""
+    if payout.get("vendor_id"):
+        await post_entry(
+            db, payout["vendor_id"], "payout", payout.get("amount", 0),
+            f"payout:{payout['id']}", payout_id=payout["id"]
+        )
+
+
+async def record_payout_reversal(db, payout: dict):
+    """Return a failed or canceled payout to the vendor's balance"""
+    posted = await db.vendor_ledger.find_one({"key": f"payout:{payout['id']}"}, {"_id": 0})
+    if posted:
+        await post_entry(
+            db, posted["vendor_id"], "payout_reversal", posted["amount"],
+            f"payout_reversal:{payout['id']}", payout_id=payout["id"]
+        )
+
+
+def summarize_balance(balance: dict) -> dict:
+    """Derived figures for the earnings summary"""
+    balance = {field: round(balance.get(field, 0), 2) for field in BALANCE_FIELDS}
+    net = balance["sales"] - balance["refunds"] - balance["commission"]
+    balance["net_earnings"] = round(net, 2)
+    balance["unpaid_earnings"] = round(net - balance["payouts"], 2)
+    return balance
+
+
+async def get_vendor_balance(db, vendor_id: str) -> dict:
+    balance = await db.vendor_balances.find_one({"vendor_id": vendor_id}, {"_id": 0}) or {}
+    return {**balance, **summarize_balance(balance)}
+
+
+async def reconcile_ledger(db=None, vendor_id: str = None) -> dict:
+    """Rebuild balances by replaying the ledger (all vendors, or one)"""
+    db = db if db is not None else get_db()
+    query = {"vendor_id": vendor_id} if vendor_id else {}
+    now = timestamp()
+
+    balances = {}
+    async for entry in db.vendor_ledger.find(query, {"_id": 0}).sort("created_at", 1):
+        balance = balances.setdefault(entry["vendor_id"], {
+            "vendor_id": entry["vendor_id"], "entry_count": 0, "updated_at": now,
+            **{field: 0 for field in BALANCE_FIELDS}
+        })
+        for field, delta in balance_delta(entry).items():
+            balance[field] += delta
+        balance["entry_count"] += 1
+
+    if balances:
+        await db.vendor_balances.bulk_write([
+            ReplaceOne({"vendor_id": vid}, balance, upsert=True)
+            for vid, balance in balances.items()
+        ], ordered=False)
+
+    # Balances with no entries left behind them
+    if vendor_id:
+        stale_query = {"vendor_id": vendor_id} if vendor_id not in balances else None
+    else:
+        stale_query = {"vendor_id": {"$nin": list(balances.keys())}}
+    removed = (await db.vendor_balances.delete_many(stale_query)).deleted_count if stale_query else 0
+
+    logger.info(f"Reconciled {len(balances)} vendor balances, removed {removed}")
+    return {"reconciled": len(balances), "removed": removed}
+
+
+async def backfill_ledger(db=None) -> dict:
+    """Post entries for paid sub-orders and payouts that predate the ledger (idempotent)"""
+    db = db if db is not None else get_db()
+    orders = 0
+    async for sub_order in db.vendor_orders.find(
+        {"payment_status": "paid"}, {"_id": 0, "order_id": 1, "vendor_id": 1, "status": 1}
+    ):
+        await record_order_sales(db, sub_order["order_id"])
+        if sub_order.get("status") in SETTLED_STATUSES:
+            await record_order_settlements(db, sub_order["order_id"], sub_order["vendor_id"])
+        elif sub_order.get("status") == "refunded":
+            await record_order_refunds(db, sub_order["order_id"])
+        orders += 1
+
+    payouts = 0
+    async for payout in db.payouts.find({}, {"_id": 0}):
+        await record_payout(db, payout)
+        if payout.get("status") in ("failed", "canceled"):
+            await record_payout_reversal(db, payout)
+        payouts += 1
+
+    return {"sub_orders": orders, "payouts": payouts}
+
+
+async def _main(backfill: bool):
+    result = {}
+    if backfill:
+        result["backfill"] = await backfill_ledger()
+    result["reconcile"] = await reconcile_ledger()
+    return result
+
+
+if __name__ == "__main__":
+    print(asyncio.run(_main("--backfill" in sys.argv)))
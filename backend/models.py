@@ -5,6 +5,8 @@ All request/response models for the API
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 
+from datetimes import IsoDateTime
+
 
 # ==================== USER MODELS ====================
 class UserCreate(BaseModel):
@@ -28,7 +30,7 @@ class UserResponse(BaseModel):
     role: str
     picture: Optional[str] = None
     vendor_id: Optional[str] = None
-    created_at: str
+    created_at: IsoDateTime
 
 
 class TokenResponse(BaseModel):
@@ -60,7 +62,7 @@ class VendorResponse(BaseModel):
     total_sales: float = 0
     product_count: int = 0
     average_rating: float = 0
-    created_at: str
+    created_at: IsoDateTime
 
 
 # ==================== PRODUCT MODELS ====================
@@ -91,7 +93,28 @@ class ProductResponse(BaseModel):
     fulfillment_option: str = "FBV"
     average_rating: float = 0
     review_count: int = 0
-    created_at: str
+    created_at: IsoDateTime
+
+
+class ProductSelection(BaseModel):
+    """A vendor's products to act on: the listed ids and/or every product matching the filters"""
+    product_ids: Optional[List[str]] = None
+    category_id: Optional[str] = None
+    tag: Optional[str] = None
+    is_active: Optional[bool] = None
+    max_stock: Optional[int] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+
+class ProductBulkEdit(BaseModel):
+    selection: ProductSelection
+    price_change_percent: Optional[float] = Field(None, gt=-100)  # -10 = 10% off
+    price_change_amount: Optional[float] = None                   # -5 = $5 off
+    stock: Optional[int] = Field(None, ge=0)
+    stock_change: Optional[int] = None
+    is_active: Optional[bool] = None
+    dry_run: bool = False
 
 
 # ==================== SERVICE MODELS ====================
@@ -122,7 +145,7 @@ class ServiceResponse(BaseModel):
     is_active: bool
     average_rating: float = 0
     review_count: int = 0
-    created_at: str
+    created_at: IsoDateTime
 
 
 # ==================== BOOKING MODELS ====================
@@ -147,7 +170,7 @@ class BookingResponse(BaseModel):
     price: float
     notes: Optional[str] = None
     delivery_confirmed: bool = False
-    created_at: str
+    created_at: IsoDateTime
 
 
 # ==================== ORDER MODELS ====================
@@ -171,7 +194,7 @@ class OrderResponse(BaseModel):
     status: str
     payment_status: str
     shipping_address: str
-    created_at: str
+    created_at: IsoDateTime
 
 
 # ==================== REVIEW MODELS ====================
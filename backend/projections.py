@@ -0,0 +1,123 @@
+"""
+AfroVending - Response Projections
+Sparse fieldsets (`fields=`) and named compact views (`view=`) for list endpoints
+
+Routes take the projection as a dependency:
+
+    projection: dict = Depends(projection_for("products"))
+
+and pass it straight to `find()`. Without `fields` or `view` the route keeps
+returning full documents, so existing clients are unaffected.
+"""
+from fastapi import HTTPException, Query
+from typing import Optional
+import re
+
+# Named views per resource. `{"$slice": n}` keeps only the first n array items.
+VIEWS = {
+    "products": {
+        "card": {
+            "id": 1, "name": 1, "price": 1, "compare_price": 1, "images": {"$slice": 1},
+            "average_rating": 1, "review_count": 1, "stock": 1, "category_id": 1, "is_featured": 1,
+            "vendor_id": 1, "vendor_name": 1, "vendor_verified": 1, "vendor_is_verified": 1,
+            "vendor_country": 1
+        },
+    },
+    "services": {
+        "card": {
+            "id": 1, "name": 1, "price": 1, "price_type": 1, "images": {"$slice": 1},
+            "average_rating": 1, "review_count": 1, "duration_minutes": 1, "location_type": 1,
+            "category_id": 1, "vendor_id": 1, "vendor_name": 1, "vendor_is_verified": 1, "vendor_country": 1
+        },
+    },
+    "vendors": {
+        "card": {
+            "id": 1, "user_id": 1, "store_name": 1, "logo_url": 1, "banner_url": 1, "city": 1, "country": 1,
+            "is_verified": 1, "is_approved": 1, "average_rating": 1, "product_count": 1
+        },
+    },
+    "orders": {
+        "summary": {
+            "id": 1, "user_id": 1, "status": 1, "payment_status": 1, "total": 1, "created_at": 1,
+            "tracking_number": 1, "shipping_address": 1, "shipping_city": 1,
+            "items.product_id": 1, "items.name": 1, "items.product_name": 1, "items.quantity": 1,
+            "items.price": 1, "items.item_total": 1, "items.vendor_id": 1
+        },
+    },
+    "users": {
+        "summary": {
+            "id": 1, "email": 1, "first_name": 1, "last_name": 1, "role": 1, "vendor_id": 1,
+            "is_active": 1, "created_at": 1
+        },
+    },
+}
+
+# Views that add to another view
+VIEWS["products"]["summary"] = {**VIEWS["products"]["card"], "description": 1}
+VIEWS["services"]["summary"] = {**VIEWS["services"]["card"], "description": 1}
+VIEWS["vendors"]["summary"] = {**VIEWS["vendors"]["card"], "description": 1}
+
+# Never returned, whatever the client asks for
+HIDDEN_FIELDS = {
+    "users": ["password_hash", "hashed_password"],
+}
+
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+MAX_FIELDS = 50
+
+
+def build_projection(resource: str, fields: Optional[str] = None, view: Optional[str] = None, always=()) -> dict:
+    """Mongo projection for a resource; raises ValueError on unknown views or bad field names"""
+    hidden = HIDDEN_FIELDS.get(resource, [])
+
+    if not fields and not view:
+        return {"_id": 0, **{field: 0 for field in hidden}}
+
+    projection = {}
+    if view:
+        views = VIEWS.get(resource, {})
+        if view not in views:
+            raise ValueError(f"Unknown view '{view}'. Available: {', '.join(sorted(views)) or 'none'}")
+        projection.update(views[view])
+
+    if fields:
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        if len(names) > MAX_FIELDS:
+            raise ValueError(f"At most {MAX_FIELDS} fields may be requested")
+        for name in names:
+            if not FIELD_NAME.match(name):
+                raise ValueError(f"Invalid field name '{name}'")
+            projection.setdefault(name, 1)
+
+    for name in ("id", *always):
+        projection.setdefault(name, 1)
+
+    # Mongo rejects a path next to one of its own sub-paths ("items" + "items.name")
+    projection = {
+        name: spec for name, spec in projection.items()
+        if not any(name.startswith(f"{other}.") for other in projection)
+        and not any(name == h or name.startswith(f"{h}.") for h in hidden)
+    }
+    projection["_id"] = 0
+    return projection
+
+
+def aggregation_projection(projection: dict) -> dict:
+    """Rewrite find()-style `{"$slice": n}` entries for a $project stage"""
+    return {
+        field: {"$slice": [f"${field}", spec["$slice"]]} if isinstance(spec, dict) and "$slice" in spec else spec
+        for field, spec in projection.items()
+    }
+
+
+def projection_for(resource: str, always=()):
+    """FastAPI dependency reading `fields` and `view` query parameters"""
+    def dependency(
+        fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+        view: Optional[str] = Query(None, description="Named compact view, e.g. card")
+    ) -> dict:
+        try:
+            return build_projection(resource, fields, view, always)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return dependency
@@ -0,0 +1,110 @@
+"""
+AfroVending - Rating Summary Service
+Per-product review counters maintained incrementally with $inc
+
+Each product has one document in `rating_summaries`:
+    {"product_id", "count", "sum", "stars": {"1": n, ..., "5": n}}
+
+Run `python rating_service.py` to rebuild every summary from the reviews
+collection (backfill, or repair after manual data changes).
+"""
+from pymongo import ReturnDocument, ReplaceOne
+import asyncio
+import logging
+
+from database import get_db
+from datetimes import timestamp
+from conditional import versioned
+
+logger = logging.getLogger(__name__)
+
+
+async def apply_review(db, product_id: str, rating: int, delta: int = 1):
+    """Add (delta=1) or remove (delta=-1) one review from a product's summary"""
+    summary = await db.rating_summaries.find_one_and_update(
+        {"product_id": product_id},
+        {
+            "$inc": {"count": delta, "sum": rating * delta, f"stars.{rating}": delta},
+            "$set": {"updated_at": timestamp()}
+        },
+        upsert=True,
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    await _sync_product_rating(db, product_id, summary)
+    return summary
+
+
+async def _sync_product_rating(db, product_id: str, summary: dict):
+    """Copy the summary's average/count onto the product document used by listings"""
+    count = max(summary.get("count", 0), 0)
+    average = round(summary.get("sum", 0) / count, 1) if count else 0
+    await db.products.update_one(
+        {"id": product_id},
+        versioned({"$set": {"average_rating": average, "review_count": count}})
+    )
+
+
+async def get_rating_summary(db, product_id: str) -> dict:
+    """Total and per-star distribution for a product in a single document read"""
+    summary = await db.rating_summaries.find_one({"product_id": product_id}, {"_id": 0})
+    if not summary:
+        return {"total": 0, "distribution": {}}
+
+    distribution = {star: n for star, n in summary.get("stars", {}).items() if n > 0}
+    return {"total": summary.get("count", 0), "distribution": distribution}
+
+
+async def delete_rating_summary(db, product_id: str):
+    await db.rating_summaries.delete_one({"product_id": product_id})
+
+
+async def rebuild_rating_summaries(db=None) -> dict:
+    """Recompute every summary from the reviews collection"""
+    db = db if db is not None else get_db()
+    now = timestamp()
+
+    pipeline = [
+        {"$match": {"product_id": {"$ne": None}}},
+        {"$group": {
+            "_id": {"product_id": "$product_id", "rating": "$rating"},
+            "count": {"$sum": 1}
+        }}
+    ]
+
+    summaries = {}
+    async for row in db.reviews.aggregate(pipeline, allowDiskUse=True):
+        product_id = row["_id"]["product_id"]
+        rating = row["_id"]["rating"]
+        summary = summaries.setdefault(product_id, {
+            "product_id": product_id, "count": 0, "sum": 0, "stars": {}, "updated_at": now
+        })
+        summary["count"] += row["count"]
+        summary["sum"] += rating * row["count"]
+        summary["stars"][str(rating)] = row["count"]
+
+    if summaries:
+        await db.rating_summaries.bulk_write([
+            ReplaceOne({"product_id": pid}, summary, upsert=True)
+            for pid, summary in summaries.items()
+        ], ordered=False)
+
+    # Summaries for products that no longer have any reviews
+    stale_query = {"product_id": {"$nin": list(summaries.keys())}}
+    stale_ids = await db.rating_summaries.distinct("product_id", stale_query)
+    await db.rating_summaries.delete_many(stale_query)
+    if stale_ids:
+        await db.products.update_many(
+            {"id": {"$in": stale_ids}},
+            versioned({"$set": {"average_rating": 0, "review_count": 0}})
+        )
+
+    for product_id, summary in summaries.items():
+        await _sync_product_rating(db, product_id, summary)
+
+    logger.info(f"Rebuilt {len(summaries)} rating summaries, removed {len(stale_ids)} stale")
+    return {"rebuilt": len(summaries), "removed": len(stale_ids)}
+
+
+if __name__ == "__main__":
+    print(asyncio.run(rebuild_rating_summaries()))
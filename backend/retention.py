@@ -0,0 +1,245 @@
+"""
+AfroVending - Data Retention
+Expiry, capping and archiving policies for ephemeral collections
+
+Every collection that only matters for a while declares one policy in
+RETENTION_POLICIES:
+
+    ttl       a TTL index on `field`; MongoDB deletes documents `max_age`
+              after that date (optionally only those matching `filter`)
+    capped    a capped collection of `max_bytes` / `max_documents`
+    archive   documents idle for `max_age` are copied to `<collection>_archive`
+              and then deleted by the sweeper (needs application logic, e.g.
+              a cart's last activity is `updated_at` or else `created_at`)
+
+`apply_retention_policies()` creates the indexes / capped collections at
+startup. `sweep_retention()` runs from the scheduler: it archives, trims
+collections that are not capped yet and deletes expired documents whose
+date is still an ISO string - TTL indexes only see BSON dates (see
+datetimes.py), so until the migration is done the sweeper covers the rest.
+"""
+from dataclasses import dataclass, field as dataclass_field
+from datetime import timedelta
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+from typing import Optional
+import logging
+import os
+
+from database import get_db
+from datetimes import utcnow, date_range, to_iso
+
+logger = logging.getLogger(__name__)
+
+ABANDONED_CART_DAYS = int(os.environ.get("ABANDONED_CART_DAYS", "30"))
+READ_NOTIFICATION_DAYS = int(os.environ.get("READ_NOTIFICATION_DAYS", "30"))
+SCHEDULER_LOG_MAX_MB = int(os.environ.get("SCHEDULER_LOG_MAX_MB", "16"))
+RETENTION_SWEEP_INTERVAL = int(os.environ.get("RETENTION_SWEEP_INTERVAL", "3600"))
+# convertToCapped rewrites the collection under an exclusive lock; opt in explicitly
+RETENTION_CONVERT_CAPPED = os.environ.get("RETENTION_CONVERT_CAPPED", "false").lower() == "true"
+
+SWEEP_BATCH_SIZE = 500
+
+# IndexOptionsConflict / IndexKeySpecsConflict
+INDEX_CONFLICT_CODES = (85, 86)
+
+
+@dataclass
+class RetentionPolicy:
+    collection: str
+    kind: str                              # "ttl" | "capped" | "archive"
+    field: Optional[str] = None            # date the age is measured from
+    max_age: timedelta = timedelta(0)
+    filter: dict = dataclass_field(default_factory=dict)
+    fallback_field: Optional[str] = None   # used when `field` is missing (archive)
+    max_bytes: int = 0                     # capped
+    max_documents: int = 0                 # capped
+
+    @property
+    def archive_collection(self) -> str:
+        return f"{self.collection}_archive"
+
+    def describe(self) -> dict:
+        if self.kind == "capped":
+            return {"kind": "capped", "max_bytes": self.max_bytes, "max_documents": self.max_documents}
+        return {
+            "kind": self.kind,
+            "field": self.field,
+            "max_age_seconds": int(self.max_age.total_seconds()),
+            "filter": self.filter,
+        }
+
+
+RETENTION_POLICIES = [
+    RetentionPolicy("password_resets", "ttl", "expires_at", timedelta(days=1)),
+    RetentionPolicy("google_sessions", "ttl", "expires_at"),
+    # checkout only looks back one day when deduplicating low stock alerts
+    RetentionPolicy("stock_alerts", "ttl", "created_at", timedelta(days=7)),
+    RetentionPolicy("notifications", "ttl", "read_at", timedelta(days=READ_NOTIFICATION_DAYS), filter={"read": True}),
+    RetentionPolicy("webhook_events", "ttl", "expire_at"),
+    RetentionPolicy("scheduler_logs", "capped", max_bytes=SCHEDULER_LOG_MAX_MB * 1024 * 1024, max_documents=10000),
+    RetentionPolicy("carts", "archive", "updated_at", timedelta(days=ABANDONED_CART_DAYS), fallback_field="created_at"),
+    RetentionPolicy("carts_archive", "ttl", "archived_at", timedelta(days=180)),
+    RetentionPolicy("image_url_checks", "ttl", "checked_at", timedelta(days=7)),
+]
+
+
+# ==================== STARTUP ====================
+
+async def _apply_ttl(db, policy: RetentionPolicy):
+    seconds = int(policy.max_age.total_seconds())
+    options = {"expireAfterSeconds": seconds}
+    if policy.filter:
+        options["partialFilterExpression"] = policy.filter
+    try:
+        await db[policy.collection].create_index([(policy.field, 1)], **options)
+    except OperationFailure as e:
+        if e.code not in INDEX_CONFLICT_CODES:
+            raise
+        # Same key, different expiry: change it in place instead of rebuilding
+        await db.command({
+            "collMod": policy.collection,
+            "index": {"keyPattern": {policy.field: 1}, "expireAfterSeconds": seconds}
+        })
+
+
+async def _apply_capped(db, policy: RetentionPolicy):
+    if policy.collection not in await db.list_collection_names():
+        await db.create_collection(
+            policy.collection, capped=True, size=policy.max_bytes, max=policy.max_documents
+        )
+        return
+
+    options = await db[policy.collection].options()
+    if options.get("capped"):
+        return
+    if RETENTION_CONVERT_CAPPED:
+        await db.command({"convertToCapped": policy.collection, "size": policy.max_bytes})
+    else:
+        logger.warning(
+            f"{policy.collection} is not capped; the retention sweep trims it to "
+            f"{policy.max_documents} documents (set RETENTION_CONVERT_CAPPED=true to convert)"
+        )
+
+
+async def apply_retention_policies(db=None):
+    """Create TTL indexes and capped collections (idempotent, run at startup)"""
+    db = db if db is not None else get_db()
+    for policy in RETENTION_POLICIES:
+        try:
+            if policy.kind == "ttl":
+                await _apply_ttl(db, policy)
+            elif policy.kind == "capped":
+                await _apply_capped(db, policy)
+        except Exception as e:
+            logger.error(f"Failed to apply {policy.kind} retention to {policy.collection}: {e}")
+
+
+# ==================== SWEEPER ====================
+
+def expired_query(policy: RetentionPolicy, now=None) -> dict:
+    """Documents past the policy's age, with the date in either storage format"""
+    cutoff = (now or utcnow()) - policy.max_age
+    clause = date_range(policy.field, lt=cutoff)
+    if policy.fallback_field:
+        clause = {"$or": [
+            clause,
+            {"$and": [{policy.field: {"$exists": False}}, date_range(policy.fallback_field, lt=cutoff)]}
+        ]}
+    return {"$and": [policy.filter, clause]} if policy.filter else clause
+
+
+async def _sweep_ttl_strings(db, policy: RetentionPolicy, now) -> int:
+    """Delete what the TTL index can't see: expired documents with a string date"""
+    cutoff = (now - policy.max_age).isoformat()
+    result = await db[policy.collection].delete_many({
+        **policy.filter,
+        policy.field: {"$type": "string", "$lt": cutoff}
+    })
+    return result.deleted_count
+
+
+async def _sweep_archive(db, policy: RetentionPolicy, now) -> int:
+    """Copy idle documents to the archive collection, then delete them"""
+    query = expired_query(policy, now)
+    archived = 0
+    while True:
+        batch = await db[policy.collection].find(query).limit(SWEEP_BATCH_SIZE).to_list(SWEEP_BATCH_SIZE)
+        if not batch:
+            break
+        # Upserts keyed on _id, so a sweep interrupted between the two steps can be rerun
+        await db[policy.archive_collection].bulk_write([
+            ReplaceOne({"_id": doc["_id"]}, {**doc, "archived_at": now}, upsert=True) for doc in batch
+        ], ordered=False)
+        # Re-check the age so documents touched since the read stay put
+        result = await db[policy.collection].delete_many({
+            "$and": [{"_id": {"$in": [doc["_id"] for doc in batch]}}, query]
+        })
+        archived += result.deleted_count
+        if len(batch) < SWEEP_BATCH_SIZE:
+            break
+    return archived
+
+
+async def _sweep_capped(db, policy: RetentionPolicy) -> int:
+    """Trim a collection that should be capped but isn't yet, oldest first"""
+    options = await db[policy.collection].options()
+    if options.get("capped") or not policy.max_documents:
+        return 0
+    boundary = await db[policy.collection].find({}, {"_id": 1}).sort("_id", -1).skip(policy.max_documents).limit(1).to_list(1)
+    if not boundary:
+        return 0
+    result = await db[policy.collection].delete_many({"_id": {"$lte": boundary[0]["_id"]}})
+    return result.deleted_count
+
+
+async def sweep_retention(db=None) -> dict:
+    """Run the application-side part of every policy; returns removed counts per collection"""
+    db = db if db is not None else get_db()
+    now = utcnow()
+    removed = {}
+    for policy in RETENTION_POLICIES:
+        try:
+            if policy.kind == "ttl":
+                count = await _sweep_ttl_strings(db, policy, now)
+            elif policy.kind == "archive":
+                count = await _sweep_archive(db, policy, now)
+            else:
+                count = await _sweep_capped(db, policy)
+        except Exception as e:
+            logger.error(f"Retention sweep failed for {policy.collection}: {e}")
+            count = None
+        removed[policy.collection] = count
+    return {"removed": removed, "swept_at": to_iso(now)}
+
+
+# ==================== REPORTING ====================
+
+async def _collection_size(db, collection: str) -> dict:
+    try:
+        stats = await db.command("collStats", collection)
+    except Exception:
+        return {"count": await db[collection].estimated_document_count()}
+    return {
+        "count": stats.get("count", 0),
+        "size_bytes": stats.get("size", 0),
+        "storage_bytes": stats.get("storageSize", 0),
+        "index_bytes": stats.get("totalIndexSize", 0),
+        "capped": stats.get("capped", False),
+    }
+
+
+async def retention_report(db=None) -> dict:
+    """Policies with current collection sizes and the last sweep"""
+    db = db if db is not None else get_db()
+    collections = []
+    for policy in RETENTION_POLICIES:
+        collections.append({
+            "collection": policy.collection,
+            "policy": policy.describe(),
+            **await _collection_size(db, policy.collection),
+        })
+    last_sweep = await db.scheduler_logs.find_one(
+        {"job": "sweep_retention"}, {"_id": 0}, sort=[("_id", -1)]
+    )
+    return {"collections": collections, "last_sweep": last_sweep}
@@ -1,7 +1,7 @@
 """
 AfroVending - Admin Routes
 """
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List
 import uuid
@@ -9,8 +9,19 @@ import bcrypt
 import os
 
 from database import get_db
+from datetimes import timestamp, date_range, date_value, to_iso
 from auth import get_current_user
 from email_service import email_service
+from event_bus import publish_order_update
+from vendor_order_service import sync_vendor_orders
+from ledger_service import record_order_settlements, record_order_refunds, reconcile_ledger, SETTLED_STATUSES
+from rating_service import apply_review, delete_rating_summary, rebuild_rating_summaries
+from routes.homepage import request_homepage_refresh
+from projections import projection_for
+from vendor_attributes import (
+    vendor_attributes, propagate_vendor_attributes, touches_vendor_attributes, backfill_vendor_attributes
+)
+from conditional import version_fields, versioned
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -25,14 +36,14 @@ async def require_admin(user: dict = Depends(get_current_user)):
 @router.get("/stats")
 async def get_admin_stats(user: dict = Depends(require_admin)):
     """Get admin dashboard statistics"""
-    db = get_db()
+    db = get_db("analytics")
     now = datetime.now(timezone.utc)
-    thirty_days_ago = (now - timedelta(days=30)).isoformat()
-    seven_days_ago = (now - timedelta(days=7)).isoformat()
+    thirty_days_ago = now - timedelta(days=30)
+    seven_days_ago = now - timedelta(days=7)
     
     total_users = await db.users.count_documents({})
-    new_users_30d = await db.users.count_documents({"created_at": {"$gte": thirty_days_ago}})
-    new_users_7d = await db.users.count_documents({"created_at": {"$gte": seven_days_ago}})
+    new_users_30d = await db.users.count_documents(date_range("created_at", gte=thirty_days_ago))
+    new_users_7d = await db.users.count_documents(date_range("created_at", gte=seven_days_ago))
     
     total_vendors = await db.vendors.count_documents({})
     approved_vendors = await db.vendors.count_documents({"is_approved": True})
@@ -45,7 +56,7 @@ async def get_admin_stats(user: dict = Depends(require_admin)):
     total_services = await db.services.count_documents({})
     
     total_orders = await db.orders.count_documents({})
-    orders_30d = await db.orders.count_documents({"created_at": {"$gte": thirty_days_ago}})
+    orders_30d = await db.orders.count_documents(date_range("created_at", gte=thirty_days_ago))
     
     pipeline = [
         {"$match": {"payment_status": "paid"}},
@@ -55,7 +66,7 @@ async def get_admin_stats(user: dict = Depends(require_admin)):
     total_revenue = revenue_result[0]["total"] if revenue_result else 0
     
     pipeline_30d = [
-        {"$match": {"payment_status": "paid", "created_at": {"$gte": thirty_days_ago}}},
+        {"$match": {"payment_status": "paid", **date_range("created_at", gte=thirty_days_ago)}},
         {"$group": {"_id": None, "total": {"$sum": "$total"}}}
     ]
     revenue_30d_result = await db.orders.aggregate(pipeline_30d).to_list(1)
@@ -98,18 +109,18 @@ async def get_analytics(period: str = "30d", user: dict = Depends(require_admin)
     Comprehensive analytics dashboard with traffic, sales, top performers.
     Period: 7d, 30d, 90d, 1y
     """
-    db = get_db()
+    db = get_db("analytics")
     now = datetime.now(timezone.utc)
     
     # Determine date range
     period_days = {"7d": 7, "30d": 30, "90d": 90, "1y": 365}.get(period, 30)
-    period_start = (now - timedelta(days=period_days)).isoformat()
-    prev_period_start = (now - timedelta(days=period_days * 2)).isoformat()
+    period_start = now - timedelta(days=period_days)
+    prev_period_start = now - timedelta(days=period_days * 2)
     
     # Basic counts
     total_users = await db.users.count_documents({})
-    period_users = await db.users.count_documents({"created_at": {"$gte": period_start}})
-    prev_users = await db.users.count_documents({"created_at": {"$gte": prev_period_start, "$lt": period_start}})
+    period_users = await db.users.count_documents(date_range("created_at", gte=period_start))
+    prev_users = await db.users.count_documents(date_range("created_at", gte=prev_period_start, lt=period_start))
     
     total_vendors = await db.vendors.count_documents({})
     active_vendors = await db.vendors.count_documents({"is_active": {"$ne": False}})
@@ -125,19 +136,19 @@ async def get_analytics(period: str = "30d", user: dict = Depends(require_admin)
     
     # Orders and revenue
     total_orders = await db.orders.count_documents({})
-    period_orders = await db.orders.count_documents({"created_at": {"$gte": period_start}})
-    prev_orders = await db.orders.count_documents({"created_at": {"$gte": prev_period_start, "$lt": period_start}})
+    period_orders = await db.orders.count_documents(date_range("created_at", gte=period_start))
+    prev_orders = await db.orders.count_documents(date_range("created_at", gte=prev_period_start, lt=period_start))
     
     # Revenue calculations
     revenue_pipeline = [
-        {"$match": {"payment_status": "paid", "created_at": {"$gte": period_start}}},
+        {"$match": {"payment_status": "paid", **date_range("created_at", gte=period_start)}},
         {"$group": {"_id": None, "total": {"$sum": "$total"}}}
     ]
     revenue_result = await db.orders.aggregate(revenue_pipeline).to_list(1)
     period_revenue = revenue_result[0]["total"] if revenue_result else 0
     
     prev_revenue_pipeline = [
-        {"$match": {"payment_status": "paid", "created_at": {"$gte": prev_period_start, "$lt": period_start}}},
+        {"$match": {"payment_status": "paid", **date_range("created_at", gte=prev_period_start, lt=period_start)}},
         {"$group": {"_id": None, "total": {"$sum": "$total"}}}
     ]
     prev_revenue_result = await db.orders.aggregate(prev_revenue_pipeline).to_list(1)
@@ -145,7 +156,7 @@ async def get_analytics(period: str = "30d", user: dict = Depends(require_admin)
     
     # Bookings
     total_bookings = await db.bookings.count_documents({})
-    period_bookings = await db.bookings.count_documents({"created_at": {"$gte": period_start}})
+    period_bookings = await db.bookings.count_documents(date_range("created_at", gte=period_start))
     
     # Calculate growth rates
     def calc_growth(current, previous):
@@ -153,19 +164,18 @@ async def get_analytics(period: str = "30d", user: dict = Depends(require_admin)
             return 100 if current > 0 else 0
         return round(((current - previous) / previous) * 100, 1)
     
-    # Top vendors by revenue
+    # Top vendors by revenue (sub-orders already carry each vendor's subtotal)
     top_vendors_pipeline = [
-        {"$match": {"payment_status": "paid", "created_at": {"$gte": period_start}}},
-        {"$unwind": "$items"},
+        {"$match": {"payment_status": "paid", **date_range("created_at", gte=period_start)}},
         {"$group": {
-            "_id": "$items.vendor_id",
-            "revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
+            "_id": "$vendor_id",
+            "revenue": {"$sum": "$subtotal"},
             "orders": {"$sum": 1}
         }},
         {"$sort": {"revenue": -1}},
         {"$limit": 10}
     ]
-    top_vendors_data = await db.orders.aggregate(top_vendors_pipeline).to_list(10)
+    top_vendors_data = await db.vendor_orders.aggregate(top_vendors_pipeline).to_list(10)
     
     top_vendors = []
     for v in top_vendors_data:
@@ -181,7 +191,7 @@ async def get_analytics(period: str = "30d", user: dict = Depends(require_admin)
     
     # Top products by sales
     top_products_pipeline = [
-        {"$match": {"payment_status": "paid", "created_at": {"$gte": period_start}}},
+        {"$match": {"payment_status": "paid", **date_range("created_at", gte=period_start)}},
         {"$unwind": "$items"},
         {"$group": {
             "_id": "$items.product_id",
@@ -211,34 +221,33 @@ async def get_analytics(period: str = "30d", user: dict = Depends(require_admin)
         {"_id": 0, "id": 1, "name": 1, "view_count": 1, "images": 1}
     ).sort("view_count", -1).limit(10).to_list(10)
     
-    # Daily stats for chart
+    # Daily stats for chart: one aggregation bucketed by day instead of two queries per day
+    days = min(period_days, 30)
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    chart_start = today_start - timedelta(days=days)
+    daily_pipeline = [
+        {"$match": date_range("created_at", gte=chart_start, lt=today_start)},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": date_value("created_at")}},
+            "orders": {"$sum": 1},
+            "revenue": {"$sum": {"$cond": [{"$eq": ["$payment_status", "paid"]}, "$total", 0]}}
+        }}
+    ]
+    buckets = {b["_id"]: b for b in await db.orders.aggregate(daily_pipeline).to_list(days + 1)}
+    
     daily_stats = []
-    for i in range(min(period_days, 30)):
-        day_start = (now - timedelta(days=i+1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = (now - timedelta(days=i)).replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        day_orders = await db.orders.count_documents({
-            "created_at": {"$gte": day_start.isoformat(), "$lt": day_end.isoformat()}
-        })
-        
-        day_revenue_pipeline = [
-            {"$match": {"payment_status": "paid", "created_at": {"$gte": day_start.isoformat(), "$lt": day_end.isoformat()}}},
-            {"$group": {"_id": None, "total": {"$sum": "$total"}}}
-        ]
-        day_revenue_result = await db.orders.aggregate(day_revenue_pipeline).to_list(1)
-        day_revenue = day_revenue_result[0]["total"] if day_revenue_result else 0
-        
+    for i in range(days, 0, -1):
+        date = (today_start - timedelta(days=i)).strftime("%Y-%m-%d")
+        bucket = buckets.get(date, {})
         daily_stats.append({
-            "date": day_start.strftime("%Y-%m-%d"),
-            "orders": day_orders,
-            "revenue": day_revenue
+            "date": date,
+            "orders": bucket.get("orders", 0),
+            "revenue": bucket.get("revenue", 0)
         })
     
-    daily_stats.reverse()
-    
     # Category performance
     category_pipeline = [
-        {"$match": {"payment_status": "paid", "created_at": {"$gte": period_start}}},
+        {"$match": {"payment_status": "paid", **date_range("created_at", gte=period_start)}},
         {"$unwind": "$items"},
         {"$lookup": {
             "from": "products",
@@ -307,7 +316,8 @@ async def get_all_vendors(
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 20,
-    user: dict = Depends(require_admin)
+    user: dict = Depends(require_admin),
+    projection: dict = Depends(projection_for("vendors", always=("user_id",)))
 ):
     """Get all vendors for admin management"""
     db = get_db()
@@ -319,7 +329,7 @@ async def get_all_vendors(
     elif status == "verified":
         query["is_verified"] = True
     
-    vendors = await db.vendors.find(query, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
+    vendors = await db.vendors.find(query, projection).skip(skip).limit(limit).to_list(limit)
     total = await db.vendors.count_documents(query)
     
     for vendor in vendors:
@@ -335,12 +345,14 @@ async def approve_vendor(vendor_id: str, user: dict = Depends(require_admin)):
     db = get_db()
     result = await db.vendors.update_one(
         {"id": vendor_id},
-        {"$set": {"is_approved": True, "approved_at": datetime.now(timezone.utc).isoformat()}}
+        versioned({"$set": {"is_approved": True, "approved_at": timestamp()}})
     )
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Vendor not found")
     
+    await propagate_vendor_attributes(db, vendor_id)
+    request_homepage_refresh()
     return {"message": "Vendor approved"}
 
 
@@ -350,12 +362,13 @@ async def verify_vendor(vendor_id: str, user: dict = Depends(require_admin)):
     db = get_db()
     result = await db.vendors.update_one(
         {"id": vendor_id},
-        {"$set": {"is_verified": True, "verified_at": datetime.now(timezone.utc).isoformat()}}
+        versioned({"$set": {"is_verified": True, "verified_at": timestamp()}})
     )
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Vendor not found")
     
+    await propagate_vendor_attributes(db, vendor_id)
     return {"message": "Vendor verified"}
 
 
@@ -373,16 +386,19 @@ async def deactivate_vendor(
     
     await db.vendors.update_one(
         {"id": vendor_id},
-        {"$set": {
+        versioned({"$set": {
             "is_active": False,
-            "deactivated_at": datetime.now(timezone.utc).isoformat(),
+            "deactivated_at": timestamp(),
             "deactivation_reason": reason
-        }}
+        }})
     )
     
-    await db.products.update_many({"vendor_id": vendor_id}, {"$set": {"is_active": False}})
-    await db.services.update_many({"vendor_id": vendor_id}, {"$set": {"is_active": False}})
+    # Deactivate the catalogue and refresh its vendor attributes in the same bulk write
+    catalogue_update = versioned({"$set": {"is_active": False, **vendor_attributes(vendor)}})
+    await db.products.update_many({"vendor_id": vendor_id}, catalogue_update)
+    await db.services.update_many({"vendor_id": vendor_id}, catalogue_update)
     
+    request_homepage_refresh()
     return {"message": "Vendor deactivated"}
 
 
@@ -392,18 +408,19 @@ async def activate_vendor(vendor_id: str, user: dict = Depends(require_admin)):
     db = get_db()
     result = await db.vendors.update_one(
         {"id": vendor_id},
-        {"$set": {
+        versioned({"$set": {
             "is_active": True,
-            "reactivated_at": datetime.now(timezone.utc).isoformat()
-        }}
+            "reactivated_at": timestamp()
+        }})
     )
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Vendor not found")
     
-    await db.products.update_many({"vendor_id": vendor_id}, {"$set": {"is_active": True}})
+    await db.products.update_many({"vendor_id": vendor_id}, versioned({"$set": {"is_active": True}}))
     await db.services.update_many({"vendor_id": vendor_id}, {"$set": {"is_active": True}})
     
+    request_homepage_refresh()
     return {"message": "Vendor reactivated"}
 
 
@@ -412,7 +429,8 @@ async def get_all_users(
     role: Optional[str] = None,
     skip: int = 0,
     limit: int = 20,
-    user: dict = Depends(require_admin)
+    user: dict = Depends(require_admin),
+    projection: dict = Depends(projection_for("users"))
 ):
     """Get all users for admin management"""
     db = get_db()
@@ -420,7 +438,7 @@ async def get_all_users(
     if role:
         query["role"] = role
     
-    users = await db.users.find(query, {"_id": 0, "password_hash": 0, "hashed_password": 0}).skip(skip).limit(limit).to_list(limit)
+    users = await db.users.find(query, projection).skip(skip).limit(limit).to_list(limit)
     total = await db.users.count_documents(query)
     
     return {"users": users, "total": total}
@@ -466,7 +484,7 @@ async def update_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    update_data = {"updated_at": datetime.now(timezone.utc).isoformat()}
+    update_data = {"updated_at": timestamp()}
     
     if first_name is not None:
         update_data["first_name"] = first_name
@@ -512,7 +530,8 @@ async def update_user_role(
             "description": "",
             "is_approved": False,
             "is_verified": False,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": timestamp(),
+            **version_fields()
         })
         await db.users.update_one({"id": user_id}, {"$set": {"role": role, "vendor_id": vendor_id}})
     else:
@@ -581,7 +600,7 @@ async def suspend_user(
         {"id": user_id},
         {"$set": {
             "is_active": False,
-            "suspended_at": datetime.now(timezone.utc).isoformat(),
+            "suspended_at": timestamp(),
             "suspension_reason": reason
         }}
     )
@@ -590,9 +609,9 @@ async def suspend_user(
     if user.get("vendor_id"):
         await db.vendors.update_one(
             {"id": user["vendor_id"]},
-            {"$set": {"is_active": False}}
+            versioned({"$set": {"is_active": False}})
         )
-        await db.products.update_many({"vendor_id": user["vendor_id"]}, {"$set": {"is_active": False}})
+        await db.products.update_many({"vendor_id": user["vendor_id"]}, versioned({"$set": {"is_active": False}}))
     
     return {"message": "User suspended"}
 
@@ -631,7 +650,7 @@ async def get_vendor_details(vendor_id: str, admin: dict = Depends(require_admin
     # Get stats
     vendor["products_count"] = await db.products.count_documents({"vendor_id": vendor_id})
     vendor["services_count"] = await db.services.count_documents({"vendor_id": vendor_id})
-    vendor["orders_count"] = await db.orders.count_documents({"vendor_id": vendor_id})
+    vendor["orders_count"] = await db.vendor_orders.count_documents({"vendor_id": vendor_id})
     
     # Get reviews
     pipeline = [
@@ -661,7 +680,7 @@ async def update_vendor(
     if not vendor:
         raise HTTPException(status_code=404, detail="Vendor not found")
     
-    update_data = {"updated_at": datetime.now(timezone.utc).isoformat()}
+    update_data = {"updated_at": timestamp()}
     
     if store_name is not None:
         update_data["store_name"] = store_name
@@ -674,7 +693,9 @@ async def update_vendor(
     if subscription_plan is not None:
         update_data["subscription_plan"] = subscription_plan
     
-    await db.vendors.update_one({"id": vendor_id}, {"$set": update_data})
+    await db.vendors.update_one({"id": vendor_id}, versioned({"$set": update_data}))
+    if touches_vendor_attributes(update_data):
+        await propagate_vendor_attributes(db, vendor_id)
     
     return {"message": "Vendor updated successfully"}
 
@@ -716,7 +737,8 @@ async def get_all_products_admin(
     is_active: Optional[bool] = None,
     skip: int = 0,
     limit: int = 50,
-    admin: dict = Depends(require_admin)
+    admin: dict = Depends(require_admin),
+    projection: dict = Depends(projection_for("products", always=("vendor_id",)))
 ):
     """Get all products for admin management"""
     db = get_db()
@@ -727,13 +749,18 @@ async def get_all_products_admin(
     if is_active is not None:
         query["is_active"] = is_active
     
-    products = await db.products.find(query, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
+    products = await db.products.find(query, projection).skip(skip).limit(limit).to_list(limit)
     total = await db.products.count_documents(query)
     
-    # Add vendor info
+    # Add vendor info (one lookup for the whole page)
+    vendor_names = {
+        v["id"]: v.get("store_name") async for v in db.vendors.find(
+            {"id": {"$in": list({p["vendor_id"] for p in products})}},
+            {"_id": 0, "id": 1, "store_name": 1}
+        )
+    }
     for product in products:
-        vendor = await db.vendors.find_one({"id": product["vendor_id"]}, {"_id": 0, "store_name": 1})
-        product["vendor_name"] = vendor.get("store_name") if vendor else "Unknown"
+        product["vendor_name"] = vendor_names.get(product["vendor_id"], "Unknown")
     
     return {"products": products, "total": total}
 
@@ -770,6 +797,7 @@ async def create_product_admin(
     product = {
         "id": str(uuid.uuid4()),
         "vendor_id": vendor_id,
+        **vendor_attributes(vendor),
         "name": name,
         "description": description,
         "price": price,
@@ -785,12 +813,14 @@ async def create_product_admin(
         "review_count": 0,
         "sales_count": 0,
         "view_count": 0,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "created_by_admin": admin["id"]
+        "created_at": timestamp(),
+        "created_by_admin": admin["id"],
+        **version_fields()
     }
     
     await db.products.insert_one(product)
-    await db.vendors.update_one({"id": vendor_id}, {"$inc": {"product_count": 1}})
+    await db.vendors.update_one({"id": vendor_id}, versioned({"$inc": {"product_count": 1}}))
+    request_homepage_refresh()
     
     return {"message": "Product created", "product_id": product["id"]}
 
@@ -812,7 +842,7 @@ async def update_product_admin(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    update_data = {"updated_at": datetime.now(timezone.utc).isoformat()}
+    update_data = {"updated_at": timestamp()}
     
     if name is not None:
         update_data["name"] = name
@@ -825,7 +855,7 @@ async def update_product_admin(
     if is_featured is not None:
         update_data["is_featured"] = is_featured
     
-    await db.products.update_one({"id": product_id}, {"$set": update_data})
+    await db.products.update_one({"id": product_id}, versioned({"$set": update_data}))
     
     return {"message": "Product updated"}
 
@@ -842,8 +872,10 @@ async def delete_product_admin(product_id: str, admin: dict = Depends(require_ad
     
     # Also delete reviews for this product
     await db.reviews.delete_many({"product_id": product_id})
+    await delete_rating_summary(db, product_id)
     # Delete price alerts
     await db.price_alerts.delete_many({"product_id": product_id})
+    request_homepage_refresh()
     
     return {"message": "Product deleted"}
 
@@ -857,7 +889,8 @@ async def get_all_orders_admin(
     user_id: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
-    admin: dict = Depends(require_admin)
+    admin: dict = Depends(require_admin),
+    projection: dict = Depends(projection_for("orders"))
 ):
     """Get all orders for admin management"""
     db = get_db()
@@ -866,11 +899,11 @@ async def get_all_orders_admin(
     if status:
         query["status"] = status
     if vendor_id:
-        query["vendor_id"] = vendor_id
+        query["id"] = {"$in": await db.vendor_orders.distinct("order_id", {"vendor_id": vendor_id})}
     if user_id:
         query["user_id"] = user_id
     
-    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    orders = await db.orders.find(query, projection).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     total = await db.orders.count_documents(query)
     
     return {"orders": orders, "total": total}
@@ -889,14 +922,24 @@ async def update_order_status_admin(
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     
-    result = await db.orders.update_one(
+    order = await db.orders.find_one_and_update(
         {"id": order_id},
-        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"status": status, "updated_at": timestamp()}},
+        projection={"_id": 0, "user_id": 1}
     )
     
-    if result.modified_count == 0:
+    if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    await sync_vendor_orders(db, order_id, {"status": status})
+    if status in SETTLED_STATUSES:
+        await record_order_settlements(db, order_id)
+    elif status == "refunded":
+        await record_order_refunds(db, order_id)
+    await publish_order_update(order_id, order.get("user_id"), status)
+    if status in ("shipped", "delivered"):
+        request_homepage_refresh()
+    
     return {"message": f"Order status updated to {status}"}
 
 
@@ -918,10 +961,12 @@ async def refund_order_admin(
         {"$set": {
             "status": "refunded",
             "refund_reason": reason,
-            "refunded_at": datetime.now(timezone.utc).isoformat(),
+            "refunded_at": timestamp(),
             "refunded_by": admin["id"]
         }}
     )
+    await sync_vendor_orders(db, order_id, {"status": "refunded"})
+    await record_order_refunds(db, order_id)
     
     return {"message": "Order refunded", "amount": order.get("total", 0)}
 
@@ -962,33 +1007,56 @@ async def delete_review_admin(review_id: str, admin: dict = Depends(require_admi
     """Delete a review (moderation)"""
     db = get_db()
     
-    result = await db.reviews.delete_one({"id": review_id})
+    review = await db.reviews.find_one_and_delete(
+        {"id": review_id},
+        projection={"_id": 0, "product_id": 1, "rating": 1}
+    )
     
-    if result.deleted_count == 0:
+    if not review:
         raise HTTPException(status_code=404, detail="Review not found")
     
+    if review.get("product_id") and review.get("rating") is not None:
+        await apply_review(db, review["product_id"], review["rating"], delta=-1)
+    
     return {"message": "Review deleted"}
 
 
+@router.post("/reviews/rebuild-ratings")
+async def rebuild_review_ratings(admin: dict = Depends(require_admin)):
+    """Rebuild per-product rating summaries from the reviews collection"""
+    result = await rebuild_rating_summaries()
+    return {"message": "Rating summaries rebuilt", **result}
+
+
+@router.post("/vendors/ledger/reconcile")
+async def reconcile_vendor_ledger(vendor_id: Optional[str] = None, admin: dict = Depends(require_admin)):
+    """Rebuild vendor balances by replaying the earnings ledger"""
+    result = await reconcile_ledger(vendor_id=vendor_id)
+    return {"message": "Vendor balances reconciled", **result}
+
+
+@router.post("/vendors/backfill-attributes")
+async def backfill_vendor_catalogue_attributes(admin: dict = Depends(require_admin)):
+    """Re-stamp denormalized vendor attributes on every product and service"""
+    result = await backfill_vendor_attributes()
+    return {"message": "Vendor attributes backfilled", **result}
+
+
 @router.post("/check-price-alerts")
 async def trigger_price_alert_check(user: dict = Depends(require_admin)):
     """Manually trigger price alert checks"""
     db = get_db()
-    from routes.price_alerts import check_price_alerts_for_product
-    
-    alerts = await db.price_alerts.find({"is_active": True, "triggered": False}, {"_id": 0}).to_list(1000)
+    from routes.price_alerts import sweep_price_alerts
     
-    checked = 0
-    triggered = 0
+    checked = await db.price_alerts.count_documents({"is_active": True, "triggered": False})
+    result = await sweep_price_alerts()
     
-    for alert in alerts:
-        product = await db.products.find_one({"id": alert["product_id"]}, {"_id": 0})
-        if product and product["price"] <= alert["target_price"]:
-            await check_price_alerts_for_product(alert["product_id"], product["price"])
-            triggered += 1
-        checked += 1
-    
-    return {"message": "Price alert check completed", "checked": checked, "triggered": triggered}
+    return {
+        "message": "Price alert check completed",
+        "checked": checked,
+        "triggered": result["triggered"],
+        "products": result["products"]
+    }
 
 
 @router.post("/seed-database")
@@ -1149,7 +1217,8 @@ async def seed_database_endpoint(user: dict = Depends(require_admin)):
                     "id": cat_id,
                     "type": "product",
                     **cat,
-                    "created_at": datetime.now(timezone.utc).isoformat()
+                    "created_at": timestamp(),
+                    **version_fields()
                 })
                 category_map[cat["slug"]] = cat_id
                 results["categories_created"] += 1
@@ -1166,7 +1235,8 @@ async def seed_database_endpoint(user: dict = Depends(require_admin)):
                     "id": cat_id,
                     "type": "service",
                     **cat,
-                    "created_at": datetime.now(timezone.utc).isoformat()
+                    "created_at": timestamp(),
+                    **version_fields()
                 })
                 category_map[cat["slug"]] = cat_id
                 results["categories_created"] += 1
@@ -1181,7 +1251,7 @@ async def seed_database_endpoint(user: dict = Depends(require_admin)):
                 await db.countries.insert_one({
                     "id": str(uuid.uuid4()),
                     **country,
-                    "created_at": datetime.now(timezone.utc).isoformat()
+                    "created_at": timestamp()
                 })
                 results["countries_created"] += 1
             else:
@@ -1200,7 +1270,7 @@ async def seed_database_endpoint(user: dict = Depends(require_admin)):
                 "last_name": "User",
                 "role": "admin",
                 "is_active": True,
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "created_at": timestamp()
             })
             results["users_created"] += 1
         else:
@@ -1224,7 +1294,7 @@ async def seed_database_endpoint(user: dict = Depends(require_admin)):
                 "role": "vendor",
                 "vendor_id": vendor_id,
                 "is_active": True,
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "created_at": timestamp()
             })
             
             await db.vendors.insert_one({
@@ -1240,7 +1310,8 @@ async def seed_database_endpoint(user: dict = Depends(require_admin)):
                 "commission_rate": 10,
                 "max_products": -1,
                 "cultural_story": "We celebrate the rich heritage and craftsmanship of Africa, bringing authentic products directly from artisans to your doorstep.",
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "created_at": timestamp(),
+                **version_fields()
             })
             results["users_created"] += 1
         else:
@@ -1275,7 +1346,8 @@ async def seed_database_endpoint(user: dict = Depends(require_admin)):
                         "view_count": 0,
                         "country_code": product["country_code"],
                         "country_name": country["name"] if country else "",
-                        "created_at": datetime.now(timezone.utc).isoformat()
+                        "created_at": timestamp(),
+                        **version_fields()
                     })
                     results["products_created"] += 1
                 else:
@@ -1301,11 +1373,13 @@ async def seed_database_endpoint(user: dict = Depends(require_admin)):
                         "is_active": True,
                         "average_rating": 4.5,
                         "review_count": 0,
-                        "created_at": datetime.now(timezone.utc).isoformat()
+                        "created_at": timestamp()
                     })
                     results["services_created"] += 1
                 else:
                     results["skipped"].append(f"Service: {service['name']}")
+            
+            await propagate_vendor_attributes(db, vendor_id)
         
         return {
             "success": True,
@@ -1350,181 +1424,218 @@ async def get_scheduler_logs(
     return {"logs": logs}
 
 
+@router.get("/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    request: Request,
+    format: str = "csv",
+    gzip: bool = False,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    admin: dict = Depends(require_admin)
+):
+    """
+    Stream a whole dataset (orders, users, vendors, reviews, payouts) as CSV or
+    NDJSON. date_from/date_to bound created_at; other filters are the list
+    endpoint's query parameters, e.g. /export/orders?status=delivered.
+    """
+    from exports import EXPORTS, build_export_query, export_response
+    if dataset not in EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export. Available: {', '.join(EXPORTS)}")
+    
+    query = build_export_query(EXPORTS[dataset], request.query_params, date_from, date_to)
+    return export_response(get_db("analytics"), dataset, query, format, compress=gzip)
+
+
+@router.get("/retention")
+async def get_retention_report(user: dict = Depends(require_admin)):
+    """Retention policy and current size of every ephemeral collection"""
+    from retention import retention_report
+    return await retention_report()
+
+
+@router.post("/retention/sweep")
+async def trigger_retention_sweep(user: dict = Depends(require_admin)):
+    """Manually run the retention sweep job"""
+    from scheduler import run_retention_sweep
+    result = await run_retention_sweep()
+    if result is None:
+        raise HTTPException(status_code=500, detail="Retention sweep failed")
+    return result
+
+
+@router.get("/webhooks/events")
+async def get_webhook_events(
+    status: Optional[str] = None,
+    limit: int = 50,
+    user: dict = Depends(require_admin)
+):
+    """List queued Stripe webhook events (e.g. status=failed)"""
+    db = get_db()
+    query = {"status": status} if status else {}
+    events = await db.webhook_events.find(
+        query,
+        {"_id": 0, "event": 0}
+    ).sort("received_at", -1).limit(limit).to_list(limit)
+    return {"events": events}
+
+
+@router.post("/webhooks/events/{event_id}/retry")
+async def retry_webhook_event(event_id: str, user: dict = Depends(require_admin)):
+    """Requeue a webhook event that exhausted its retries"""
+    from webhook_queue import retry_event
+    if not await retry_event(get_db(), event_id):
+        raise HTTPException(status_code=404, detail="No failed webhook event with that id")
+    return {"message": "Webhook event requeued"}
+
+
+@router.get("/admission/stats")
+async def get_admission_stats(user: dict = Depends(require_admin)):
+    """Rate limit, shedding and in-flight counters for this worker"""
+    from admission import admission_controller
+    return admission_controller.stats()
+
+
+@router.get("/database/pools")
+async def get_database_pools(user: dict = Depends(require_admin)):
+    """Connection pool settings and wait times per database profile"""
+    from database import pool_stats
+    return pool_stats()
+
+
 @router.get("/products/broken-images")
 async def get_products_with_broken_images(
+    background_tasks: BackgroundTasks,
     user: dict = Depends(require_admin)
 ):
     """
-    Identify products with missing or potentially broken images.
-    Images are considered broken if:
-    - No images at all (empty array)
-    - Images stored locally (not Cloudinary URLs)
-    - Images with /uploads/ path (ephemeral local storage)
+    Products with missing or broken images, from the latest image audit.
+    The audit (image_audit.py) runs nightly; POST /products/image-audit
+    starts one on demand. The first call starts the initial audit.
     """
-    db = get_db()
-    
-    # Get all products
-    products = await db.products.find(
-        {},
-        {"_id": 0, "id": 1, "name": 1, "images": 1, "vendor_id": 1, "is_active": 1}
-    ).to_list(None)
+    from image_audit import latest_audit, audit_findings, run_image_audit, RECOMMENDATION
+    db = get_db("analytics")
+    
+    audit = await latest_audit(db)
+    running = await latest_audit(db, status="running")
+    if not audit:
+        if not running:
+            background_tasks.add_task(run_image_audit)
+        return {
+            "summary": {
+                "total_products": 0,
+                "products_with_cloudinary_images": 0,
+                "products_with_broken_images": 0,
+                "products_with_no_images": 0,
+                "total_needing_attention": 0
+            },
+            "broken_images": [],
+            "no_images": [],
+            "affected_vendors": [],
+            "audit": {"status": "running"},
+            "recommendation": RECOMMENDATION
+        }
     
+    vendors = {v["vendor_id"]: v for v in audit.get("vendors", [])}
     broken_images = []
     no_images = []
-    cloudinary_images = []
-    
-    for product in products:
-        images = product.get("images", [])
-        
-        if not images or len(images) == 0:
-            # No images at all
-            no_images.append({
-                "product_id": product["id"],
-                "product_name": product["name"],
-                "vendor_id": product["vendor_id"],
-                "is_active": product.get("is_active", True),
-                "issue": "No images uploaded"
-            })
-        else:
-            # Check each image URL
-            has_broken = False
-            has_cloudinary = False
-            broken_urls = []
-            
-            for img in images:
-                img_url = img if isinstance(img, str) else img.get("url", "")
-                
-                if "cloudinary.com" in img_url or "res.cloudinary.com" in img_url:
-                    has_cloudinary = True
-                elif "/uploads/" in img_url or img_url.startswith("/uploads"):
-                    # Local ephemeral storage - will be lost on redeployment
-                    has_broken = True
-                    broken_urls.append(img_url)
-                elif img_url.startswith("http://localhost") or img_url.startswith("https://localhost"):
-                    has_broken = True
-                    broken_urls.append(img_url)
-                elif not img_url.startswith("http"):
-                    # Relative path - likely broken
-                    has_broken = True
-                    broken_urls.append(img_url)
-            
-            if has_broken:
-                broken_images.append({
-                    "product_id": product["id"],
-                    "product_name": product["name"],
-                    "vendor_id": product["vendor_id"],
-                    "is_active": product.get("is_active", True),
-                    "issue": "Local/ephemeral storage images",
-                    "broken_urls": broken_urls
-                })
-            elif has_cloudinary:
-                cloudinary_images.append({
-                    "product_id": product["id"],
-                    "product_name": product["name"]
-                })
-    
-    # Get vendor info for affected products
-    vendor_ids = set()
-    for item in broken_images + no_images:
-        vendor_ids.add(item["vendor_id"])
-    
-    vendors_info = {}
-    for vendor_id in vendor_ids:
-        vendor = await db.vendors.find_one({"id": vendor_id}, {"_id": 0, "store_name": 1, "user_id": 1})
-        if vendor:
-            user_info = await db.users.find_one({"id": vendor["user_id"]}, {"_id": 0, "email": 1})
-            vendors_info[vendor_id] = {
-                "store_name": vendor.get("store_name", "Unknown"),
-                "email": user_info.get("email", "Unknown") if user_info else "Unknown"
-            }
-    
-    # Add vendor info to results
-    for item in broken_images + no_images:
-        vendor_info = vendors_info.get(item["vendor_id"], {})
-        item["vendor_store"] = vendor_info.get("store_name", "Unknown")
-        item["vendor_email"] = vendor_info.get("email", "Unknown")
+    for finding in await audit_findings(audit, db):
+        vendor = vendors.get(finding["vendor_id"], {})
+        finding["vendor_store"] = vendor.get("store_name", "Unknown")
+        finding["vendor_email"] = vendor.get("email", "Unknown")
+        (no_images if finding.pop("kind") == "no_images" else broken_images).append(finding)
     
     return {
-        "summary": {
-            "total_products": len(products),
-            "products_with_cloudinary_images": len(cloudinary_images),
-            "products_with_broken_images": len(broken_images),
-            "products_with_no_images": len(no_images),
-            "total_needing_attention": len(broken_images) + len(no_images)
-        },
+        "summary": audit["summary"],
         "broken_images": broken_images,
         "no_images": no_images,
-        "affected_vendors": list(vendors_info.values()),
-        "recommendation": "Vendors need to re-upload images for products listed above. New uploads will use Cloudinary and persist across deployments."
+        "affected_vendors": [{"store_name": v["store_name"], "email": v["email"]} for v in vendors.values()],
+        "audit": {
+            "id": audit["id"],
+            "started_at": audit["started_at"],
+            "finished_at": audit.get("finished_at"),
+            "running": bool(running)
+        },
+        "recommendation": RECOMMENDATION
     }
 
 
+@router.post("/products/image-audit")
+async def start_image_audit(
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(require_admin)
+):
+    """Start a product image audit in the background"""
+    from image_audit import latest_audit, run_image_audit
+    running = await latest_audit(status="running")
+    if running:
+        return {"message": "An image audit is already running", "audit_id": running["id"]}
+    background_tasks.add_task(run_image_audit)
+    return {"message": "Image audit started"}
+
+
+@router.get("/products/image-audit")
+async def get_image_audit_status(user: dict = Depends(require_admin)):
+    """Most recent image audit run, whatever its status"""
+    from image_audit import latest_audit
+    audit = await latest_audit(status=None)
+    if not audit:
+        raise HTTPException(status_code=404, detail="No image audit has run yet")
+    audit.pop("vendors", None)
+    return audit
+
+
 @router.post("/products/notify-broken-images")
 async def notify_vendors_broken_images(
     background_tasks: BackgroundTasks,
     user: dict = Depends(require_admin)
 ):
     """
-    Send email notifications to all vendors with broken/missing product images.
+    Send email notifications to all vendors with broken/missing product images,
+    as found by the latest image audit.
     """
+    from image_audit import latest_audit, audit_findings
     db = get_db()
     
-    # Get broken images data
-    products = await db.products.find(
-        {},
-        {"_id": 0, "id": 1, "name": 1, "images": 1, "vendor_id": 1, "is_active": 1}
-    ).to_list(None)
+    audit = await latest_audit(db)
+    if not audit:
+        raise HTTPException(status_code=409, detail="No completed image audit yet")
     
     # Group affected products by vendor
     vendor_products = {}
-    
-    for product in products:
-        images = product.get("images", [])
-        has_issue = False
-        issue = ""
-        
-        if not images or len(images) == 0:
-            has_issue = True
-            issue = "No images uploaded"
-        else:
-            for img in images:
-                img_url = img if isinstance(img, str) else img.get("url", "")
-                if not ("cloudinary.com" in img_url or "res.cloudinary.com" in img_url):
-                    if "/uploads/" in img_url or not img_url.startswith("http"):
-                        has_issue = True
-                        issue = "Image needs re-upload"
-                        break
-        
-        if has_issue:
-            vendor_id = product["vendor_id"]
-            if vendor_id not in vendor_products:
-                vendor_products[vendor_id] = []
-            vendor_products[vendor_id].append({
-                "product_id": product["id"],
-                "product_name": product["name"],
-                "issue": issue
-            })
+    for finding in await audit_findings(audit, db):
+        vendor_products.setdefault(finding["vendor_id"], []).append({
+            "product_id": finding["product_id"],
+            "product_name": finding["product_name"],
+            "issue": "No images uploaded" if finding["kind"] == "no_images" else "Image needs re-upload"
+        })
     
     # Send emails to each affected vendor
-    emails_sent = 0
-    emails_failed = 0
     vendors_notified = []
+    for vendor in audit.get("vendors", []):
+        affected_products = vendor_products.get(vendor["vendor_id"])
+        if not affected_products or vendor.get("email", "Unknown") == "Unknown":
+            continue
+        
+        # Send email in background
+        background_tasks.add_task(
+            email_service.send_broken_images_notification,
+            vendor["email"],
+            vendor.get("store_name") or vendor.get("first_name") or "Vendor",
+            affected_products
+        )
+        vendors_notified.append({
+            "store_name": vendor.get("store_name", "Unknown"),
+            "email": vendor["email"],
+            "products_affected": len(affected_products)
+        })
     
-    for vendor_id, affected_products in vendor_products.items():
-        vendor = await db.vendors.find_one({"id": vendor_id}, {"_id": 0, "store_name": 1, "user_id": 1})
-        if vendor:
-            user_info = await db.users.find_one({"id": vendor["user_id"]}, {"_id": 0, "email": 1, "first_name": 1})
-            if user_info and user_info.get("email"):
-                vendor_name = vendor.get("store_name", user_info.get("first_name", "Vendor"))
-                
-                # Send email in background
-                background_tasks.add_task(
-                    email_service.send_broken_images_notification,
-                    user_info["email"],
-                    vendor_name,
-                    affected_products
-                )
-                
+    return {
+        "success": True,
+        "message": f"Notification emails queued for {len(vendors_notified)} vendors",
+        "audit_id": audit["id"],
+        "vendors_notified": vendors_notified
+    }
 
 
 @router.get("/notification-center")
@@ -1542,9 +1653,9 @@ async def get_admin_notifications(
     notifications = []
     
     # 1. New Orders (last 24 hours)
-    yesterday = (now - timedelta(days=1)).isoformat()
+    yesterday = now - timedelta(days=1)
     new_orders = await db.orders.find(
-        {"created_at": {"$gte": yesterday}},
+        date_range("created_at", gte=yesterday),
         {"_id": 0, "id": 1, "total": 1, "status": 1, "created_at": 1, "user_id": 1}
     ).sort("created_at", -1).limit(10).to_list(10)
     
@@ -1558,7 +1669,7 @@ async def get_admin_notifications(
             "title": "New Order",
             "message": f"Order #{order['id'][:8]} from {customer_name} - ${order['total']:.2f}",
             "link": f"/admin/orders",
-            "created_at": order["created_at"],
+            "created_at": to_iso(order["created_at"]),
             "read": False
         })
     
@@ -1576,7 +1687,7 @@ async def get_admin_notifications(
             "title": "Vendor Application",
             "message": f"New vendor application: {vendor['store_name']}",
             "link": f"/admin/vendors",
-            "created_at": vendor.get("created_at", now.isoformat()),
+            "created_at": to_iso(vendor.get("created_at", now.isoformat())),
             "read": False
         })
     
@@ -1613,7 +1724,7 @@ async def get_admin_notifications(
         })
     
     # 5. Recent User Registrations (last 24 hours)
-    new_users_count = await db.users.count_documents({"created_at": {"$gte": yesterday}})
+    new_users_count = await db.users.count_documents(date_range("created_at", gte=yesterday))
     if new_users_count > 0:
         notifications.append({
             "id": "new_users_alert",
@@ -1675,7 +1786,7 @@ async def mark_notification_read(
         {
             "$set": {
                 "read": True,
-                "read_at": datetime.now(timezone.utc).isoformat()
+                "read_at": timestamp()
             }
         },
         upsert=True
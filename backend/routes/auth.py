@@ -9,9 +9,12 @@ import httpx
 import os
 
 from database import get_db
+from datetimes import timestamp, as_datetime
 from auth import hash_password, verify_password, create_access_token, get_current_user
 from models import UserCreate, UserLogin, UserResponse, TokenResponse, ForgotPasswordRequest, ResetPasswordRequest
 from email_service import email_service
+from serialization import fast_response, trusted_dump
+from conditional import version_fields
 
 # Frontend URL for password reset links
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'https://afrovending.com')
@@ -47,7 +50,8 @@ async def register(user_data: UserCreate):
             "max_products": 10,
             "product_count": 0,
             "total_sales": 0,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": timestamp(),
+            **version_fields()
         }
         await db.vendors.insert_one(vendor_doc)
     
@@ -60,16 +64,13 @@ async def register(user_data: UserCreate):
         "password_hash": hash_password(user_data.password),
         "picture": None,
         "vendor_id": vendor_id,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp()
     }
     
     await db.users.insert_one(user_doc)
     token = create_access_token({"sub": user_id})
     
-    return TokenResponse(
-        access_token=token,
-        user=UserResponse(**{k: v for k, v in user_doc.items() if k != "password_hash"})
-    )
+    return fast_response({"access_token": token, "user": trusted_dump(UserResponse, user_doc)})
 
 
 @router.post("/login", response_model=TokenResponse)
@@ -91,10 +92,7 @@ async def login(credentials: UserLogin):
     
     token = create_access_token({"sub": user["id"]})
     
-    return TokenResponse(
-        access_token=token,
-        user=UserResponse(**{k: v for k, v in user.items() if k not in ["password_hash", "hashed_password"]})
-    )
+    return fast_response({"access_token": token, "user": trusted_dump(UserResponse, user)})
 
 
 @router.post("/forgot-password")
@@ -120,9 +118,9 @@ async def forgot_password(request: ForgotPasswordRequest, background_tasks: Back
         "user_id": user["id"],
         "email": request.email,
         "token": reset_token,
-        "expires_at": expires_at.isoformat(),
+        "expires_at": timestamp(expires_at),
         "used": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp()
     })
     
     # Send password reset email in background
@@ -149,8 +147,8 @@ async def reset_password(request: ResetPasswordRequest):
     if not reset_record:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
     
-    expires_at = datetime.fromisoformat(reset_record["expires_at"].replace('Z', '+00:00'))
-    if datetime.now(timezone.utc) > expires_at:
+    expires_at = as_datetime(reset_record["expires_at"])
+    if not expires_at or datetime.now(timezone.utc) > expires_at:
         raise HTTPException(status_code=400, detail="Reset token has expired")
     
     new_hash = hash_password(request.new_password)
@@ -199,7 +197,7 @@ async def process_google_session(request: Request, response: Response):
         user_id = existing_user["id"]
         await db.users.update_one(
             {"id": user_id},
-            {"$set": {"picture": picture, "last_login": datetime.now(timezone.utc).isoformat()}}
+            {"$set": {"picture": picture, "last_login": timestamp()}}
         )
         user = existing_user
     else:
@@ -214,7 +212,7 @@ async def process_google_session(request: Request, response: Response):
             "picture": picture,
             "password_hash": None,
             "vendor_id": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": timestamp()
         }
         await db.users.insert_one(user)
     
@@ -222,8 +220,8 @@ async def process_google_session(request: Request, response: Response):
         "id": str(uuid.uuid4()),
         "user_id": user_id,
         "session_token": session_token,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(days=7)).isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "expires_at": timestamp(datetime.now(timezone.utc) + timedelta(days=7)),
+        "created_at": timestamp()
     })
     
     jwt_token = create_access_token({"sub": user_id})
@@ -2,12 +2,14 @@
 AfroVending - Booking Routes
 """
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from datetime import datetime, timezone
 import uuid
 
 from database import get_db
+from datetimes import timestamp
 from auth import get_current_user
 from models import BookingCreate, BookingResponse
+from serialization import fast_response, trusted_dump
+from conditional import versioned
 
 router = APIRouter(prefix="/bookings", tags=["Bookings"])
 
@@ -76,13 +78,13 @@ async def create_booking(
         "payment_status": "pending",
         "price": service["price"],
         "delivery_confirmed": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp()
     }
     
     await db.bookings.insert_one(booking)
     await db.services.update_one({"id": service["id"]}, {"$inc": {"booking_count": 1}})
     
-    return BookingResponse(**{k: v for k, v in booking.items() if k != "_id"})
+    return fast_response(trusted_dump(BookingResponse, booking))
 
 
 @router.put("/{booking_id}/status")
@@ -103,7 +105,7 @@ async def update_booking_status(booking_id: str, status: str, user: dict = Depen
     
     await db.bookings.update_one(
         {"id": booking_id}, 
-        {"$set": {"status": status, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"status": status, "updated_at": timestamp()}}
     )
     
     return {"message": f"Booking status updated to {status}"}
@@ -128,14 +130,14 @@ async def confirm_delivery(booking_id: str, user: dict = Depends(get_current_use
         {"$set": {
             "delivery_confirmed": True,
             "status": "completed",
-            "delivery_confirmed_at": datetime.now(timezone.utc).isoformat()
+            "delivery_confirmed_at": timestamp()
         }}
     )
     
     # Update vendor stats
     await db.vendors.update_one(
         {"id": booking["vendor_id"]},
-        {"$inc": {"total_sales": booking["price"]}}
+        versioned({"$inc": {"total_sales": booking["price"]}})
     )
     
     return {"message": "Delivery confirmed successfully"}
@@ -1,19 +1,20 @@
 """
 AfroVending - Category & Country Routes
 """
-from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import Optional
 import uuid
 
 from database import get_db
+from datetimes import timestamp
 from auth import get_current_user
+from conditional import conditional_collection, version_fields, StaticResource
 
 router = APIRouter(tags=["Categories & Countries"])
 
 
 # ==================== CATEGORIES ====================
-@router.get("/categories")
+@router.get("/categories", dependencies=[Depends(conditional_collection("categories"))])
 async def get_categories(type: Optional[str] = None):
     """Get all categories, optionally filtered by type"""
     db = get_db()
@@ -67,9 +68,14 @@ async def create_category(
         "icon": icon,
         "parent_id": parent_id,
         "type": type,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp(),
+        **version_fields()
     }
     await db.categories.insert_one(category)
+    
+    from routes.homepage import request_homepage_refresh
+    request_homepage_refresh()
+    
     return {k: v for k, v in category.items() if k != "_id"}
 
 
@@ -89,17 +95,20 @@ AFRICAN_COUNTRIES = [
     {"code": "EG", "name": "Egypt", "flag": "🇪🇬"},
 ]
 
+COUNTRIES_RESOURCE = StaticResource(AFRICAN_COUNTRIES)
+COUNTRY_RESOURCES = {c["code"]: StaticResource(c) for c in AFRICAN_COUNTRIES}
+
 
 @router.get("/countries")
-async def get_countries():
+async def get_countries(request: Request):
     """Get list of African countries"""
-    return AFRICAN_COUNTRIES
+    return COUNTRIES_RESOURCE.respond(request)
 
 
 @router.get("/countries/{country_code}")
-async def get_country(country_code: str):
+async def get_country(country_code: str, request: Request):
     """Get country by code"""
-    country = next((c for c in AFRICAN_COUNTRIES if c["code"] == country_code.upper()), None)
+    country = COUNTRY_RESOURCES.get(country_code.upper())
     if not country:
         raise HTTPException(status_code=404, detail="Country not found")
-    return country
+    return country.respond(request)
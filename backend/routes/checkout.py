@@ -6,11 +6,19 @@ from fastapi import APIRouter, HTTPException, Depends, Request
 from datetime import datetime, timezone
 from typing import Optional
 import stripe
+import json
 import os
 import uuid
 
 from database import get_db
+from datetimes import timestamp, date_range
 from auth import get_current_user
+from event_bus import publish_order_update
+from cart_service import get_priced_cart, price_items, same_items, CART_PRODUCT_PROJECTION
+from vendor_order_service import create_vendor_orders, sync_vendor_orders, delete_vendor_orders
+from ledger_service import record_order_sales
+from webhook_queue import enqueue_event, register_handler
+from conditional import versioned
 
 router = APIRouter(prefix="/checkout", tags=["Checkout"])
 
@@ -55,7 +63,7 @@ async def check_and_notify_low_stock(db, order: dict, email_service, frontend_ur
                         # Check if we already sent an alert recently (within 24 hours)
                         recent_alert = await db.stock_alerts.find_one({
                             "vendor_id": vendor_id,
-                            "created_at": {"$gte": (datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)).isoformat()}
+                            **date_range("created_at", gte=datetime.now(timezone.utc).replace(hour=0, minute=0, second=0))
                         })
                         
                         if not recent_alert:
@@ -70,7 +78,7 @@ async def check_and_notify_low_stock(db, order: dict, email_service, frontend_ur
                             await db.stock_alerts.insert_one({
                                 "vendor_id": vendor_id,
                                 "product_ids": [p["id"] for p in low_stock_products],
-                                "created_at": datetime.now(timezone.utc).isoformat()
+                                "created_at": timestamp()
                             })
                             
                             print(f"Low stock alert sent to {vendor_user['email']} for {len(low_stock_products)} products")
@@ -99,12 +107,17 @@ async def create_checkout_session(
     origin_url = body.get("origin_url", os.environ.get("FRONTEND_URL", "https://afrovending.com"))
     
     try:
-        # Build line items from order
+        # Build line items from order (product details fetched in one query)
         line_items = []
+        products = {
+            p["id"]: p async for p in db.products.find(
+                {"id": {"$in": [i["product_id"] for i in order.get("items", [])]}},
+                CART_PRODUCT_PROJECTION
+            )
+        }
         
         for item in order.get("items", []):
-            # Get product details
-            product = await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
+            product = products.get(item["product_id"])
             
             line_items.append({
                 "price_data": {
@@ -159,7 +172,7 @@ async def create_checkout_session(
             {
                 "$set": {
                     "stripe_checkout_session_id": checkout_session.id,
-                    "checkout_started_at": datetime.now(timezone.utc).isoformat()
+                    "checkout_started_at": timestamp()
                 }
             }
         )
@@ -191,10 +204,12 @@ async def checkout_success(session_id: str, order_id: str):
                         "payment_status": "paid",
                         "status": "confirmed",
                         "stripe_payment_intent": session.payment_intent,
-                        "paid_at": datetime.now(timezone.utc).isoformat()
+                        "paid_at": timestamp()
                     }
                 }
             )
+            await sync_vendor_orders(db, order_id, {"payment_status": "paid", "status": "confirmed"})
+            await record_order_sales(db, order_id)
             
             return {
                 "success": True,
@@ -214,7 +229,7 @@ async def checkout_success(session_id: str, order_id: str):
 
 @router.post("/webhook")
 async def stripe_webhook(request: Request):
-    """Handle Stripe webhooks for payment events"""
+    """Receive Stripe payment webhooks: verify, queue and acknowledge immediately"""
     db = get_db()
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
@@ -222,33 +237,41 @@ async def stripe_webhook(request: Request):
     
     try:
         if webhook_secret:
-            event = stripe.Webhook.construct_event(
+            stripe.Webhook.construct_event(
                 payload, sig_header, webhook_secret
             )
-        else:
-            # For development without webhook signature
-            import json
-            event = json.loads(payload)
+        # For development without webhook signature the payload is trusted as-is
+        event = json.loads(payload)
     except ValueError as e:
         raise HTTPException(status_code=400, detail="Invalid payload")
     except stripe.error.SignatureVerificationError as e:
         raise HTTPException(status_code=400, detail="Invalid signature")
     
-    # Handle the event
+    # Processing happens in the webhook worker (see process_checkout_event)
+    await enqueue_event(db, "checkout", event)
+    
+    return {"status": "success"}
+
+
+async def process_checkout_event(db, event: dict):
+    """Apply a queued Stripe payment event (run by the webhook worker)"""
     if event["type"] == "checkout.session.completed":
         session = event["data"]["object"]
         order_id = session.get("metadata", {}).get("order_id")
         user_id = session.get("metadata", {}).get("user_id")
         
         if order_id and session["payment_status"] == "paid":
+            # Mark the order paid once; fulfilment below is resumable, so a
+            # redelivery after a failed step picks up where it stopped and
+            # only an order with fulfilled_at set is skipped entirely
             await db.orders.update_one(
-                {"id": order_id},
+                {"id": order_id, "paid_at": {"$exists": False}},
                 {
                     "$set": {
                         "payment_status": "paid",
                         "status": "confirmed",
                         "stripe_payment_intent": session.get("payment_intent"),
-                        "paid_at": datetime.now(timezone.utc).isoformat()
+                        "paid_at": timestamp()
                     },
                     "$push": {
                         "timeline": {
@@ -259,49 +282,63 @@ async def stripe_webhook(request: Request):
                     }
                 }
             )
-            
-            # Get order and user details for email
             order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+            if not order or order.get("fulfilled_at"):
+                return
+            
+            await sync_vendor_orders(db, order_id, {"payment_status": "paid", "status": "confirmed"})
+            await record_order_sales(db, order_id)
+            
             user = await db.users.find_one({"id": user_id}, {"_id": 0}) if user_id else None
             
+            await publish_order_update(order_id, order["user_id"], "confirmed", payment_status="paid")
+            
             if order:
                 # Decrement stock for each item and track products that hit zero
                 out_of_stock_by_vendor = {}  # vendor_id -> list of products that hit zero stock
-                
+                quantities = {}  # product_id -> (quantity, vendor_id)
                 for item in order.get("items", []):
-                    product_id = item.get("product_id")
-                    quantity = item.get("quantity", 1)
-                    vendor_id = item.get("vendor_id")
+                    if item.get("product_id"):
+                        quantity, vendor_id = quantities.get(item["product_id"], (0, item.get("vendor_id")))
+                        quantities[item["product_id"]] = (quantity + item.get("quantity", 1), vendor_id)
+                
+                for product_id, (quantity, vendor_id) in quantities.items():
+                    # Per-product marker on the order: a retry skips products
+                    # whose stock this order already took
+                    claimed = await db.orders.update_one(
+                        {"id": order_id, "stock_decremented": {"$ne": product_id}},
+                        {"$addToSet": {"stock_decremented": product_id}}
+                    )
+                    if claimed.modified_count == 0:
+                        continue
+                    
+                    await db.products.update_one(
+                        {"id": product_id},
+                        versioned({"$inc": {"stock": -quantity}})
+                    )
                     
-                    if product_id:
-                        # Decrement stock
+                    # Check if stock reached zero
+                    updated_product = await db.products.find_one({"id": product_id}, {"_id": 0})
+                    if updated_product and updated_product.get("stock", 0) <= 0:
+                        # Auto-deactivate the product
                         await db.products.update_one(
                             {"id": product_id},
-                            {"$inc": {"stock": -quantity}}
+                            versioned({
+                                "$set": {
+                                    "is_active": False,
+                                    "auto_deactivated": True,
+                                    "auto_deactivated_at": timestamp(),
+                                    "auto_deactivated_reason": "out_of_stock"
+                                }
+                            })
                         )
+                        print(f"Product {product_id} auto-deactivated due to zero stock")
                         
-                        # Check if stock reached zero
-                        updated_product = await db.products.find_one({"id": product_id}, {"_id": 0})
-                        if updated_product and updated_product.get("stock", 0) <= 0:
-                            # Auto-deactivate the product
-                            await db.products.update_one(
-                                {"id": product_id},
-                                {
-                                    "$set": {
-                                        "is_active": False,
-                                        "auto_deactivated": True,
-                                        "auto_deactivated_at": datetime.now(timezone.utc).isoformat(),
-                                        "auto_deactivated_reason": "out_of_stock"
-                                    }
-                                }
-                            )
-                            print(f"Product {product_id} auto-deactivated due to zero stock")
-                            
-                            # Track for vendor notification
-                            if vendor_id:
-                                if vendor_id not in out_of_stock_by_vendor:
-                                    out_of_stock_by_vendor[vendor_id] = []
-                                out_of_stock_by_vendor[vendor_id].append(updated_product)
+                        # Track for vendor notification
+                        if vendor_id:
+                            if vendor_id not in out_of_stock_by_vendor:
+                                out_of_stock_by_vendor[vendor_id] = []
+                            out_of_stock_by_vendor[vendor_id].append(updated_product)
                 
                 # Send push notification to customer
                 try:
@@ -371,6 +408,9 @@ async def stripe_webhook(request: Request):
                             
                 except Exception as e:
                     print(f"Email notification error: {e}")
+                
+                # Last step: redeliveries of this event are now no-ops
+                await db.orders.update_one({"id": order_id}, {"$set": {"fulfilled_at": timestamp()}})
     
     elif event["type"] == "payment_intent.payment_failed":
         payment_intent = event["data"]["object"]
@@ -382,12 +422,17 @@ async def stripe_webhook(request: Request):
                 {
                     "$set": {
                         "payment_status": "failed",
-                        "payment_failed_at": datetime.now(timezone.utc).isoformat()
+                        "payment_failed_at": timestamp()
                     }
                 }
             )
-    
-    return {"status": "success"}
+            await sync_vendor_orders(db, order_id, {"payment_status": "failed"})
+            order = await db.orders.find_one({"id": order_id}, {"_id": 0, "user_id": 1, "status": 1})
+            if order:
+                await publish_order_update(order_id, order.get("user_id"), order.get("status"), payment_status="failed")
+
+
+register_handler("checkout", process_checkout_event)
 
 
 @router.post("/cart")
@@ -406,24 +451,24 @@ async def create_cart_checkout(
     if not items:
         raise HTTPException(status_code=400, detail="Cart is empty")
     
+    # Reuse the priced cart snapshot when it covers exactly these items,
+    # otherwise price them with one bulk product fetch
+    priced = await get_priced_cart(db, user["id"])
+    if not priced or not same_items(priced, items):
+        priced = await price_items(db, items)
+    
     # Create order first
     order_id = str(uuid.uuid4())
     order_items = []
-    subtotal = 0
+    subtotal = priced["total"]
     
-    for item in items:
-        product = await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
-        if not product:
-            continue
-        
-        item_total = float(product["price"]) * int(item.get("quantity", 1))
-        subtotal += item_total
-        
+    for line in priced["items"]:
+        product = line["product"]
         order_items.append({
-            "product_id": item["product_id"],
+            "product_id": line["product_id"],
             "name": product["name"],
             "price": product["price"],
-            "quantity": item.get("quantity", 1),
+            "quantity": line["quantity"],
             "image": product.get("images", [None])[0] if product.get("images") else None,
             "vendor_id": product.get("vendor_id")
         })
@@ -450,10 +495,11 @@ async def create_cart_checkout(
         "shipping_zip": shipping_info.get("zip"),
         "shipping_country": shipping_info.get("country"),
         "shipping_phone": shipping_info.get("phone"),
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp()
     }
     
     await db.orders.insert_one(order)
+    await create_vendor_orders(db, order)
     
     # Now create checkout session
     try:
@@ -518,4 +564,5 @@ async def create_cart_checkout(
     except stripe.error.StripeError as e:
         # Delete the order if checkout fails
         await db.orders.delete_one({"id": order_id})
+        await delete_vendor_orders(db, order_id)
         raise HTTPException(status_code=400, detail=f"Stripe error: {str(e)}")
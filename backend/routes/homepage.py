@@ -2,79 +2,130 @@
 AfroVending - Homepage Data Routes
 Social proof, recently sold, vendor success stories
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, Request, Response
 from datetime import datetime, timezone, timedelta
+import asyncio
+import hashlib
+import logging
+import os
 import random
+import time
 
 from database import get_db
+from datetimes import as_datetime, to_iso
+from serialization import dumps
+from compression import precompress, precompressed_response
+from conditional import is_not_modified
+from routes.categories import get_categories
 
 router = APIRouter(tags=["Homepage"])
+logger = logging.getLogger(__name__)
 
 # Separate router for homepage-prefixed routes
 homepage_router = APIRouter(prefix="/homepage", tags=["Homepage"])
 
+# Snapshot rebuild cadence (scheduler job) and browser/CDN cache lifetime
+HOMEPAGE_SNAPSHOT_INTERVAL = int(os.environ.get("HOMEPAGE_SNAPSHOT_INTERVAL", "300"))
+HOMEPAGE_CACHE_MAX_AGE = int(os.environ.get("HOMEPAGE_CACHE_MAX_AGE", "60"))
+# Writes that affect the homepage coalesce into one rebuild after this delay
+HOMEPAGE_REFRESH_DEBOUNCE = 5
 
-@router.get("/stats/platform")
-async def get_platform_stats():
-    """Get platform statistics for homepage display"""
-    db = get_db()
+FALLBACK_COUNTRIES = ["USA", "UK", "Canada", "Ghana", "Nigeria", "Kenya", "Germany", "France", "Netherlands"]
+
+# Fallback testimonials for vendors without stories
+FALLBACK_TESTIMONIALS = [
+    "AfroVending helped me reach customers I never thought possible. My business has grown 300%!",
+    "The platform is easy to use and the support team is amazing. Highly recommend for African entrepreneurs.",
+    "I started selling part-time and now it's my full-time business. AfroVending changed my life!",
+    "Global shipping support means I can sell to customers in Europe and America easily.",
+    "The community of vendors here is incredible. We help each other grow and succeed together.",
+]
+
+# In-memory copy of the current snapshot, served without touching the database
+_snapshot = {"data": None, "body": None, "encoded": {}, "etag": None, "built_at": None, "loaded_at": 0.0}
+_refresh_task = None
+_reload_lock = asyncio.Lock()
+
+
+# ==================== SNAPSHOT BUILDERS ====================
+
+async def _compute_stats(db) -> dict:
+    """Counts shared by /stats/platform and /homepage/stats"""
     total_vendors = await db.vendors.count_documents({"is_approved": True})
     total_products = await db.products.count_documents({"is_active": True})
     total_services = await db.services.count_documents({"is_active": True})
     
     # Get unique countries from vendors
-    countries = await db.vendors.distinct("country_code", {"is_approved": True})
-    countries_served = len([c for c in countries if c])
+    country_codes = await db.vendors.distinct("country_code", {"is_approved": True})
+    countries_served = len([c for c in country_codes if c])
     if countries_served == 0:
         countries_served = await db.countries.count_documents({})
     
+    countries = await db.vendors.distinct("country", {"is_approved": True})
+    
     return {
-        "total_vendors": total_vendors,
-        "total_products": total_products,
-        "total_services": total_services,
-        "countries_served": countries_served
+        "platform_stats": {
+            "total_vendors": total_vendors,
+            "total_products": total_products,
+            "total_services": total_services,
+            "countries_served": countries_served
+        },
+        "stats": {
+            "vendors": total_vendors,
+            "products": total_products,
+            "services": total_services,
+            "countries": len(countries),
+            "customers": 50000
+        }
     }
 
 
-@homepage_router.get("/recently-sold")
-async def get_recently_sold():
-    """Get recently sold items for social proof"""
-    db = get_db()
+def _time_ago(created_at, now: datetime) -> str:
+    diff = now - as_datetime(created_at)
+    
+    if diff.days > 0:
+        return f"{diff.days} days ago"
+    elif diff.seconds > 3600:
+        return f"{diff.seconds // 3600} hours ago"
+    return f"{diff.seconds // 60} minutes ago"
+
+
+async def _compute_recently_sold(db) -> list:
+    """Recently sold items, with every product resolved in one $in query"""
     recent_orders = await db.orders.find(
         {"status": {"$in": ["completed", "shipped", "delivered"]}},
-        {"_id": 0}
-    ).sort("created_at", -1).limit(20).to_list(20)
+        {"_id": 0, "items.product_id": 1, "created_at": 1}
+    ).sort("created_at", -1).limit(10).to_list(10)
+    
+    sold = [(order, order["items"][0]) for order in recent_orders if order.get("items")]
+    product_ids = list({item.get("product_id") for _, item in sold})
+    products = {
+        p["id"]: p async for p in db.products.find(
+            {"id": {"$in": product_ids}},
+            {"_id": 0, "id": 1, "name": 1, "images": 1, "price": 1}
+        )
+    }
     
+    now = datetime.now(timezone.utc)
     items = []
-    countries = ["USA", "UK", "Canada", "Ghana", "Nigeria", "Kenya", "Germany", "France", "Netherlands"]
-    
-    for order in recent_orders[:10]:
-        for item in order.get("items", [])[:1]:
-            product = await db.products.find_one({"id": item.get("product_id")}, {"_id": 0})
-            if product:
-                created = datetime.fromisoformat(order["created_at"].replace("Z", "+00:00"))
-                now = datetime.now(timezone.utc)
-                diff = now - created
-                
-                if diff.days > 0:
-                    time_ago = f"{diff.days} days ago"
-                elif diff.seconds > 3600:
-                    time_ago = f"{diff.seconds // 3600} hours ago"
-                else:
-                    time_ago = f"{diff.seconds // 60} minutes ago"
-                
-                items.append({
-                    "product_id": product["id"],
-                    "product_name": product["name"],
-                    "product_image": product.get("images", [None])[0],
-                    "price": product["price"],
-                    "sold_to": random.choice(countries),
-                    "time_ago": time_ago
-                })
+    for order, item in sold:
+        product = products.get(item.get("product_id"))
+        if product:
+            items.append({
+                "product_id": product["id"],
+                "product_name": product["name"],
+                "product_image": product.get("images", [None])[0],
+                "price": product["price"],
+                "sold_to": random.choice(FALLBACK_COUNTRIES),
+                "time_ago": _time_ago(order["created_at"], now)
+            })
     
     if len(items) < 5:
-        products = await db.products.find({"is_active": True}, {"_id": 0}).limit(10).to_list(10)
-        for product in products:
+        fallback = await db.products.find(
+            {"is_active": True},
+            {"_id": 0, "id": 1, "name": 1, "images": 1, "price": 1}
+        ).limit(10).to_list(10)
+        for product in fallback:
             if len(items) >= 5:
                 break
             items.append({
@@ -82,18 +133,15 @@ async def get_recently_sold():
                 "product_name": product["name"],
                 "product_image": product.get("images", [None])[0],
                 "price": product["price"],
-                "sold_to": random.choice(countries),
+                "sold_to": random.choice(FALLBACK_COUNTRIES),
                 "time_ago": f"{random.randint(1, 12)} hours ago"
             })
     
-    return {"items": items[:5]}
+    return items[:5]
 
 
-@homepage_router.get("/vendor-success")
-async def get_vendor_success_stories():
-    """Get vendor success stories for social proof"""
-    db = get_db()
-    
+async def _compute_vendor_success(db) -> list:
+    """Vendor success stories, with product counts from a single $group"""
     # First, try to get vendors with stories
     vendors_with_stories = await db.vendors.find(
         {"is_approved": True, "story": {"$exists": True, "$ne": ""}},
@@ -112,22 +160,18 @@ async def get_vendor_success_stories():
     else:
         vendors = vendors_with_stories
     
-    # Fallback testimonials for vendors without stories
-    fallback_testimonials = [
-        "AfroVending helped me reach customers I never thought possible. My business has grown 300%!",
-        "The platform is easy to use and the support team is amazing. Highly recommend for African entrepreneurs.",
-        "I started selling part-time and now it's my full-time business. AfroVending changed my life!",
-        "Global shipping support means I can sell to customers in Europe and America easily.",
-        "The community of vendors here is incredible. We help each other grow and succeed together.",
-    ]
+    product_counts = {
+        row["_id"]: row["count"] async for row in db.products.aggregate([
+            {"$match": {"vendor_id": {"$in": [v["id"] for v in vendors]}, "is_active": True}},
+            {"$group": {"_id": "$vendor_id", "count": {"$sum": 1}}}
+        ])
+    }
     
     stories = []
     
     for i, vendor in enumerate(vendors):
-        product_count = await db.products.count_documents({"vendor_id": vendor["id"], "is_active": True})
-        
         # Use vendor's story if available, otherwise use fallback testimonial
-        testimonial = vendor.get("story") or vendor.get("cultural_story") or fallback_testimonials[i % len(fallback_testimonials)]
+        testimonial = vendor.get("story") or vendor.get("cultural_story") or FALLBACK_TESTIMONIALS[i % len(FALLBACK_TESTIMONIALS)]
         
         stories.append({
             "vendor_id": vendor["id"],
@@ -135,34 +179,145 @@ async def get_vendor_success_stories():
             "logo": vendor.get("logo_url"),
             "country": vendor.get("country", "Africa"),
             "total_sales": vendor.get("total_sales", 0) or random.randint(5000, 50000),
-            "products": product_count,
+            "products": product_counts.get(vendor["id"], 0),
             "is_verified": vendor.get("is_verified", True),
-            "joined_date": vendor.get("created_at", "")[:10],
+            "joined_date": to_iso(vendor.get("created_at", ""))[:10],
             "average_rating": vendor.get("average_rating", 4.5),
             "testimonial": testimonial,
             "has_custom_story": bool(vendor.get("story") or vendor.get("cultural_story"))
         })
     
-    return {"vendors": stories}
+    return stories
 
 
-@homepage_router.get("/stats")
-async def get_homepage_stats():
-    """Get platform statistics for homepage"""
-    db = get_db()
-    vendor_count = await db.vendors.count_documents({"is_approved": True})
-    product_count = await db.products.count_documents({"is_active": True})
-    service_count = await db.services.count_documents({"is_active": True})
+def _store_in_memory(data: dict, built_at: str):
+    body = dumps(data)
+    _snapshot.update({
+        "data": data,
+        "body": body,
+        # Compressed once per snapshot, not per request
+        "encoded": precompress(body),
+        "etag": '"' + hashlib.sha1(body).hexdigest() + '"',
+        "built_at": built_at,
+        "loaded_at": time.monotonic()
+    })
+
+
+async def build_homepage_snapshot() -> dict:
+    """Recompute the homepage snapshot, persist it and swap it into memory"""
+    db = get_db("analytics")
+    built_at = datetime.now(timezone.utc).isoformat()
     
-    countries = await db.vendors.distinct("country", {"is_approved": True})
+    data = await _compute_stats(db)
+    data["recently_sold"] = await _compute_recently_sold(db)
+    data["vendor_success"] = await _compute_vendor_success(db)
+    data["featured_products"] = await db.products.find(
+        {"is_active": True}, {"_id": 0}
+    ).sort("created_at", -1).limit(8).to_list(8)
+    data["featured_vendors"] = await db.vendors.find(
+        {"is_approved": True}, {"_id": 0}
+    ).limit(6).to_list(6)
+    data["product_categories"] = await get_categories(type="product")
+    data["service_categories"] = await get_categories(type="service")
+    data["built_at"] = built_at
     
-    return {
-        "vendors": vendor_count,
-        "products": product_count,
-        "services": service_count,
-        "countries": len(countries),
-        "customers": 50000
+    # Persisted so other workers can pick it up without rebuilding
+    await db.homepage_snapshots.update_one(
+        {"id": "current"},
+        {"$set": {"id": "current", "data": data, "built_at": built_at}},
+        upsert=True
+    )
+    _store_in_memory(data, built_at)
+    logger.info("Homepage snapshot rebuilt")
+    return data
+
+
+async def get_homepage_snapshot() -> dict:
+    """Current snapshot from memory; reloaded from Mongo (or rebuilt) once it ages out"""
+    def is_fresh():
+        return _snapshot["data"] is not None and time.monotonic() - _snapshot["loaded_at"] < HOMEPAGE_SNAPSHOT_INTERVAL
+    
+    if is_fresh():
+        return _snapshot
+    
+    async with _reload_lock:
+        if is_fresh():
+            return _snapshot
+        
+        db = get_db()
+        stored = await db.homepage_snapshots.find_one({"id": "current"}, {"_id": 0})
+        if stored and stored.get("built_at") != _snapshot["built_at"]:
+            _store_in_memory(stored["data"], stored["built_at"])
+        elif _snapshot["data"] is None or not stored:
+            await build_homepage_snapshot()
+        else:
+            _snapshot["loaded_at"] = time.monotonic()
+    return _snapshot
+
+
+async def _delayed_refresh(delay: float):
+    await asyncio.sleep(delay)
+    try:
+        await build_homepage_snapshot()
+    except Exception as e:
+        logger.error(f"Homepage snapshot refresh failed: {e}")
+
+
+def request_homepage_refresh():
+    """Schedule a debounced snapshot rebuild after a write that changes homepage data"""
+    global _refresh_task
+    if _refresh_task is not None and not _refresh_task.done():
+        return
+    try:
+        _refresh_task = asyncio.get_running_loop().create_task(_delayed_refresh(HOMEPAGE_REFRESH_DEBOUNCE))
+    except RuntimeError:
+        pass
+
+
+# ==================== ENDPOINTS ====================
+
+@homepage_router.get("/bundle")
+async def get_homepage_bundle(request: Request):
+    """Everything the homepage needs for first paint, served from the in-memory snapshot"""
+    snapshot = await get_homepage_snapshot()
+    headers = {
+        "ETag": snapshot["etag"],
+        "Cache-Control": f"public, max-age={HOMEPAGE_CACHE_MAX_AGE}",
+        "Vary": "Accept-Encoding"
     }
+    
+    if is_not_modified(request, snapshot["etag"]):
+        return Response(status_code=304, headers=headers)
+    
+    return precompressed_response(request, snapshot["body"], snapshot["encoded"], headers=headers)
+
+
+@router.get("/stats/platform")
+async def get_platform_stats():
+    """Get platform statistics for homepage display"""
+    snapshot = await get_homepage_snapshot()
+    return snapshot["data"]["platform_stats"]
+
+
+@homepage_router.get("/recently-sold")
+async def get_recently_sold():
+    """Get recently sold items for social proof"""
+    snapshot = await get_homepage_snapshot()
+    return {"items": snapshot["data"]["recently_sold"]}
+
+
+@homepage_router.get("/vendor-success")
+async def get_vendor_success_stories():
+    """Get vendor success stories for social proof"""
+    snapshot = await get_homepage_snapshot()
+    return {"vendors": snapshot["data"]["vendor_success"]}
+
+
+@homepage_router.get("/stats")
+async def get_homepage_stats():
+    """Get platform statistics for homepage"""
+    snapshot = await get_homepage_snapshot()
+    return snapshot["data"]["stats"]
 
 
 # Include homepage_router into main router
@@ -2,16 +2,20 @@
 AfroVending - Notification Routes
 Includes both in-app notifications and push notifications
 """
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-from datetime import datetime, timezone
+import asyncio
 import uuid
 import json
 import os
 
 from database import get_db
-from auth import get_current_user
+from datetimes import timestamp
+from serialization import dumps
+from auth import get_current_user, get_user_from_token
+from event_bus import event_bus, user_topic, order_topic, publish_notification
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
@@ -21,6 +25,9 @@ VAPID_PUBLIC_KEY = os.environ.get('VAPID_PUBLIC_KEY', '')
 VAPID_CLAIMS_EMAIL = os.environ.get('VAPID_CLAIMS_EMAIL', 'support@afrovending.com')
 VAPID_CLAIMS = {"sub": f"mailto:{VAPID_CLAIMS_EMAIL}"}
 
+# Comment line sent on idle streams so proxies keep the connection open
+STREAM_HEARTBEAT_SECONDS = 20
+
 
 # ============ PYDANTIC MODELS ============
 class PushSubscription(BaseModel):
@@ -91,7 +98,7 @@ async def update_notification_preferences(
         "price_alerts": preferences.price_alerts,
         "new_products": preferences.new_products,
         "vendor_messages": preferences.vendor_messages,
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "updated_at": timestamp()
     }
     
     await db.notification_preferences.update_one(
@@ -103,6 +110,56 @@ async def update_notification_preferences(
     return {"success": True, "preferences": prefs_data}
 
 
+# ============ REALTIME STREAMS ============
+
+async def _event_stream(request: Request, *topics: str):
+    """Server-Sent Events generator; an idle stream is just a parked queue"""
+    with event_bus.subscribe(*topics) as queue:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event.get('type', 'message')}\ndata: {dumps(event).decode()}\n\n"
+
+
+def _sse_response(generator) -> StreamingResponse:
+    return StreamingResponse(
+        generator,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/stream")
+async def stream_notifications(request: Request, token: Optional[str] = None):
+    """
+    Push channel for the signed-in user: new notifications and order updates.
+    EventSource can't send headers, so the JWT may also be passed as ?token=.
+    """
+    if token:
+        user = await get_user_from_token(token)
+    else:
+        user = await get_current_user(request)
+    
+    return _sse_response(_event_stream(request, user_topic(user["id"])))
+
+
+@router.get("/orders/{order_id}/stream")
+async def stream_order_tracking(order_id: str, request: Request):
+    """Public push channel for order tracking - mirrors /orders/track/{order_id}"""
+    db = get_db()
+    order = await db.orders.find_one({"id": order_id}, {"_id": 0, "id": 1})
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    return _sse_response(_event_stream(request, order_topic(order_id)))
+
+
 # ============ IN-APP NOTIFICATIONS ============
 
 
@@ -126,7 +183,7 @@ async def mark_notification_read(notification_id: str, user: dict = Depends(get_
     db = get_db()
     result = await db.notifications.update_one(
         {"id": notification_id, "user_id": user["id"]},
-        {"$set": {"read": True, "read_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"read": True, "read_at": timestamp()}}
     )
     
     if result.modified_count == 0:
@@ -141,7 +198,7 @@ async def mark_all_read(user: dict = Depends(get_current_user)):
     db = get_db()
     await db.notifications.update_many(
         {"user_id": user["id"], "read": False},
-        {"$set": {"read": True, "read_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"read": True, "read_at": timestamp()}}
     )
     
     return {"message": "All notifications marked as read"}
@@ -174,7 +231,7 @@ async def subscribe_push(
         "endpoint": data.subscription.get("endpoint"),
         "keys": data.subscription.get("keys"),
         "subscription_json": json.dumps(data.subscription),
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "created_at": timestamp(),
         "is_active": True
     }
     
@@ -310,8 +367,8 @@ async def send_push_notifications_batch(subscriptions: list, payload: dict):
 
 # ============ NOTIFICATION HELPERS ============
 
-async def create_notification(user_id: str, title: str, message: str, notification_type: str, link: str = None):
-    """Helper to create in-app notification"""
+async def create_notification(user_id: str, title: str, message: str, notification_type: str, link: str = None, **extra):
+    """Helper to create in-app notification (extra keyword fields are stored as-is)"""
     db = get_db()
     
     notification = {
@@ -322,10 +379,12 @@ async def create_notification(user_id: str, title: str, message: str, notificati
         "type": notification_type,
         "link": link,
         "read": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp(),
+        **extra
     }
     
     await db.notifications.insert_one(notification)
+    await publish_notification(notification)
     return notification
 
 
@@ -4,11 +4,20 @@ AfroVending - Cart & Order Routes
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from datetime import datetime, timezone
 from typing import List
+from pymongo.errors import DuplicateKeyError
 import uuid
 
 from database import get_db
+from datetimes import timestamp
 from auth import get_current_user
 from models import CartItem, OrderCreate, OrderResponse
+from serialization import fast_response
+from cart_service import get_priced_cart, cart_update
+from event_bus import publish_order_update
+from vendor_order_service import as_vendor_order_view, sync_vendor_orders
+from ledger_service import record_order_settlements, SETTLED_STATUSES
+from projections import projection_for
+from routes.homepage import request_homepage_refresh
 
 router = APIRouter(tags=["Cart & Orders"])
 
@@ -18,59 +27,48 @@ router = APIRouter(tags=["Cart & Orders"])
 async def get_cart(user: dict = Depends(get_current_user)):
     """Get current user's cart"""
     db = get_db()
-    cart = await db.carts.find_one({"user_id": user["id"]}, {"_id": 0})
-    if not cart:
+    priced = await get_priced_cart(db, user["id"])
+    if not priced:
         return {"items": [], "total": 0}
     
-    items_with_details = []
-    total = 0
-    
-    for item in cart.get("items", []):
-        product = await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
-        if product:
-            item_total = product["price"] * item["quantity"]
-            items_with_details.append({
-                "product_id": item["product_id"],
-                "quantity": item["quantity"],
-                "product": product,
-                "subtotal": item_total
-            })
-            total += item_total
-    
-    return {"items": items_with_details, "total": total}
+    return {"items": priced["items"], "total": priced["total"], "version": priced["version"]}
 
 
 @router.post("/cart/add")
 async def add_to_cart(item: CartItem, user: dict = Depends(get_current_user)):
     """Add item to cart"""
     db = get_db()
-    product = await db.products.find_one({"id": item.product_id}, {"_id": 0})
+    product = await db.products.find_one({"id": item.product_id}, {"_id": 0, "stock": 1})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     if product["stock"] < item.quantity:
         raise HTTPException(status_code=400, detail="Not enough stock")
     
-    cart = await db.carts.find_one({"user_id": user["id"]})
+    # Bump the quantity in place when the item is already in the cart...
+    result = await db.carts.update_one(
+        {"user_id": user["id"], "items.product_id": item.product_id},
+        cart_update(**{"$inc": {"items.$.quantity": item.quantity}})
+    )
+    if result.matched_count:
+        return {"message": "Added to cart"}
     
-    if cart:
-        existing_item = next((i for i in cart["items"] if i["product_id"] == item.product_id), None)
-        if existing_item:
-            await db.carts.update_one(
-                {"user_id": user["id"], "items.product_id": item.product_id},
-                {"$set": {"items.$.quantity": existing_item["quantity"] + item.quantity}}
-            )
-        else:
-            await db.carts.update_one(
-                {"user_id": user["id"]},
-                {"$push": {"items": {"product_id": item.product_id, "quantity": item.quantity}}}
-            )
-    else:
-        await db.carts.insert_one({
-            "user_id": user["id"],
-            "items": [{"product_id": item.product_id, "quantity": item.quantity}],
-            "created_at": datetime.now(timezone.utc).isoformat()
-        })
+    # ...otherwise append it, creating the cart if needed
+    try:
+        await db.carts.update_one(
+            {"user_id": user["id"], "items.product_id": {"$ne": item.product_id}},
+            cart_update(**{
+                "$push": {"items": {"product_id": item.product_id, "quantity": item.quantity}},
+                "$setOnInsert": {"created_at": timestamp()}
+            }),
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # A concurrent request added the same item first
+        await db.carts.update_one(
+            {"user_id": user["id"], "items.product_id": item.product_id},
+            cart_update(**{"$inc": {"items.$.quantity": item.quantity}})
+        )
     
     return {"message": "Added to cart"}
 
@@ -82,12 +80,12 @@ async def update_cart_item(product_id: str, quantity: int, user: dict = Depends(
     if quantity <= 0:
         await db.carts.update_one(
             {"user_id": user["id"]},
-            {"$pull": {"items": {"product_id": product_id}}}
+            cart_update(**{"$pull": {"items": {"product_id": product_id}}})
         )
     else:
         await db.carts.update_one(
             {"user_id": user["id"], "items.product_id": product_id},
-            {"$set": {"items.$.quantity": quantity}}
+            cart_update(**{"$set": {"items.$.quantity": quantity}})
         )
     return {"message": "Cart updated"}
 
@@ -98,7 +96,7 @@ async def remove_from_cart(product_id: str, user: dict = Depends(get_current_use
     db = get_db()
     await db.carts.update_one(
         {"user_id": user["id"]},
-        {"$pull": {"items": {"product_id": product_id}}}
+        cart_update(**{"$pull": {"items": {"product_id": product_id}}})
     )
     return {"message": "Removed from cart"}
 
@@ -113,14 +111,17 @@ async def clear_cart(user: dict = Depends(get_current_user)):
 
 # ==================== ORDERS ====================
 @router.get("/orders")
-async def get_orders(user: dict = Depends(get_current_user)):
+async def get_orders(
+    user: dict = Depends(get_current_user),
+    projection: dict = Depends(projection_for("orders"))
+):
     """Get current user's orders"""
     db = get_db()
     orders = await db.orders.find(
         {"user_id": user["id"]}, 
-        {"_id": 0}
+        projection
     ).sort("created_at", -1).to_list(100)
-    return orders
+    return fast_response(orders)
 
 
 @router.get("/orders/track/{order_id}")
@@ -216,12 +217,13 @@ async def get_vendor_orders(user: dict = Depends(get_current_user)):
     if not vendor:
         raise HTTPException(status_code=403, detail="Vendor access required")
     
-    orders = await db.orders.find(
-        {"items.vendor_id": vendor["id"]}, 
+    # Vendor-scoped sub-orders: one indexed (vendor_id, created_at) range read
+    sub_orders = await db.vendor_orders.find(
+        {"vendor_id": vendor["id"]}, 
         {"_id": 0}
     ).sort("created_at", -1).to_list(100)
     
-    return orders
+    return fast_response([as_vendor_order_view(s) for s in sub_orders])
 
 
 @router.put("/orders/{order_id}/status")
@@ -232,11 +234,16 @@ async def update_order_status(
     user: dict = Depends(get_current_user)
 ):
     """Update order status (vendor or admin)"""
+    # Refunds reverse ledger entries and go through POST /admin/orders/{id}/refund
+    if status == "refunded":
+        raise HTTPException(status_code=400, detail="Refunds must be issued through the admin refund endpoint")
+    
     db = get_db()
     order = await db.orders.find_one({"id": order_id}, {"_id": 0})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    vendor = None
     if user.get("role") != "admin":
         vendor = await db.vendors.find_one({"user_id": user["id"]}, {"_id": 0})
         if not vendor:
@@ -244,7 +251,7 @@ async def update_order_status(
     
     update_data = {
         "status": status,
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "updated_at": timestamp()
     }
     
     if tracking_number:
@@ -263,6 +270,19 @@ async def update_order_status(
             "$push": {"timeline": timeline_entry}
         }
     )
+    # Vendors move their own slice of the order; admins move every slice
+    await sync_vendor_orders(db, order_id, update_data, vendor_id=vendor["id"] if vendor else None)
+    if status in SETTLED_STATUSES:
+        await record_order_settlements(db, order_id, vendor_id=vendor["id"] if vendor else None)
+    
+    await publish_order_update(
+        order_id, order["user_id"], status,
+        tracking_number=tracking_number or order.get("tracking_number"),
+        timeline_entry=timeline_entry
+    )
+    
+    if status in ("shipped", "delivered", "completed"):
+        request_homepage_refresh()
     
     # Trigger push notification for order status updates
     try:
@@ -285,32 +305,36 @@ async def reorder(order_id: str, user: dict = Depends(get_current_user)):
     if order["user_id"] != user["id"]:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Add items to cart
-    cart = await db.carts.find_one({"user_id": user["id"]})
+    # Add in-stock items to cart (one bulk product fetch)
+    wanted = [i for i in order.get("items", []) if i.get("product_id")]
+    stock = {
+        p["id"]: p.get("stock", 0) async for p in db.products.find(
+            {"id": {"$in": [i["product_id"] for i in wanted]}},
+            {"_id": 0, "id": 1, "stock": 1}
+        )
+    }
+    cart = await db.carts.find_one({"user_id": user["id"]}, {"_id": 0, "items.product_id": 1})
+    in_cart = {i["product_id"] for i in cart.get("items", [])} if cart else set()
     
-    for item in order.get("items", []):
-        product = await db.products.find_one({"id": item["product_id"]}, {"_id": 0})
-        if not product or product["stock"] < item.get("quantity", 1):
+    for item in wanted:
+        quantity = item.get("quantity", 1)
+        if stock.get(item["product_id"], 0) < quantity:
             continue
         
-        if cart:
-            existing = next((i for i in cart.get("items", []) if i["product_id"] == item["product_id"]), None)
-            if existing:
-                await db.carts.update_one(
-                    {"user_id": user["id"], "items.product_id": item["product_id"]},
-                    {"$inc": {"items.$.quantity": item.get("quantity", 1)}}
-                )
-            else:
-                await db.carts.update_one(
-                    {"user_id": user["id"]},
-                    {"$push": {"items": {"product_id": item["product_id"], "quantity": item.get("quantity", 1)}}}
-                )
+        if item["product_id"] in in_cart:
+            await db.carts.update_one(
+                {"user_id": user["id"], "items.product_id": item["product_id"]},
+                cart_update(**{"$inc": {"items.$.quantity": quantity}})
+            )
         else:
-            await db.carts.insert_one({
-                "user_id": user["id"],
-                "items": [{"product_id": item["product_id"], "quantity": item.get("quantity", 1)}],
-                "created_at": datetime.now(timezone.utc).isoformat()
-            })
-            cart = {"items": []}
+            await db.carts.update_one(
+                {"user_id": user["id"]},
+                cart_update(**{
+                    "$push": {"items": {"product_id": item["product_id"], "quantity": quantity}},
+                    "$setOnInsert": {"created_at": timestamp()}
+                }),
+                upsert=True
+            )
+            in_cart.add(item["product_id"])
     
     return {"message": "Items added to cart"}
@@ -2,11 +2,12 @@
 AfroVending - Price Alert Routes
 """
 from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime, timezone
+from typing import List, Optional
 import uuid
 import logging
 
 from database import get_db
+from datetimes import timestamp
 from auth import get_current_user
 from models import PriceAlertCreate
 
@@ -53,7 +54,7 @@ async def create_price_alert(alert_data: PriceAlertCreate, user: dict = Depends(
                 "target_price": alert_data.target_price,
                 "notify_email": alert_data.notify_email,
                 "notify_app": alert_data.notify_app,
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": timestamp()
             }}
         )
         return {"message": "Price alert updated", "alert_id": existing["id"]}
@@ -69,7 +70,7 @@ async def create_price_alert(alert_data: PriceAlertCreate, user: dict = Depends(
         "notify_app": alert_data.notify_app,
         "is_active": True,
         "triggered": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp()
     }
     
     await db.price_alerts.insert_one(alert)
@@ -88,53 +89,109 @@ async def delete_price_alert(alert_id: str, user: dict = Depends(get_current_use
 
 
 async def check_price_alerts_for_product(product_id: str, new_price: float):
-    """Check all alerts for a specific product and send notifications if price dropped"""
+    """Trigger the alerts whose target the new price has reached (indexed lookup)"""
     db = get_db()
-    active_alerts = await db.price_alerts.find({
+    alerts = await db.price_alerts.find({
         "product_id": product_id,
-        "is_active": True,
-        "triggered": False
-    }, {"_id": 0}).to_list(1000)
+        "triggered": False,
+        "target_price": {"$gte": new_price},
+        "is_active": True
+    }, {"_id": 0}).to_list(None)
     
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
-    if not product:
-        return
+    if alerts:
+        await trigger_price_alerts(db, product_id, new_price, alerts)
+    return len(alerts)
+
+
+async def sweep_price_alerts(product_ids: Optional[List[str]] = None):
+    """
+    Check every active alert in one pass: alerts are grouped by product and
+    joined to the current price server-side, so only reachable targets come back.
+    `product_ids` limits the sweep, e.g. to the products of a bulk price edit.
+    """
+    db = get_db()
+    match = {"is_active": True, "triggered": False}
+    if product_ids is not None:
+        match["product_id"] = {"$in": product_ids}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$product_id",
+            "alerts": {"$push": "$$ROOT"},
+            "max_target": {"$max": "$target_price"}
+        }},
+        {"$lookup": {
+            "from": "products",
+            "localField": "_id",
+            "foreignField": "id",
+            "as": "product"
+        }},
+        {"$project": {
+            "alerts": 1,
+            "max_target": 1,
+            "price": {"$arrayElemAt": ["$product.price", 0]}
+        }},
+        {"$match": {"price": {"$ne": None}, "$expr": {"$lte": ["$price", "$max_target"]}}},
+        {"$project": {
+            "price": 1,
+            "alerts": {"$filter": {
+                "input": "$alerts",
+                "cond": {"$gte": ["$$this.target_price", "$price"]}
+            }}
+        }}
+    ]
     
-    for alert in active_alerts:
-        if new_price <= alert["target_price"]:
-            user = await db.users.find_one({"id": alert["user_id"]}, {"_id": 0, "email": 1, "first_name": 1})
-            
-            if alert.get("notify_email") and user:
-                try:
-                    await send_price_alert_email(
-                        user["email"],
-                        alert["product_name"],
-                        alert["target_price"],
-                        new_price,
-                        alert["product_id"]
-                    )
-                    logger.info(f"Sent price alert email to {user['email']} for product {product_id}")
-                except Exception as e:
-                    logger.error(f"Failed to send price alert email: {e}")
-            
-            if alert.get("notify_app"):
-                await db.notifications.insert_one({
-                    "id": str(uuid.uuid4()),
-                    "user_id": alert["user_id"],
-                    "type": "price_alert",
-                    "title": "Price Drop Alert!",
-                    "message": f"{alert['product_name']} is now ${new_price:.2f} (was ${alert.get('current_price', 0):.2f})",
-                    "product_id": alert["product_id"],
-                    "link": f"/products/{product_id}",
-                    "read": False,
-                    "created_at": datetime.now(timezone.utc).isoformat()
-                })
-            
-            await db.price_alerts.update_one(
-                {"id": alert["id"]},
-                {"$set": {"triggered": True, "triggered_at": datetime.now(timezone.utc).isoformat()}}
+    triggered = 0
+    products = 0
+    async for group in db.price_alerts.aggregate(pipeline):
+        alerts = [{k: v for k, v in a.items() if k != "_id"} for a in group["alerts"]]
+        await trigger_price_alerts(db, group["_id"], group["price"], alerts)
+        triggered += len(alerts)
+        products += 1
+    
+    return {"products": products, "triggered": triggered}
+
+
+async def trigger_price_alerts(db, product_id: str, new_price: float, alerts: list):
+    """Notify the owners of already-matched alerts and mark them triggered in bulk"""
+    from routes.notifications import create_notification
+    
+    user_ids = list({a["user_id"] for a in alerts if a.get("notify_email")})
+    users = {}
+    if user_ids:
+        async for u in db.users.find({"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "email": 1}):
+            users[u["id"]] = u
+    
+    for alert in alerts:
+        user = users.get(alert["user_id"])
+        if alert.get("notify_email") and user and user.get("email"):
+            try:
+                await send_price_alert_email(
+                    user["email"],
+                    alert["product_name"],
+                    alert["target_price"],
+                    new_price,
+                    alert["product_id"]
+                )
+                logger.info(f"Sent price alert email to {user['email']} for product {product_id}")
+            except Exception as e:
+                logger.error(f"Failed to send price alert email: {e}")
+        
+        if alert.get("notify_app"):
+            await create_notification(
+                user_id=alert["user_id"],
+                title="Price Drop Alert!",
+                message=f"{alert['product_name']} is now ${new_price:.2f} (was ${alert.get('current_price', 0):.2f})",
+                notification_type="price_alert",
+                link=f"/products/{product_id}",
+                product_id=product_id
             )
-            logger.info(f"Price alert {alert['id']} triggered for user {alert['user_id']}")
+    
+    await db.price_alerts.update_many(
+        {"id": {"$in": [a["id"] for a in alerts]}, "triggered": False},
+        {"$set": {"triggered": True, "triggered_at": timestamp()}}
+    )
+    logger.info(f"Triggered {len(alerts)} price alerts for product {product_id}")
 
 
 async def send_price_alert_email(to_email: str, product_name: str, target_price: float, current_price: float, product_id: str):
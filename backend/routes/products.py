@@ -1,33 +1,48 @@
 """
 AfroVending - Product Routes
 """
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query
-from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional, List
 import uuid
 
 from database import get_db
+from datetimes import timestamp
 from auth import get_current_user
-from models import ProductCreate, ProductResponse
+from models import ProductCreate, ProductResponse, ProductBulkEdit
+from serialization import fast_response, trusted_dump
+from routes.homepage import request_homepage_refresh
+from vendor_attributes import vendor_attributes
+from projections import projection_for, aggregation_projection
+from conditional import conditional_document, version_fields, versioned
 
 router = APIRouter(prefix="/products", tags=["Products"])
 vendor_router = APIRouter(prefix="/vendor", tags=["Vendor Products"])
 
 
-@router.get("")
-async def get_products(
+PRODUCT_SORT_OPTIONS = {
+    "newest": [("created_at", -1)],
+    "price_low": [("price", 1)],
+    "price_high": [("price", -1)],
+    "popular": [("sales_count", -1)],
+    "rating": [("average_rating", -1)]
+}
+
+# Facet bucket edges; the last price bucket is open ended
+PRICE_BUCKET_BOUNDARIES = [0, 25, 50, 100, 250, 500]
+RATING_FACET_MINIMUMS = [4, 3, 2, 1]
+
+
+def build_product_query(
     category_id: Optional[str] = None,
     vendor_id: Optional[str] = None,
     country: Optional[str] = None,
     search: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    sort: str = "newest",
-    skip: int = 0,
-    limit: int = 20
-):
-    """Get products with optional filters"""
-    db = get_db()
+    verified: Optional[bool] = None
+) -> dict:
+    """Mongo filter for the public product listing parameters"""
     query = {"is_active": True}
     
     if category_id:
@@ -48,26 +63,147 @@ async def get_products(
         else:
             query["price"] = {"$lte": max_price}
     
+    # Vendor attributes are denormalized onto products (see vendor_attributes.py)
     if country:
-        vendor_ids = await db.vendors.distinct("id", {"country": country})
-        query["vendor_id"] = {"$in": vendor_ids}
-    
-    sort_options = {
-        "newest": [("created_at", -1)],
-        "price_low": [("price", 1)],
-        "price_high": [("price", -1)],
-        "popular": [("sales_count", -1)],
-        "rating": [("average_rating", -1)]
+        query["vendor_country"] = country
+    if verified is not None:
+        query["vendor_is_verified"] = verified
+    
+    return query
+
+
+async def get_product_facets(
+    db, query: dict, sort: str = "newest", skip: int = 0, limit: int = 20, projection: dict = None
+) -> dict:
+    """Result page, total and all facet counts from a single $facet aggregation
+    
+    Facet counts are computed over the same filtered set as the results.
+    """
+    sort_spec = dict(PRODUCT_SORT_OPTIONS.get(sort, PRODUCT_SORT_OPTIONS["newest"]))
+    pipeline = [
+        {"$match": query},
+        {"$facet": {
+            "products": [
+                {"$sort": sort_spec},
+                {"$skip": skip},
+                {"$limit": limit},
+                {"$project": aggregation_projection(projection or {"_id": 0})}
+            ],
+            "total": [{"$count": "count"}],
+            "categories": [
+                {"$group": {"_id": "$category_id", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}}
+            ],
+            "countries": [
+                {"$group": {"_id": "$vendor_country", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}}
+            ],
+            "price_ranges": [
+                {"$bucket": {
+                    "groupBy": "$price",
+                    "boundaries": PRICE_BUCKET_BOUNDARIES,
+                    "default": "above",
+                    "output": {"count": {"$sum": 1}}
+                }}
+            ],
+            "ratings": [
+                {"$group": {"_id": {"$floor": {"$ifNull": ["$average_rating", 0]}}, "count": {"$sum": 1}}}
+            ]
+        }}
+    ]
+    result = (await db.products.aggregate(pipeline, allowDiskUse=True).to_list(1))[0]
+    
+    # Category names for the ids that actually appear
+    category_ids = [c["_id"] for c in result["categories"] if c["_id"]]
+    names = {
+        c["id"]: c["name"] async for c in db.categories.find(
+            {"id": {"$in": category_ids}}, {"_id": 0, "id": 1, "name": 1}
+        )
+    }
+    
+    price_counts = {b["_id"]: b["count"] for b in result["price_ranges"]}
+    edges = PRICE_BUCKET_BOUNDARIES
+    price_ranges = [
+        {"min": low, "max": high, "count": price_counts.get(low, 0)}
+        for low, high in zip(edges, edges[1:])
+    ]
+    price_ranges.append({"min": edges[-1], "max": None, "count": price_counts.get("above", 0)})
+    
+    # "N stars & up" counts from the per-star histogram
+    stars = {int(r["_id"]): r["count"] for r in result["ratings"]}
+    ratings = [
+        {"min_rating": minimum, "count": sum(n for star, n in stars.items() if star >= minimum)}
+        for minimum in RATING_FACET_MINIMUMS
+    ]
+    
+    return {
+        "products": result["products"],
+        "total": result["total"][0]["count"] if result["total"] else 0,
+        "facets": {
+            "categories": [
+                {"id": c["_id"], "name": names.get(c["_id"]), "count": c["count"]}
+                for c in result["categories"] if c["_id"]
+            ],
+            "countries": [
+                {"country": c["_id"], "count": c["count"]}
+                for c in result["countries"] if c["_id"]
+            ],
+            "price_ranges": price_ranges,
+            "ratings": ratings
+        }
     }
+
+
+@router.get("")
+async def get_products(
+    category_id: Optional[str] = None,
+    vendor_id: Optional[str] = None,
+    country: Optional[str] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    verified: Optional[bool] = None,
+    sort: str = "newest",
+    skip: int = 0,
+    limit: int = 20,
+    facets: bool = False,
+    projection: dict = Depends(projection_for("products"))
+):
+    """Get products with optional filters (facets=true adds total and facet counts)"""
+    db = get_db("catalogue")
+    query = build_product_query(category_id, vendor_id, country, search, min_price, max_price, verified)
+    
+    if facets:
+        return fast_response(await get_product_facets(db, query, sort, skip, limit, projection))
     
-    products = await db.products.find(query, {"_id": 0}).sort(
-        sort_options.get(sort, [("created_at", -1)])
+    products = await db.products.find(query, projection).sort(
+        PRODUCT_SORT_OPTIONS.get(sort, PRODUCT_SORT_OPTIONS["newest"])
     ).skip(skip).limit(limit).to_list(limit)
     
-    return products
+    return fast_response(products)
+
+
+@router.get("/facets")
+async def get_products_with_facets(
+    category_id: Optional[str] = None,
+    vendor_id: Optional[str] = None,
+    country: Optional[str] = None,
+    search: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    verified: Optional[bool] = None,
+    sort: str = "newest",
+    skip: int = 0,
+    limit: int = 20,
+    projection: dict = Depends(projection_for("products"))
+):
+    """Product page plus category, country, price range and rating facet counts"""
+    db = get_db("catalogue")
+    query = build_product_query(category_id, vendor_id, country, search, min_price, max_price, verified)
+    return fast_response(await get_product_facets(db, query, sort, skip, limit, projection))
 
 
-@router.get("/{product_id}")
+@router.get("/{product_id}", dependencies=[Depends(conditional_document("products", "product_id", related=(("vendors", "vendor_id"),)))])
 async def get_product(product_id: str):
     """Get single product by ID"""
     db = get_db()
@@ -98,6 +234,90 @@ async def get_my_products(user: dict = Depends(get_current_user), skip: int = 0,
     return products
 
 
+@vendor_router.post("/products/import")
+async def import_my_products(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    format: Optional[str] = None,
+    dry_run: bool = False,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Bulk create/update products from a CSV or JSON Lines request body.
+    The format comes from `format` (csv/jsonl) or the Content-Type header.
+    """
+    from bulk_products import import_products, detect_format
+    db = get_db()
+    
+    vendor = await db.vendors.find_one({"user_id": user["id"]}, {"_id": 0})
+    if not vendor:
+        raise HTTPException(status_code=403, detail="Only vendors can import products")
+    
+    fmt = detect_format(request.headers.get("content-type"), format)
+    if not fmt:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass format=csv|jsonl")
+    
+    report = await import_products(db, vendor, request.stream(), fmt, dry_run=dry_run)
+    if report["created"] or report["updated"]:
+        request_homepage_refresh()
+    # One alert sweep over every updated product whose price dropped
+    if report["price_dropped"]:
+        from routes.price_alerts import sweep_price_alerts
+        background_tasks.add_task(sweep_price_alerts, report["price_dropped"])
+    return report
+
+
+@vendor_router.get("/products/export")
+async def export_my_products(format: str = "csv", user: dict = Depends(get_current_user)):
+    """Stream the vendor's products as CSV or JSON Lines"""
+    from bulk_products import export_products, FORMATS
+    db = get_db("catalogue")
+    
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or jsonl")
+    
+    vendor = await get_db().vendors.find_one({"user_id": user["id"]}, {"_id": 0, "id": 1})
+    if not vendor:
+        raise HTTPException(status_code=403, detail="No vendor profile found")
+    
+    return StreamingResponse(
+        export_products(db, vendor["id"], format),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'}
+    )
+
+
+@vendor_router.post("/products/bulk-edit")
+async def bulk_edit_my_products(
+    edit: ProductBulkEdit,
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Change price (percent or amount), stock (value or delta) and/or visibility
+    of a selection of the vendor's products in one request.
+    """
+    from bulk_products import bulk_edit_products
+    db = get_db()
+    
+    vendor = await db.vendors.find_one({"user_id": user["id"]}, {"_id": 0, "id": 1})
+    if not vendor:
+        raise HTTPException(status_code=403, detail="Only vendors can edit products")
+    
+    try:
+        result = await bulk_edit_products(db, vendor["id"], edit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if result["modified"]:
+        request_homepage_refresh()
+        # One alert sweep over every product whose price dropped
+        if result["price_dropped"]:
+            from routes.price_alerts import sweep_price_alerts
+            background_tasks.add_task(sweep_price_alerts, result["price_dropped"])
+    return result
+
+
 @router.post("", response_model=ProductResponse)
 async def create_product(product_data: ProductCreate, user: dict = Depends(get_current_user)):
     """Create a new product"""
@@ -110,17 +330,20 @@ async def create_product(product_data: ProductCreate, user: dict = Depends(get_c
         "id": str(uuid.uuid4()),
         "vendor_id": vendor["id"],
         **product_data.model_dump(),
+        **vendor_attributes(vendor),
         "is_active": True,
         "average_rating": 0,
         "review_count": 0,
         "sales_count": 0,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp(),
+        **version_fields()
     }
     
     await db.products.insert_one(product)
-    await db.vendors.update_one({"id": vendor["id"]}, {"$inc": {"product_count": 1}})
+    await db.vendors.update_one({"id": vendor["id"]}, versioned({"$inc": {"product_count": 1}}))
+    request_homepage_refresh()
     
-    return ProductResponse(**{k: v for k, v in product.items() if k != "_id"})
+    return fast_response(trusted_dump(ProductResponse, product))
 
 
 @router.put("/{product_id}")
@@ -143,7 +366,8 @@ async def update_product(
     old_price = product.get("price", 0)
     new_price = product_data.price
     
-    await db.products.update_one({"id": product_id}, {"$set": product_data.model_dump()})
+    await db.products.update_one({"id": product_id}, versioned({"$set": product_data.model_dump()}))
+    request_homepage_refresh()
     
     # If price dropped, check price alerts in background
     if new_price < old_price:
@@ -166,6 +390,7 @@ async def delete_product(product_id: str, user: dict = Depends(get_current_user)
         raise HTTPException(status_code=403, detail="Not authorized")
     
     await db.products.delete_one({"id": product_id})
-    await db.vendors.update_one({"id": vendor["id"]}, {"$inc": {"product_count": -1}})
+    await db.vendors.update_one({"id": vendor["id"]}, versioned({"$inc": {"product_count": -1}}))
+    request_homepage_refresh()
     
     return {"message": "Product deleted"}
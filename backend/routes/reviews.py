@@ -2,12 +2,13 @@
 AfroVending - Review Routes
 """
 from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime, timezone
 import uuid
 
 from database import get_db
+from datetimes import timestamp
 from auth import get_current_user
 from models import ReviewCreate
+from rating_service import apply_review, get_rating_summary
 
 router = APIRouter(prefix="/reviews", tags=["Reviews"])
 
@@ -18,43 +19,29 @@ async def get_reviews_by_query(product_id: str = None, skip: int = 0, limit: int
     if not product_id:
         return {"reviews": [], "total": 0, "distribution": {}}
     
-    db = get_db()
+    db = get_db("catalogue")
     reviews = await db.reviews.find(
         {"product_id": product_id},
         {"_id": 0}
     ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     
-    total = await db.reviews.count_documents({"product_id": product_id})
-    
-    pipeline = [
-        {"$match": {"product_id": product_id}},
-        {"$group": {"_id": "$rating", "count": {"$sum": 1}}}
-    ]
-    rating_dist = await db.reviews.aggregate(pipeline).to_list(10)
-    distribution = {str(r["_id"]): r["count"] for r in rating_dist}
+    summary = await get_rating_summary(db, product_id)
     
-    return {"reviews": reviews, "total": total, "distribution": distribution}
+    return {"reviews": reviews, **summary}
 
 
 @router.get("/product/{product_id}")
 async def get_product_reviews(product_id: str, skip: int = 0, limit: int = 20):
     """Get reviews for a product"""
-    db = get_db()
+    db = get_db("catalogue")
     reviews = await db.reviews.find(
         {"product_id": product_id},
         {"_id": 0}
     ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     
-    total = await db.reviews.count_documents({"product_id": product_id})
-    
-    pipeline = [
-        {"$match": {"product_id": product_id}},
-        {"$group": {"_id": "$rating", "count": {"$sum": 1}}}
-    ]
-    rating_dist = await db.reviews.aggregate(pipeline).to_list(10)
-    distribution = {str(r["_id"]): r["count"] for r in rating_dist}
+    summary = await get_rating_summary(db, product_id)
     
-    return {"reviews": reviews, "total": total, "distribution": distribution}
+    return {"reviews": reviews, **summary}
 
 
 @router.post("/product/{product_id}")
@@ -88,11 +75,11 @@ async def create_product_review(
         "would_recommend": review_data.would_recommend,
         "helpful_votes": 0,
         "verified_purchase": False,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp()
     }
     
     await db.reviews.insert_one(review)
-    await update_product_rating(db, product_id)
+    await apply_review(db, product_id, review_data.rating)
     
     return {k: v for k, v in review.items() if k != "_id"}
 
@@ -115,31 +102,9 @@ async def mark_review_helpful(review_id: str, user: dict = Depends(get_current_u
     await db.review_votes.insert_one({
         "review_id": review_id,
         "user_id": user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp()
     })
     
     await db.reviews.update_one({"id": review_id}, {"$inc": {"helpful_votes": 1}})
     
     return {"message": "Vote recorded"}
-
-
-async def update_product_rating(db, product_id: str):
-    """Recalculate and update product rating"""
-    pipeline = [
-        {"$match": {"product_id": product_id}},
-        {"$group": {
-            "_id": None,
-            "avg_rating": {"$avg": "$rating"},
-            "count": {"$sum": 1}
-        }}
-    ]
-    result = await db.reviews.aggregate(pipeline).to_list(1)
-    
-    if result:
-        await db.products.update_one(
-            {"id": product_id},
-            {"$set": {
-                "average_rating": round(result[0]["avg_rating"], 1),
-                "review_count": result[0]["count"]
-            }}
-        )
@@ -2,13 +2,16 @@
 AfroVending - Service Routes
 """
 from fastapi import APIRouter, HTTPException, Depends, Query
-from datetime import datetime, timezone, timedelta
 from typing import Optional
 import uuid
 
 from database import get_db
+from datetimes import timestamp
 from auth import get_current_user
 from models import ServiceCreate, ServiceResponse
+from serialization import fast_response, trusted_dump
+from vendor_attributes import vendor_attributes
+from projections import projection_for
 
 router = APIRouter(prefix="/services", tags=["Services"])
 
@@ -22,11 +25,13 @@ async def get_services(
     search: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
+    verified: Optional[bool] = None,
     skip: int = 0,
-    limit: int = 20
+    limit: int = 20,
+    projection: dict = Depends(projection_for("services"))
 ):
     """Get services with optional filters"""
-    db = get_db()
+    db = get_db("catalogue")
     query = {"is_active": True}
     
     if category_id:
@@ -49,12 +54,14 @@ async def get_services(
         else:
             query["price"] = {"$lte": max_price}
     
+    # Vendor attributes are denormalized onto services (see vendor_attributes.py)
     if country:
-        vendor_ids = await db.vendors.distinct("id", {"country": country})
-        query["vendor_id"] = {"$in": vendor_ids}
+        query["vendor_country"] = country
+    if verified is not None:
+        query["vendor_is_verified"] = verified
     
-    services = await db.services.find(query, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
-    return services
+    services = await db.services.find(query, projection).skip(skip).limit(limit).to_list(limit)
+    return fast_response(services)
 
 
 @router.get("/{service_id}")
@@ -83,16 +90,17 @@ async def create_service(service_data: ServiceCreate, user: dict = Depends(get_c
         "id": str(uuid.uuid4()),
         "vendor_id": vendor["id"],
         **service_data.model_dump(),
+        **vendor_attributes(vendor),
         "is_active": True,
         "average_rating": 0,
         "review_count": 0,
         "booking_count": 0,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp()
     }
     
     await db.services.insert_one(service)
     
-    return ServiceResponse(**{k: v for k, v in service.items() if k != "_id"})
+    return fast_response(trusted_dump(ServiceResponse, service))
 
 
 @router.put("/{service_id}")
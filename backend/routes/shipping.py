@@ -4,13 +4,14 @@ Real-time shipping rates, address verification, and label generation
 """
 import os
 import easypost
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from decimal import Decimal
-from datetime import datetime, timezone
 from database import get_db
+from datetimes import timestamp
 from auth import get_current_user
+from conditional import StaticResource
 
 router = APIRouter(prefix="/shipping", tags=["Shipping"])
 
@@ -120,6 +121,31 @@ REGIONAL_RATES = {
 }
 
 
+def _countries_payload(countries: list) -> dict:
+    """Countries list grouped by region"""
+    regions = {}
+    for country in countries:
+        regions.setdefault(country["region"], []).append(country)
+    return {
+        "countries": countries,
+        "by_region": regions,
+        "total": len(countries)
+    }
+
+
+# Reference data responses, serialized and hashed once at import (keyed by lowercased region)
+SHIPPING_COUNTRIES_RESOURCES = {None: StaticResource(_countries_payload(WORLDWIDE_COUNTRIES))}
+for _region in REGIONAL_RATES:
+    SHIPPING_COUNTRIES_RESOURCES[_region.lower()] = StaticResource(
+        _countries_payload([c for c in WORLDWIDE_COUNTRIES if c["region"] == _region])
+    )
+
+SHIPPING_REGIONS_RESOURCE = StaticResource({
+    "regions": REGIONAL_RATES,
+    "note": "Rates are in USD. Actual rates may vary based on package dimensions."
+})
+
+
 # Pydantic Models
 class AddressModel(BaseModel):
     name: str
@@ -156,35 +182,18 @@ class ShipmentRequest(BaseModel):
 
 # Routes
 @router.get("/countries")
-async def get_shipping_countries(region: Optional[str] = None):
+async def get_shipping_countries(request: Request, region: Optional[str] = None):
     """Get all available shipping countries, optionally filtered by region"""
-    countries = WORLDWIDE_COUNTRIES
-    
-    if region:
-        countries = [c for c in countries if c["region"].lower() == region.lower()]
-    
-    # Group by region
-    regions = {}
-    for country in countries:
-        r = country["region"]
-        if r not in regions:
-            regions[r] = []
-        regions[r].append(country)
-    
-    return {
-        "countries": countries,
-        "by_region": regions,
-        "total": len(countries)
-    }
+    resource = SHIPPING_COUNTRIES_RESOURCES.get(region.lower() if region else None)
+    if resource is None:
+        return _countries_payload([])
+    return resource.respond(request)
 
 
 @router.get("/regions")
-async def get_shipping_regions():
+async def get_shipping_regions(request: Request):
     """Get shipping regions with rates"""
-    return {
-        "regions": REGIONAL_RATES,
-        "note": "Rates are in USD. Actual rates may vary based on package dimensions."
-    }
+    return SHIPPING_REGIONS_RESOURCE.respond(request)
 
 
 @router.post("/estimate")
@@ -450,7 +459,7 @@ async def purchase_shipment(
             "order_id": request.order_id,
             "user_id": user["id"],
             "status": "purchased",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": timestamp()
         }
         
         await db.shipments.insert_one(shipment_record)
@@ -3,14 +3,17 @@ AfroVending - Stripe Connect Routes
 Vendor onboarding, identity verification, and payout management
 """
 from fastapi import APIRouter, HTTPException, Depends, Request
-from datetime import datetime, timezone
 from typing import Optional
 import stripe
 import os
+import time
 import logging
 
 from database import get_db
+from datetimes import timestamp
 from auth import get_current_user
+from ledger_service import record_payout, get_vendor_balance
+from conditional import versioned
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/stripe-connect", tags=["Stripe Connect"])
@@ -18,6 +21,9 @@ router = APIRouter(prefix="/stripe-connect", tags=["Stripe Connect"])
 # Initialize Stripe
 stripe.api_key = os.environ.get("STRIPE_API_KEY")
 
+# Earnings summary re-reads the connected account balance at most this often
+STRIPE_BALANCE_TTL_SECONDS = int(os.environ.get("STRIPE_BALANCE_TTL_SECONDS", "300"))
+
 
 @router.post("/create-account")
 async def create_connected_account(request: Request, user: dict = Depends(get_current_user)):
@@ -53,13 +59,13 @@ async def create_connected_account(request: Request, user: dict = Depends(get_cu
         # Save Stripe account ID to vendor profile
         await db.vendors.update_one(
             {"id": vendor["id"]},
-            {
+            versioned({
                 "$set": {
                     "stripe_account_id": account.id,
                     "stripe_account_status": "pending",
-                    "stripe_created_at": datetime.now(timezone.utc).isoformat()
+                    "stripe_created_at": timestamp()
                 }
-            }
+            })
         )
         
         return {
@@ -130,14 +136,14 @@ async def get_account_status(user: dict = Depends(get_current_user)):
         status = "complete" if account.details_submitted else "incomplete"
         await db.vendors.update_one(
             {"id": vendor["id"]},
-            {
+            versioned({
                 "$set": {
                     "stripe_account_status": status,
                     "stripe_payouts_enabled": account.payouts_enabled,
                     "stripe_charges_enabled": account.charges_enabled,
                     "stripe_details_submitted": account.details_submitted
                 }
-            }
+            })
         )
         
         return {
@@ -190,13 +196,13 @@ async def create_identity_verification(request: Request, user: dict = Depends(ge
         # Save verification session ID
         await db.vendors.update_one(
             {"id": vendor["id"]},
-            {
+            versioned({
                 "$set": {
                     "identity_verification_id": verification_session.id,
                     "identity_verification_status": verification_session.status,
-                    "identity_verification_started": datetime.now(timezone.utc).isoformat()
+                    "identity_verification_started": timestamp()
                 }
-            }
+            })
         )
         
         return {
@@ -231,12 +237,12 @@ async def get_identity_status(user: dict = Depends(get_current_user)):
         # Update vendor record
         await db.vendors.update_one(
             {"id": vendor["id"]},
-            {
+            versioned({
                 "$set": {
                     "identity_verification_status": verification.status,
                     "identity_verified": verification.status == "verified"
                 }
-            }
+            })
         )
         
         return {
@@ -269,7 +275,7 @@ async def update_tax_information(request: Request, user: dict = Depends(get_curr
         "vat_number": data.get("vat_number"),
         "tax_country": data.get("tax_country"),
         "tax_info_submitted": True,
-        "tax_info_updated_at": datetime.now(timezone.utc).isoformat()
+        "tax_info_updated_at": timestamp()
     }
     
     # Filter out None values
@@ -277,7 +283,7 @@ async def update_tax_information(request: Request, user: dict = Depends(get_curr
     
     await db.vendors.update_one(
         {"id": vendor["id"]},
-        {"$set": tax_fields}
+        versioned({"$set": tax_fields})
     )
     
     # If vendor has Stripe account, update it there too
@@ -427,12 +433,12 @@ async def update_payout_settings(request: Request, user: dict = Depends(get_curr
         "payout_threshold": threshold,
         "payout_frequency": frequency,
         "payout_day": data.get("payout_day", "monday"),
-        "payout_settings_updated_at": datetime.now(timezone.utc).isoformat()
+        "payout_settings_updated_at": timestamp()
     }
     
     await db.vendors.update_one(
         {"id": vendor["id"]},
-        {"$set": update_fields}
+        versioned({"$set": update_fields})
     )
     
     # Send email if auto-payout was just enabled
@@ -498,9 +504,10 @@ async def request_manual_payout(request: Request, user: dict = Depends(get_curre
             "status": payout.status,
             "type": "manual",
             "arrival_date": payout.arrival_date,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": timestamp()
         }
         await db.payouts.insert_one(payout_record)
+        await record_payout(db, payout_record)
         
         # Send email notification
         try:
@@ -557,6 +564,50 @@ async def get_payout_history(
     }
 
 
+@router.get("/payout-history/export")
+async def export_payout_history(
+    format: str = "csv",
+    gzip: bool = False,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """Stream the vendor's full payout history as CSV or NDJSON"""
+    from exports import EXPORTS, build_export_query, export_response
+    db = get_db()
+    
+    vendor = await db.vendors.find_one({"user_id": user["id"]}, {"_id": 0, "id": 1})
+    if not vendor:
+        raise HTTPException(status_code=404, detail="Vendor profile not found")
+    
+    query = build_export_query(EXPORTS["payouts"], {}, date_from, date_to)
+    query["vendor_id"] = vendor["id"]
+    return export_response(db, "payouts", query, format, compress=gzip, filename="payout-history")
+
+
+async def get_cached_stripe_balance(db, vendor_id: str, stripe_account_id: str, balance: dict):
+    """Connected account balance, refreshed from Stripe at most every STRIPE_BALANCE_TTL_SECONDS"""
+    cached = balance.get("stripe_balance") or {}
+    if not stripe_account_id:
+        return 0, 0
+    if time.time() - cached.get("fetched_at_ts", 0) < STRIPE_BALANCE_TTL_SECONDS:
+        return cached.get("available", 0), cached.get("pending", 0)
+    
+    try:
+        stripe_balance = stripe.Balance.retrieve(stripe_account=stripe_account_id)
+    except stripe.error.StripeError:
+        return cached.get("available", 0), cached.get("pending", 0)
+    
+    available = sum(b.amount for b in stripe_balance.available) / 100
+    pending = sum(b.amount for b in stripe_balance.pending) / 100
+    await db.vendor_balances.update_one(
+        {"vendor_id": vendor_id},
+        {"$set": {"stripe_balance": {"available": available, "pending": pending, "fetched_at_ts": time.time()}}},
+        upsert=True
+    )
+    return available, pending
+
+
 @router.get("/earnings-summary")
 async def get_earnings_summary(user: dict = Depends(get_current_user)):
     """Get vendor's earnings summary"""
@@ -568,38 +619,13 @@ async def get_earnings_summary(user: dict = Depends(get_current_user)):
     
     stripe_account_id = vendor.get("stripe_account_id")
     
-    # Get balance from Stripe
-    available_balance = 0
-    pending_balance = 0
+    # Earnings come from the materialized ledger balance (one document read)
+    balance = await get_vendor_balance(db, vendor["id"])
+    available_balance, pending_balance = await get_cached_stripe_balance(db, vendor["id"], stripe_account_id, balance)
     
-    if stripe_account_id:
-        try:
-            balance = stripe.Balance.retrieve(stripe_account=stripe_account_id)
-            available_balance = sum(b.amount for b in balance.available) / 100
-            pending_balance = sum(b.amount for b in balance.pending) / 100
-        except stripe.error.StripeError:
-            pass
-    
-    # Get total paid out from database
-    total_paid_result = await db.payouts.aggregate([
-        {"$match": {"vendor_id": vendor["id"], "status": {"$in": ["paid", "in_transit"]}}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]).to_list(1)
-    total_paid = total_paid_result[0]["total"] if total_paid_result else 0
-    
-    # Get total sales from orders
-    total_sales_result = await db.orders.aggregate([
-        {"$match": {"vendor_id": vendor["id"], "status": {"$in": ["completed", "delivered"]}}},
-        {"$group": {"_id": None, "total": {"$sum": "$total"}}}
-    ]).to_list(1)
-    total_sales = total_sales_result[0]["total"] if total_sales_result else vendor.get("total_sales", 0)
-    
-    # Get pending orders revenue
-    pending_orders_result = await db.orders.aggregate([
-        {"$match": {"vendor_id": vendor["id"], "status": {"$in": ["pending", "confirmed", "processing", "shipped"]}}},
-        {"$group": {"_id": None, "total": {"$sum": "$total"}}}
-    ]).to_list(1)
-    pending_orders = pending_orders_result[0]["total"] if pending_orders_result else 0
+    total_sales = balance["settled_sales"]
+    pending_orders = balance["pending_revenue"]
+    total_paid = balance["payouts"]
     
     # Platform commission rate
     commission_rate = vendor.get("commission_rate", 15)
@@ -611,7 +637,9 @@ async def get_earnings_summary(user: dict = Depends(get_current_user)):
         "total_sales": total_sales,
         "pending_orders_revenue": pending_orders,
         "commission_rate": commission_rate,
-        "net_earnings": total_sales * (1 - commission_rate / 100),
+        "net_earnings": balance["net_earnings"],
+        "commission_paid": balance["commission"],
+        "refunds": balance["refunds"],
         "currency": "usd",
         "auto_payout_enabled": vendor.get("auto_payout_enabled", False),
         "payout_threshold": vendor.get("payout_threshold", 50.0),
@@ -666,9 +694,10 @@ async def process_scheduled_payouts():
                     "status": payout.status,
                     "type": "automatic",
                     "arrival_date": payout.arrival_date,
-                    "created_at": datetime.now(timezone.utc).isoformat()
+                    "created_at": timestamp()
                 }
                 await db.payouts.insert_one(payout_record)
+                await record_payout(db, payout_record)
                 
                 processed.append({
                     "vendor_id": vendor["id"],
@@ -2,13 +2,18 @@
 AfroVending - Vendor Routes
 """
 from fastapi import APIRouter, HTTPException, Depends, Query
-from datetime import datetime, timezone
 from typing import Optional
 import uuid
 
 from database import get_db
+from datetimes import timestamp
 from auth import get_current_user
 from models import VendorCreate, VendorResponse
+from serialization import fast_response, trusted_dump
+from routes.homepage import request_homepage_refresh
+from vendor_attributes import propagate_vendor_attributes, touches_vendor_attributes
+from projections import projection_for
+from conditional import conditional_document, version_fields, versioned
 
 router = APIRouter(prefix="/vendors", tags=["Vendors"])
 
@@ -19,10 +24,11 @@ async def get_vendors(
     verified: Optional[bool] = None,
     search: Optional[str] = None,
     skip: int = 0,
-    limit: int = 20
+    limit: int = 20,
+    projection: dict = Depends(projection_for("vendors"))
 ):
     """Get vendors with optional filters"""
-    db = get_db()
+    db = get_db("catalogue")
     query = {"is_approved": True}
     
     if country:
@@ -35,8 +41,8 @@ async def get_vendors(
             {"description": {"$regex": search, "$options": "i"}}
         ]
     
-    vendors = await db.vendors.find(query, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
-    return vendors
+    vendors = await db.vendors.find(query, projection).skip(skip).limit(limit).to_list(limit)
+    return fast_response(vendors)
 
 
 @router.get("/me")
@@ -71,19 +77,21 @@ async def update_my_vendor_profile(update_data: dict, user: dict = Depends(get_c
     
     # Filter only allowed fields
     update_fields = {k: v for k, v in update_data.items() if k in allowed_fields}
-    update_fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_fields["updated_at"] = timestamp()
     
     result = await db.vendors.update_one(
         {"id": user["vendor_id"]},
-        {"$set": update_fields}
+        versioned({"$set": update_fields})
     )
+    if touches_vendor_attributes(update_fields):
+        await propagate_vendor_attributes(db, user["vendor_id"])
     
     # Return updated vendor even if no changes (might be same data)
     vendor = await db.vendors.find_one({"id": user["vendor_id"]}, {"_id": 0})
     return vendor
 
 
-@router.get("/{vendor_id}")
+@router.get("/{vendor_id}", dependencies=[Depends(conditional_document("vendors", "vendor_id"))])
 async def get_vendor(vendor_id: str):
     """Get single vendor by ID"""
     db = get_db()
@@ -113,15 +121,17 @@ async def create_vendor(vendor_data: VendorCreate, user: dict = Depends(get_curr
         "max_products": 10,
         "product_count": 0,
         "total_sales": 0,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp(),
+        **version_fields()
     }
     
     await db.vendors.insert_one(vendor)
     
     # Update user with vendor_id
     await db.users.update_one({"id": user["id"]}, {"$set": {"vendor_id": vendor_id, "role": "vendor"}})
+    request_homepage_refresh()
     
-    return VendorResponse(**{k: v for k, v in vendor.items() if k != "_id"})
+    return fast_response(trusted_dump(VendorResponse, vendor))
 
 
 @router.post("/setup")
@@ -150,7 +160,8 @@ async def setup_vendor_profile(user: dict = Depends(get_current_user)):
         "max_products": 10,
         "product_count": 0,
         "total_sales": 0,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": timestamp(),
+        **version_fields()
     }
     
     await db.vendors.insert_one(vendor)
@@ -172,14 +183,17 @@ async def update_vendor(vendor_id: str, vendor_data: VendorCreate, user: dict =
     if vendor["user_id"] != user["id"] and user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    await db.vendors.update_one({"id": vendor_id}, {"$set": vendor_data.model_dump()})
+    data = vendor_data.model_dump()
+    await db.vendors.update_one({"id": vendor_id}, versioned({"$set": data}))
+    if touches_vendor_attributes(data):
+        await propagate_vendor_attributes(db, vendor_id)
     return {"message": "Vendor updated"}
 
 
 @router.get("/{vendor_id}/products")
 async def get_vendor_products(vendor_id: str, skip: int = 0, limit: int = 20):
     """Get all products for a vendor"""
-    db = get_db()
+    db = get_db("catalogue")
     products = await db.products.find(
         {"vendor_id": vendor_id, "is_active": True}, 
         {"_id": 0}
@@ -190,7 +204,7 @@ async def get_vendor_products(vendor_id: str, skip: int = 0, limit: int = 20):
 @router.get("/{vendor_id}/services")
 async def get_vendor_services(vendor_id: str, skip: int = 0, limit: int = 20):
     """Get all services for a vendor"""
-    db = get_db()
+    db = get_db("catalogue")
     services = await db.services.find(
         {"vendor_id": vendor_id, "is_active": True}, 
         {"_id": 0}
@@ -266,17 +280,17 @@ async def reactivate_product(
     # Reactivate the product
     await db.products.update_one(
         {"id": product_id},
-        {
+        versioned({
             "$set": {
                 "is_active": True,
                 "auto_deactivated": False,
-                "reactivated_at": datetime.now(timezone.utc).isoformat()
+                "reactivated_at": timestamp()
             },
             "$unset": {
                 "auto_deactivated_at": "",
                 "auto_deactivated_reason": ""
             }
-        }
+        })
     )
     
     return {"message": "Product reactivated successfully", "product_id": product_id}
@@ -5,10 +5,16 @@ Handles Stripe webhook events for payouts and payments
 from fastapi import APIRouter, Request, HTTPException, Header
 from datetime import datetime, timezone
 import stripe
+import json
 import os
 import logging
 
 from database import get_db
+from datetimes import timestamp
+from event_bus import event_bus, user_topic
+from ledger_service import record_payout, record_payout_reversal
+from webhook_queue import enqueue_event, register_handler
+from conditional import versioned
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
@@ -19,13 +25,13 @@ STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET", "")
 
 @router.post("/stripe")
 async def stripe_webhook(request: Request, stripe_signature: str = Header(None)):
-    """Handle Stripe webhook events"""
+    """Receive Stripe Connect webhooks: verify, queue and acknowledge immediately"""
     payload = await request.body()
     
     # Verify webhook signature if secret is configured
     if STRIPE_WEBHOOK_SECRET:
         try:
-            event = stripe.Webhook.construct_event(
+            stripe.Webhook.construct_event(
                 payload, stripe_signature, STRIPE_WEBHOOK_SECRET
             )
         except ValueError as e:
@@ -34,17 +40,26 @@ async def stripe_webhook(request: Request, stripe_signature: str = Header(None))
         except stripe.error.SignatureVerificationError as e:
             logger.error(f"Invalid signature: {e}")
             raise HTTPException(status_code=400, detail="Invalid signature")
-    else:
-        # For development, parse without verification
-        import json
+    
+    try:
         event = json.loads(payload)
+    except ValueError as e:
+        logger.error(f"Invalid payload: {e}")
+        raise HTTPException(status_code=400, detail="Invalid payload")
     
-    event_type = event.get("type") if isinstance(event, dict) else event.type
-    data = event.get("data", {}).get("object", {}) if isinstance(event, dict) else event.data.object
+    logger.info(f"Received Stripe webhook: {event.get('type')}")
     
-    logger.info(f"Received Stripe webhook: {event_type}")
+    queued = await enqueue_event(get_db(), "connect", event)
+    if not queued:
+        logger.info(f"Duplicate Stripe webhook {event.get('id')} ignored")
     
-    db = get_db()
+    return {"status": "success"}
+
+
+async def process_connect_event(db, event: dict):
+    """Apply a queued Stripe Connect event (run by the webhook worker)"""
+    event_type = event.get("type")
+    data = event.get("data", {}).get("object", {})
     
     # Handle payout events
     if event_type == "payout.paid":
@@ -55,8 +70,17 @@ async def stripe_webhook(request: Request, stripe_signature: str = Header(None))
         await handle_payout_canceled(db, data)
     elif event_type == "account.updated":
         await handle_account_updated(db, data)
-    
-    return {"status": "success"}
+
+
+async def publish_payout_update(vendor: dict, payout_id: str, status: str):
+    """Push a payout status change to the vendor's notification stream"""
+    if vendor.get("user_id"):
+        await event_bus.publish(user_topic(vendor["user_id"]), {
+            "type": "payout_update",
+            "payout_id": payout_id,
+            "status": status,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        })
 
 
 async def handle_payout_paid(db, payout_data):
@@ -64,19 +88,24 @@ async def handle_payout_paid(db, payout_data):
     payout_id = payout_data.get("id")
     
     # Update payout status in database
+    # Already-paid payouts are skipped so a retried event doesn't email twice
     result = await db.payouts.find_one_and_update(
-        {"id": payout_id},
+        {"id": payout_id, "status": {"$ne": "paid"}},
         {"$set": {
             "status": "paid",
-            "paid_at": datetime.now(timezone.utc).isoformat()
+            "paid_at": timestamp()
         }},
         return_document=True
     )
     
     if result:
+        # Payouts created outside the app are first seen here
+        await record_payout(db, result)
+        
         # Get vendor and send email
         vendor = await db.vendors.find_one({"id": result.get("vendor_id")}, {"_id": 0})
         if vendor:
+            await publish_payout_update(vendor, payout_id, "paid")
             try:
                 from payout_emails import send_payout_completed_email
                 await send_payout_completed_email(vendor, result.get("amount", 0), payout_id)
@@ -94,19 +123,22 @@ async def handle_payout_failed(db, payout_data):
     
     # Update payout status in database
     result = await db.payouts.find_one_and_update(
-        {"id": payout_id},
+        {"id": payout_id, "status": {"$ne": "failed"}},
         {"$set": {
             "status": "failed",
             "failure_message": failure_message,
-            "failed_at": datetime.now(timezone.utc).isoformat()
+            "failed_at": timestamp()
         }},
         return_document=True
     )
     
     if result:
+        await record_payout_reversal(db, result)
+        
         # Get vendor and send email
         vendor = await db.vendors.find_one({"id": result.get("vendor_id")}, {"_id": 0})
         if vendor:
+            await publish_payout_update(vendor, payout_id, "failed")
             try:
                 from payout_emails import send_payout_failed_email
                 await send_payout_failed_email(vendor, result.get("amount", 0), payout_id, failure_message)
@@ -125,9 +157,10 @@ async def handle_payout_canceled(db, payout_data):
         {"id": payout_id},
         {"$set": {
             "status": "canceled",
-            "canceled_at": datetime.now(timezone.utc).isoformat()
+            "canceled_at": timestamp()
         }}
     )
+    await record_payout_reversal(db, {"id": payout_id})
     
     logger.info(f"Payout {payout_id} marked as canceled")
 
@@ -145,12 +178,15 @@ async def handle_account_updated(db, account_data):
             "stripe_payouts_enabled": account_data.get("payouts_enabled", False),
             "stripe_charges_enabled": account_data.get("charges_enabled", False),
             "stripe_details_submitted": account_data.get("details_submitted", False),
-            "stripe_updated_at": datetime.now(timezone.utc).isoformat()
+            "stripe_updated_at": timestamp()
         }
         
         await db.vendors.update_one(
             {"stripe_account_id": account_id},
-            {"$set": update_data}
+            versioned({"$set": update_data})
         )
         
         logger.info(f"Updated Stripe status for vendor {vendor.get('id')}")
+
+
+register_handler("connect", process_connect_event)
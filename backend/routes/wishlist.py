@@ -2,10 +2,12 @@
 AfroVending - Wishlist Routes
 """
 from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
 import uuid
 
 from database import get_db
+from datetimes import timestamp
+from cart_service import cart_update
 from auth import get_current_user
 
 router = APIRouter(prefix="/wishlist", tags=["Wishlist"])
@@ -50,7 +52,7 @@ async def add_to_wishlist(product_id: str, user: dict = Depends(get_current_user
             {"user_id": user["id"]},
             {
                 "$addToSet": {"product_ids": product_id},
-                "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+                "$set": {"updated_at": timestamp()}
             }
         )
     else:
@@ -58,8 +60,8 @@ async def add_to_wishlist(product_id: str, user: dict = Depends(get_current_user
             "id": str(uuid.uuid4()),
             "user_id": user["id"],
             "product_ids": [product_id],
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "created_at": timestamp(),
+            "updated_at": timestamp()
         })
     
     return {"message": "Added to wishlist", "in_wishlist": True}
@@ -73,7 +75,7 @@ async def remove_from_wishlist(product_id: str, user: dict = Depends(get_current
         {"user_id": user["id"]},
         {
             "$pull": {"product_ids": product_id},
-            "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+            "$set": {"updated_at": timestamp()}
         }
     )
     
@@ -97,33 +99,35 @@ async def check_wishlist(product_id: str, user: dict = Depends(get_current_user)
 async def move_to_cart(product_id: str, user: dict = Depends(get_current_user)):
     """Move item from wishlist to cart"""
     db = get_db()
-    product = await db.products.find_one({"id": product_id}, {"_id": 0})
+    product = await db.products.find_one({"id": product_id}, {"_id": 0, "stock": 1})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     if product["stock"] < 1:
         raise HTTPException(status_code=400, detail="Product out of stock")
     
-    cart = await db.carts.find_one({"user_id": user["id"]})
-    
-    if cart:
-        existing = next((i for i in cart.get("items", []) if i["product_id"] == product_id), None)
-        if existing:
+    # Same atomic cart write as add_to_cart: bump the quantity in place...
+    result = await db.carts.update_one(
+        {"user_id": user["id"], "items.product_id": product_id},
+        cart_update(**{"$inc": {"items.$.quantity": 1}})
+    )
+    if not result.matched_count:
+        # ...otherwise append it, creating the cart if needed
+        try:
             await db.carts.update_one(
-                {"user_id": user["id"], "items.product_id": product_id},
-                {"$inc": {"items.$.quantity": 1}}
+                {"user_id": user["id"], "items.product_id": {"$ne": product_id}},
+                cart_update(**{
+                    "$push": {"items": {"product_id": product_id, "quantity": 1}},
+                    "$setOnInsert": {"created_at": timestamp()}
+                }),
+                upsert=True
             )
-        else:
+        except DuplicateKeyError:
+            # A concurrent request added the same item first
             await db.carts.update_one(
-                {"user_id": user["id"]},
-                {"$push": {"items": {"product_id": product_id, "quantity": 1}}}
+                {"user_id": user["id"], "items.product_id": product_id},
+                cart_update(**{"$inc": {"items.$.quantity": 1}})
             )
-    else:
-        await db.carts.insert_one({
-            "user_id": user["id"],
-            "items": [{"product_id": product_id, "quantity": 1}],
-            "created_at": datetime.now(timezone.utc).isoformat()
-        })
     
     await db.wishlists.update_one(
         {"user_id": user["id"]},
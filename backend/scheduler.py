@@ -1,21 +1,34 @@
 """
 AfroVending - Payout Scheduler Service
 Handles automatic weekly payouts for verified vendors
+
+Every API process runs this scheduler; jobs are wrapped with
+`scheduler_lease.exclusive` so only the current lease holder executes them
+(see scheduler_lease.py). A process that becomes leader immediately runs any
+cron job whose last fire time passed without a recorded run, so a fire that
+fell inside a failover window is not lost.
 """
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import stripe
 import os
 
 from database import get_db
+from datetimes import timestamp, as_datetime
+from ledger_service import record_payout
+from scheduler_lease import scheduler_lease, exclusive, check_fence, current_fence, LeaseLost
 
 logger = logging.getLogger(__name__)
 
 # Initialize Stripe
 stripe.api_key = os.environ.get("STRIPE_API_KEY")
 
+# Missed cron fires older than this are not caught up by a new leader
+SCHEDULER_CATCHUP_SECONDS = int(os.environ.get("SCHEDULER_CATCHUP_SECONDS", "3600"))
+
 # Global scheduler instance
 scheduler = None
 
@@ -47,6 +60,9 @@ async def process_scheduled_payouts():
         vendor_id = vendor["id"]
         
         try:
+            # Stop before touching Stripe if another process took over the schedule
+            await check_fence(db)
+            
             # Check balance
             balance = stripe.Balance.retrieve(stripe_account=stripe_account_id)
             available_amount = sum(b.amount for b in balance.available) / 100
@@ -54,7 +70,8 @@ async def process_scheduled_payouts():
             logger.info(f"Vendor {vendor_id}: Available balance ${available_amount}, threshold ${threshold}")
             
             if available_amount >= threshold:
-                # Create payout
+                # Create payout; the idempotency key makes a repeat for the same
+                # vendor, day and amount return the original payout
                 payout = stripe.Payout.create(
                     amount=int(available_amount * 100),
                     currency="usd",
@@ -62,8 +79,12 @@ async def process_scheduled_payouts():
                     metadata={
                         "vendor_id": vendor_id,
                         "type": "automatic"
-                    }
+                    },
+                    idempotency_key=f"auto-payout:{vendor_id}:{datetime.now(timezone.utc).date()}:{int(available_amount * 100)}"
                 )
+                if await db.payouts.find_one({"id": payout.id}, {"_id": 1}):
+                    logger.info(f"Payout {payout.id} for vendor {vendor_id} already recorded")
+                    continue
                 
                 # Record in database
                 payout_record = {
@@ -75,9 +96,10 @@ async def process_scheduled_payouts():
                     "status": payout.status,
                     "type": "automatic",
                     "arrival_date": payout.arrival_date,
-                    "created_at": datetime.now(timezone.utc).isoformat()
+                    "created_at": timestamp()
                 }
                 await db.payouts.insert_one(payout_record)
+                await record_payout(db, payout_record)
                 
                 # Send notification email
                 from payout_emails import send_payout_initiated_email
@@ -91,6 +113,8 @@ async def process_scheduled_payouts():
                 
                 logger.info(f"Payout created for vendor {vendor_id}: ${available_amount}")
                 
+        except LeaseLost:
+            raise
         except stripe.error.StripeError as e:
             error_msg = str(e)
             errors.append({
@@ -120,13 +144,51 @@ async def process_scheduled_payouts():
     await db.scheduler_logs.insert_one({
         "job": "process_scheduled_payouts",
         "result": result,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "fencing_token": current_fence(),
+        "created_at": timestamp()
     })
     
     logger.info(f"Payout processing complete: {len(processed)} processed, {len(errors)} errors")
     return result
 
 
+async def refresh_homepage_snapshot():
+    """Rebuild the precomputed homepage bundle"""
+    from routes.homepage import build_homepage_snapshot
+    try:
+        await build_homepage_snapshot()
+    except Exception as e:
+        logger.error(f"Homepage snapshot job failed: {e}")
+
+
+async def run_image_audit_job():
+    """Verify every product image URL and store the findings"""
+    from image_audit import run_image_audit
+    try:
+        await run_image_audit()
+    except Exception as e:
+        logger.error(f"Image audit job failed: {e}")
+
+
+async def run_retention_sweep():
+    """Archive abandoned carts and remove expired ephemeral documents"""
+    from retention import sweep_retention
+    try:
+        result = await sweep_retention()
+    except Exception as e:
+        logger.error(f"Retention sweep failed: {e}")
+        return None
+    
+    db = get_db()
+    await db.scheduler_logs.insert_one({
+        "job": "sweep_retention",
+        "result": result,
+        "created_at": timestamp()
+    })
+    logger.info(f"Retention sweep complete: {result['removed']}")
+    return result
+
+
 def init_scheduler():
     """Initialize the APScheduler for background jobs"""
     global scheduler
@@ -140,17 +202,66 @@ def init_scheduler():
     # Schedule weekly payout processing
     # Runs every day at 9 AM UTC to check if it's the vendor's payout day
     scheduler.add_job(
-        process_scheduled_payouts,
+        exclusive("process_scheduled_payouts", process_scheduled_payouts),
         CronTrigger(hour=9, minute=0),  # 9:00 AM UTC daily
         id="process_scheduled_payouts",
         name="Process scheduled vendor payouts",
         replace_existing=True
     )
     
-    logger.info("Scheduler initialized with payout job (daily at 9:00 AM UTC)")
+    # Rebuild the homepage snapshot every N seconds (and once at startup)
+    from routes.homepage import HOMEPAGE_SNAPSHOT_INTERVAL
+    scheduler.add_job(
+        exclusive("refresh_homepage_snapshot", refresh_homepage_snapshot),
+        IntervalTrigger(seconds=HOMEPAGE_SNAPSHOT_INTERVAL),
+        id="refresh_homepage_snapshot",
+        name="Rebuild homepage snapshot",
+        next_run_time=datetime.now(timezone.utc),
+        replace_existing=True
+    )
+    
+    # Retention sweep for policies that need application logic (see retention.py)
+    from retention import RETENTION_SWEEP_INTERVAL
+    scheduler.add_job(
+        exclusive("sweep_retention", run_retention_sweep),
+        IntervalTrigger(seconds=RETENTION_SWEEP_INTERVAL),
+        id="sweep_retention",
+        name="Archive abandoned carts and expire ephemeral documents",
+        replace_existing=True
+    )
+    
+    # Nightly product image audit (see image_audit.py)
+    scheduler.add_job(
+        exclusive("image_audit", run_image_audit_job),
+        CronTrigger(hour=3, minute=0),
+        id="image_audit",
+        name="Audit product image URLs",
+        replace_existing=True
+    )
+    
+    scheduler_lease.on_elected.append(catch_up_missed_runs)
+    
+    logger.info("Scheduler initialized with payout, homepage snapshot, retention sweep and image audit jobs")
     return scheduler
 
 
+def catch_up_missed_runs(lease: dict):
+    """Run cron jobs whose last fire time passed without a run (e.g. while the lease was changing hands)"""
+    if scheduler is None or not scheduler.running:
+        return
+    
+    now = datetime.now(timezone.utc)
+    runs = (lease or {}).get("jobs", {})
+    for job in scheduler.get_jobs():
+        started_at = as_datetime(runs.get(job.id, {}).get("started_at"))
+        if not isinstance(job.trigger, CronTrigger) or started_at is None:
+            continue
+        missed = job.trigger.get_next_fire_time(None, started_at + timedelta(seconds=1))
+        if missed and missed <= now and (now - missed).total_seconds() <= SCHEDULER_CATCHUP_SECONDS:
+            logger.info(f"Catching up {job.id}: fire at {missed.isoformat()} was missed")
+            job.modify(next_run_time=now)
+
+
 def start_scheduler():
     """Start the scheduler"""
     global scheduler
@@ -161,6 +272,8 @@ def start_scheduler():
     if not scheduler.running:
         scheduler.start()
         logger.info("Scheduler started")
+        if scheduler_lease.is_leader:
+            catch_up_missed_runs(scheduler_lease.lease)
     
     return scheduler
 
@@ -179,18 +292,21 @@ def get_scheduler_status():
     global scheduler
     
     if scheduler is None:
-        return {"running": False, "jobs": []}
+        return {"running": False, "jobs": [], "leadership": scheduler_lease.status()}
     
+    runs = scheduler_lease.job_runs()
     jobs = []
     for job in scheduler.get_jobs():
         jobs.append({
             "id": job.id,
             "name": job.name,
             "next_run": job.next_run_time.isoformat() if job.next_run_time else None,
-            "trigger": str(job.trigger)
+            "trigger": str(job.trigger),
+            "last_run": runs.get(job.id)
         })
     
     return {
         "running": scheduler.running,
-        "jobs": jobs
+        "jobs": jobs,
+        "leadership": scheduler_lease.status()
     }
@@ -0,0 +1,244 @@
+"""
+AfroVending - Scheduler Leadership
+Mongo lease so each scheduled job runs on one API process cluster-wide
+
+Every process starts APScheduler, but jobs wrapped with `exclusive()` only
+run on the current lease holder:
+
+    scheduler.add_job(exclusive("process_scheduled_payouts", process_scheduled_payouts), ...)
+
+The lease is one document in `scheduler_leases` (unique on `id`):
+    {"id": "scheduler", "holder", "token", "expires_at", "acquired_at", "renewed_at",
+     "jobs": {job_id: {"token", "instance", "started_at", "finished_at", "status"}}}
+
+Every SCHEDULER_LEASE_SECONDS / 3 the holder renews the lease and every
+other process tries to take it over once it has expired. A process treats
+itself as leader only until its own copy of the expiry, measured from before
+the renewal was sent, so it stops starting jobs before anyone else can take
+over (as long as clocks agree to within the lease length). A clean shutdown
+releases the lease so another process takes over at its next heartbeat.
+
+Each takeover increments the fencing `token`. A job's start is recorded with
+a write filtered on the token, and long jobs call `check_fence()` before each
+external side effect. So a leader that stalled, lost the lease and woke up
+again aborts with LeaseLost instead of repeating the new leader's work.
+"""
+from datetime import datetime, timezone, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import socket
+
+from database import get_db
+from datetimes import to_iso
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LEASE_SECONDS = int(os.environ.get("SCHEDULER_LEASE_SECONDS", "30"))
+SCHEDULER_HEARTBEAT_SECONDS = SCHEDULER_LEASE_SECONDS / 3
+
+LEASE_ID = "scheduler"
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Token of the lease the current job started under (None outside exclusive jobs)
+_fence = contextvars.ContextVar("scheduler_fence", default=None)
+
+
+class LeaseLost(Exception):
+    """The scheduler lease moved to another process while a job was running"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class SchedulerLease:
+    """Background task holding (or waiting for) the scheduler lease"""
+
+    def __init__(self):
+        self.token = None
+        self.valid_until = None
+        self.lease = None           # last lease document seen, for status
+        self.on_elected = []        # callbacks(lease) run when this process takes the lease
+        self._task = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.token is not None and self.valid_until is not None and _now() < self.valid_until
+
+    async def start(self):
+        if self._task is None:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.error(f"Scheduler lease heartbeat failed: {e}")
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Scheduler lease started on {INSTANCE_ID} (leader: {self.is_leader})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.release()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(SCHEDULER_HEARTBEAT_SECONDS)
+            try:
+                await self.heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduler lease heartbeat failed: {e}")
+
+    async def heartbeat(self):
+        """Renew the lease if we hold it, otherwise take it over if it has expired"""
+        db = get_db()
+        sent = _now()
+        expires = sent + timedelta(seconds=SCHEDULER_LEASE_SECONDS)
+
+        if self.token is not None:
+            lease = await db.scheduler_leases.find_one_and_update(
+                {"id": LEASE_ID, "holder": INSTANCE_ID, "token": self.token},
+                {"$set": {"expires_at": expires, "renewed_at": sent}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if lease:
+                self.lease, self.valid_until = lease, expires
+                return
+            logger.warning(f"Scheduler lease lost by {INSTANCE_ID} (token {self.token})")
+            self.token = self.valid_until = None
+
+        try:
+            # Upserts the first lease; while someone else's is current the
+            # filter misses and the insert hits the unique index instead
+            lease = await db.scheduler_leases.find_one_and_update(
+                {"id": LEASE_ID, "expires_at": {"$lt": sent}},
+                {
+                    "$set": {"holder": INSTANCE_ID, "expires_at": expires, "acquired_at": sent, "renewed_at": sent},
+                    "$inc": {"token": 1}
+                },
+                upsert=True,
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            lease = None
+
+        if lease is None:
+            self.lease = await db.scheduler_leases.find_one({"id": LEASE_ID}, {"_id": 0})
+            return
+
+        self.lease, self.token, self.valid_until = lease, lease["token"], expires
+        logger.info(f"Scheduler lease acquired by {INSTANCE_ID} (token {self.token})")
+        for callback in self.on_elected:
+            try:
+                callback(lease)
+            except Exception as e:
+                logger.error(f"Scheduler election callback failed: {e}")
+
+    async def release(self):
+        """Give the lease up so another process can take over at its next heartbeat"""
+        if self.token is None:
+            return
+        try:
+            await get_db().scheduler_leases.update_one(
+                {"id": LEASE_ID, "holder": INSTANCE_ID, "token": self.token},
+                {"$set": {"expires_at": _now() - timedelta(seconds=1)}}
+            )
+            logger.info(f"Scheduler lease released by {INSTANCE_ID}")
+        except Exception as e:
+            logger.error(f"Failed to release scheduler lease: {e}")
+        self.token = self.valid_until = None
+
+    def status(self) -> dict:
+        lease = self.lease or {}
+        return {
+            "instance": INSTANCE_ID,
+            "is_leader": self.is_leader,
+            "token": self.token,
+            "holder": lease.get("holder"),
+            "holder_token": lease.get("token"),
+            "expires_at": to_iso(lease.get("expires_at")),
+            "renewed_at": to_iso(lease.get("renewed_at")),
+            "lease_seconds": SCHEDULER_LEASE_SECONDS,
+        }
+
+    def job_runs(self) -> dict:
+        """Last recorded start per job id, from the lease document"""
+        return {
+            job_id: {key: to_iso(value) for key, value in run.items()}
+            for job_id, run in (self.lease or {}).get("jobs", {}).items()
+        }
+
+
+scheduler_lease = SchedulerLease()
+
+
+def exclusive(job_id: str, func):
+    """Wrap a job so it only runs on the lease holder, fenced by the lease token"""
+    @functools.wraps(func)
+    async def run(*args, **kwargs):
+        if not scheduler_lease.is_leader:
+            logger.debug(f"Skipping {job_id}: not the scheduler leader")
+            return None
+        token = scheduler_lease.token
+        db = get_db()
+        started = await db.scheduler_leases.update_one(
+            {"id": LEASE_ID, "holder": INSTANCE_ID, "token": token},
+            {"$set": {f"jobs.{job_id}": {
+                "token": token, "instance": INSTANCE_ID, "started_at": _now(), "status": "running"
+            }}}
+        )
+        if not started.matched_count:
+            logger.warning(f"Skipping {job_id}: scheduler lease lost")
+            return None
+
+        fence = _fence.set(token)
+        status = "failed"
+        try:
+            result = await func(*args, **kwargs)
+            status = "completed"
+            return result
+        except LeaseLost:
+            status = "fenced"
+            logger.warning(f"{job_id} stopped: scheduler lease lost (token {token})")
+            return None
+        finally:
+            _fence.reset(fence)
+            # Filtered on the run's own entry so a fenced run can still close it
+            await db.scheduler_leases.update_one(
+                {"id": LEASE_ID, f"jobs.{job_id}.token": token, f"jobs.{job_id}.instance": INSTANCE_ID},
+                {"$set": {f"jobs.{job_id}.finished_at": _now(), f"jobs.{job_id}.status": status}}
+            )
+    return run
+
+
+def current_fence():
+    """Lease token of the running exclusive job, None when called outside one"""
+    return _fence.get()
+
+
+async def check_fence(db=None):
+    """Raise LeaseLost if the running job's lease is no longer held (no-op outside exclusive jobs)"""
+    token = _fence.get()
+    if token is None:
+        return
+    if scheduler_lease.token != token or not scheduler_lease.is_leader:
+        raise LeaseLost(token)
+    db = db if db is not None else get_db()
+    current = await db.scheduler_leases.find_one(
+        {"id": LEASE_ID, "holder": INSTANCE_ID, "token": token, "expires_at": {"$gt": _now()}},
+        {"_id": 1}
+    )
+    if not current:
+        raise LeaseLost(token)
@@ -10,6 +10,8 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import bcrypt
 from dotenv import load_dotenv
 
+from vendor_attributes import propagate_vendor_attributes
+
 load_dotenv()
 
 # MongoDB connection
@@ -491,6 +493,8 @@ async def seed_database():
                 print(f"  ✅ Service: {service['name']}")
             else:
                 print(f"  ⏭️  Service exists: {service['name']}")
+        
+        await propagate_vendor_attributes(db, vendor_id)
     
     print("\n" + "=" * 50)
     print("✨ Database seeding complete!")
@@ -0,0 +1,64 @@
+"""
+AfroVending - Response Serialization
+orjson-backed JSON responses and a trusted path for documents read from MongoDB
+
+`FastJSONResponse` is the app's default response class. It still receives
+content that FastAPI has run through `jsonable_encoder`, but renders it with
+orjson. Hot list endpoints go further with `fast_response()`, which hands the
+Mongo documents straight to orjson and skips the encoder walk entirely.
+
+Routes declared with a `response_model` re-validate whatever they return.
+For documents the API itself wrote, `trusted_dump()` shapes the document to
+the model's fields without validation; return it via `fast_response()` and
+FastAPI uses the Response as-is (the model still documents the endpoint).
+
+Set FAST_JSON_RESPONSES=false to fall back to the stock encoder everywhere.
+"""
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+import orjson
+import os
+
+FAST_JSON_ENABLED = os.environ.get("FAST_JSON_RESPONSES", "true").lower() == "true"
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    """Types orjson doesn't know natively (ObjectId, Decimal, models, sets...)"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return jsonable_encoder(obj)
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson"""
+
+    def render(self, content) -> bytes:
+        if not FAST_JSON_ENABLED:
+            return super().render(content)
+        return dumps(content)
+
+
+def fast_response(content, status_code: int = 200, headers: dict = None) -> JSONResponse:
+    """Serialize trusted content (e.g. Mongo documents) without jsonable_encoder"""
+    if not FAST_JSON_ENABLED:
+        return JSONResponse(jsonable_encoder(content), status_code=status_code, headers=headers)
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+def trusted_dump(model_cls, doc: dict) -> dict:
+    """The model's fields taken from a trusted document, defaults filled in, no validation"""
+    return {
+        name: doc[name] if name in doc else (
+            None if field.is_required() else field.get_default(call_default_factory=True)
+        )
+        for name, field in model_cls.model_fields.items()
+    }
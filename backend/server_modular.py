@@ -23,7 +23,7 @@ UPLOAD_DIR = "/app/backend/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # Import database
-from database import get_db, client
+from database import get_db, client, ensure_indexes, close_clients
 
 # Import routers
 from routes import auth, products, vendors, services, categories, bookings, orders, reviews, wishlist, price_alerts, notifications, homepage, admin, currency, upload, cloudinary_routes, stripe_connect, webhooks, shipping, checkout
@@ -31,6 +31,13 @@ from routes.products import vendor_router as vendor_products_router
 
 # Import scheduler
 from scheduler import start_scheduler, stop_scheduler
+from scheduler_lease import scheduler_lease
+from event_bus import event_bus
+from webhook_queue import webhook_worker
+from serialization import FastJSONResponse
+from compression import CompressionMiddleware
+from admission import AdmissionMiddleware
+from retention import apply_retention_policies
 
 db = get_db()
 
@@ -47,6 +54,21 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"MongoDB connection failed: {e}")
     
+    await ensure_indexes()
+    await apply_retention_policies()
+    
+    # Start the realtime event bus (change stream source in multi-worker mode)
+    try:
+        await event_bus.start()
+    except Exception as e:
+        logger.error(f"Failed to start event bus: {e}")
+    
+    # Drain queued Stripe webhooks in the background
+    await webhook_worker.start()
+    
+    # Elect the scheduler leader first so the startup jobs run on exactly one process
+    await scheduler_lease.start()
+    
     # Start the scheduler for background jobs
     try:
         start_scheduler()
@@ -62,6 +84,11 @@ async def lifespan(app: FastAPI):
         logger.info("Payout scheduler stopped")
     except Exception as e:
         logger.error(f"Error stopping scheduler: {e}")
+    await scheduler_lease.stop()
+    
+    await event_bus.stop()
+    await webhook_worker.stop()
+    close_clients()
     
     logger.info("Shutting down AfroVending API...")
 
@@ -71,7 +98,8 @@ app = FastAPI(
     title="AfroVending API",
     description="African Marketplace Backend API",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # CORS Configuration
@@ -82,6 +110,9 @@ origins = [
     os.environ.get("FRONTEND_URL", ""),
 ]
 
+# Rate limits and load shedding; added before CORS so 429/503 still carry CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -90,6 +121,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli/zstd for JSON and text responses (including /uploads svg/css)
+app.add_middleware(CompressionMiddleware)
+
 # Mount static files for uploads
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
@@ -0,0 +1,612 @@
+"""
+AfroVending - Synthetic Data
+Production-sized users, vendors, catalogue, orders, reviews and notifications
+
+Usage:
+    python synthetic_data.py                            # full volumes below, one worker per CPU (max 8)
+    python synthetic_data.py --scale 0.01 --workers 2   # a hundredth of every volume
+    python synthetic_data.py --products 2000000 --seed 7 --db afrovending_perf
+    python synthetic_data.py --status                   # progress of the current run
+    python synthetic_data.py --reset                    # drop the database and start over
+
+Data goes to `<DB_NAME>_synthetic` unless --db is given. Default volumes
+(scaled by --scale):
+
+    users 1M, vendors 5k, products 500k, carts 100k,
+    orders 2M, reviews 1M, notifications 3M
+
+Distributions:
+    popularity     products are drawn from a Zipf distribution for order
+                   lines, reviews and carts, so a small head of the catalogue
+                   takes most of the traffic; vendor catalogue sizes and
+                   customer order/review frequency are Zipf as well
+    orders         1-6 lines drawn by popularity, so multi-line orders usually
+                   span several vendors (one vendor_orders document each);
+                   status and payment status follow the order's age
+    reviews        drawn by popularity, ratings skewed towards 4-5 stars
+    dates          spread over --days up to --until, volume growing towards
+                   the end of the window
+
+Every document is a function of (seed, collection, index): ids are uuid5
+values and `_id` is an ObjectId whose timestamp is the document's created_at.
+Each stage is split into --batch-size chunks written with unordered
+insert_many by --workers processes. Finished chunks are recorded in
+`synthetic_progress`, so rerunning an interrupted command skips them and
+rewrites the rest; duplicate `_id`s from a half-written chunk are ignored.
+A final pass fills in the derived fields (rating summaries, product sales
+counts, vendor product counts) and the indexes from database.INDEXES are
+created last.
+"""
+from bson import ObjectId
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone, timedelta
+from dotenv import load_dotenv
+from functools import lru_cache
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+import argparse
+import asyncio
+import hashlib
+import math
+import multiprocessing
+import os
+import random
+import time
+import uuid
+
+load_dotenv()
+
+from auth import hash_password
+from conditional import version_fields
+from database import INDEXES
+from datetimes import timestamp
+from seed_production import PRODUCT_CATEGORIES, COUNTRIES
+from vendor_attributes import vendor_attributes
+from vendor_order_service import build_vendor_orders
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+SYNTHETIC_DB_NAME = os.environ.get('DB_NAME', 'afrovending_db') + "_synthetic"
+
+DEFAULT_VOLUMES = {
+    "users": 1_000_000,
+    "vendors": 5_000,
+    "products": 500_000,
+    "carts": 100_000,
+    "orders": 2_000_000,
+    "reviews": 1_000_000,
+    "notifications": 3_000_000,
+}
+
+# Generation order: every stage only references stages before it
+STAGES = ["categories", "vendors", "users", "products", "carts", "orders", "reviews", "notifications"]
+
+DEFAULT_PARAMS = {"seed": 42, "days": 730, "zipf": 1.1, "batch_size": 5000, "until": None}
+
+# Fixed when a run starts rather than chosen by the caller, so not compared on resume
+RUN_FIELDS = {"until", "password_hash"}
+
+PASSWORD = "Synthetic2024!"
+EMAIL_DOMAIN = "synthetic.afrovending.test"
+ADMIN_INDEX = 0     # users[0] is an admin
+
+ID_NAMESPACE = uuid.UUID("6f1d2a4e-3b7c-4e8a-9c51-0d2f7a6b8e13")
+
+FIRST_NAMES = ["Amara", "Kwame", "Zainab", "Chidi", "Nia", "Kofi", "Aisha", "Tunde", "Imani", "Sipho",
+               "Fatou", "Jabari", "Lerato", "Emeka", "Yaa", "Thabo", "Adaeze", "Musa", "Ama", "Baraka"]
+LAST_NAMES = ["Okafor", "Mensah", "Diallo", "Mwangi", "Ndlovu", "Adeyemi", "Boateng", "Kamau", "Toure",
+              "Abebe", "Nkosi", "Osei", "Balogun", "Otieno", "Sow", "Dlamini", "Haile", "Asante"]
+ADJECTIVES = ["Handwoven", "Beaded", "Carved", "Organic", "Hand-dyed", "Vintage", "Raw", "Embroidered",
+              "Traditional", "Artisan", "Wild", "Hammered", "Printed", "Cold-pressed", "Painted"]
+NOUNS = ["Kente Scarf", "Ankara Dress", "Shea Butter", "Mudcloth Pillow", "Djembe", "Coffee Beans",
+         "Leather Bag", "Bolga Basket", "Black Soap", "Maasai Necklace", "Soapstone Bowl", "Hibiscus Tea",
+         "Adire Fabric", "Batik Print", "Cowrie Earrings", "Argan Oil", "Tingatinga Canvas", "Mbira"]
+CITIES = [("Houston", "TX", "77002"), ("Atlanta", "GA", "30303"), ("New York", "NY", "10001"),
+          ("Chicago", "IL", "60601"), ("Los Angeles", "CA", "90012"), ("Washington", "DC", "20001"),
+          ("Dallas", "TX", "75201"), ("Minneapolis", "MN", "55401"), ("Seattle", "WA", "98101"),
+          ("Toronto", "ON", "M5H 2N2"), ("London", "LDN", "EC1A 1BB")]
+RATING_WEIGHTS = [4, 3, 8, 22, 63]          # 1..5 stars
+LINE_COUNT_WEIGHTS = [46, 24, 14, 8, 5, 3]  # 1..6 lines per order
+REVIEW_TITLES = {1: "Disappointed", 2: "Not as described", 3: "It's okay", 4: "Really nice", 5: "Absolutely love it"}
+
+
+def entity_id(seed: int, collection: str, index) -> str:
+    """Deterministic `id` of the index-th generated document of a collection"""
+    return str(uuid.uuid5(ID_NAMESPACE, f"{seed}:{collection}:{index}"))
+
+
+def object_id(seed: int, collection: str, index, created_at: datetime) -> ObjectId:
+    """Deterministic `_id` carrying created_at as its timestamp, like a real insert"""
+    digest = hashlib.blake2b(f"{seed}:{collection}:{index}".encode(), digest_size=8).digest()
+    return ObjectId(int(created_at.timestamp()).to_bytes(4, "big") + digest)
+
+
+def zipf_rank(u: float, n: int, s: float) -> int:
+    """Rank in [0, n) for a uniform u under a bounded power law with exponent s"""
+    if abs(s - 1) < 1e-9:
+        x = (n + 1) ** u
+    else:
+        x = (1 + u * ((n + 1) ** (1 - s) - 1)) ** (1 / (1 - s))
+    return min(n - 1, int(x) - 1)
+
+
+def _stride(n: int, salt: int) -> int:
+    """Multiplier coprime with n, so rank -> (rank * stride) % n is a permutation"""
+    stride = max(1, int(n * 0.6180339887) + salt) | 1
+    while math.gcd(stride, n) != 1:
+        stride += 2
+    return stride
+
+
+def resolve_params(volumes: dict, options: dict) -> dict:
+    params = {**DEFAULT_VOLUMES, **DEFAULT_PARAMS}
+    params.update({k: v for k, v in {**volumes, **options}.items() if v is not None})
+    params["categories"] = len(PRODUCT_CATEGORIES)
+    params["carts"] = min(params["carts"], params["users"])    # one cart per user
+    if not params["until"]:
+        params["until"] = datetime.now(timezone.utc).date().isoformat()
+    return params
+
+
+class Generator:
+    """Documents for one parameter set; the same index always yields the same document"""
+
+    def __init__(self, params: dict):
+        self.params = params
+        self.seed = params["seed"]
+        self.zipf = params["zipf"]
+        self.end = datetime.fromisoformat(params["until"]).replace(tzinfo=timezone.utc) + timedelta(days=1)
+        self.span = params["days"] * 86400
+        self.strides = {kind: _stride(max(params[kind], 1), i) for i, kind in enumerate(STAGES)}
+        self.password_hash = params["password_hash"]
+        self.product = lru_cache(maxsize=250_000)(self._product)
+        self.vendor = lru_cache(maxsize=None)(self._vendor)
+
+    def rng(self, collection: str, index) -> random.Random:
+        return random.Random(f"{self.seed}:{collection}:{index}")
+
+    def id(self, collection: str, index) -> str:
+        return entity_id(self.seed, collection, index)
+
+    def popular(self, rng: random.Random, kind: str) -> int:
+        """Index into `kind` drawn by Zipf popularity (popular indexes scattered, not 0..k)"""
+        n = self.params[kind]
+        return zipf_rank(rng.random(), n, self.zipf) * self.strides[kind] % n
+
+    def created_at(self, rng: random.Random, after: datetime = None) -> datetime:
+        """Somewhere in the window, denser towards the end; never before `after`"""
+        start = self.end - timedelta(seconds=self.span)
+        if after and after > start:
+            start = after
+        window = (self.end - start).total_seconds()
+        return start + timedelta(seconds=window * math.sqrt(rng.random()))
+
+    def _stamp(self, collection: str, index, created: datetime) -> dict:
+        return {
+            "_id": object_id(self.seed, collection, index, created),
+            "created_at": timestamp(created),
+            **version_fields(),
+            "updated_at": timestamp(created),
+        }
+
+    # ---------- stages ----------
+
+    def categories(self, i: int):
+        created = self.end - timedelta(seconds=self.span + 86400)
+        yield "categories", {
+            "id": self.id("categories", i), "type": "product", **PRODUCT_CATEGORIES[i],
+            **self._stamp("categories", i, created)
+        }
+
+    def _vendor(self, i: int) -> dict:
+        rng = self.rng("vendors", i)
+        country = rng.choice(COUNTRIES)
+        created = self.created_at(rng)
+        return {
+            "id": self.id("vendors", i),
+            "user_id": self.id("vendor_users", i),
+            "store_name": f"{rng.choice(LAST_NAMES)} {rng.choice(['Crafts', 'Collective', 'Market', 'Studio', 'Trading', 'Heritage'])} {i}",
+            "description": f"Authentic goods from {country['name']}.",
+            "country": country["name"],
+            "country_code": country["code"],
+            "is_approved": rng.random() < 0.95,
+            "is_verified": rng.random() < 0.35,
+            "subscription_plan": rng.choices(["free", "starter", "pro"], [60, 28, 12])[0],
+            "commission_rate": 10,
+            "product_count": 0,
+            **self._stamp("vendors", i, created),
+        }
+
+    def vendors(self, i: int):
+        vendor = self.vendor(i)
+        yield "vendors", vendor
+        rng = self.rng("vendor_users", i)
+        yield "users", {
+            "id": vendor["user_id"], "email": f"vendor{i}@{EMAIL_DOMAIN}", "password_hash": self.password_hash,
+            "first_name": rng.choice(FIRST_NAMES), "last_name": rng.choice(LAST_NAMES), "role": "vendor",
+            "vendor_id": vendor["id"], "is_active": True,
+            **self._stamp("vendor_users", i, vendor["_id"].generation_time)
+        }
+
+    def users(self, i: int):
+        rng = self.rng("users", i)
+        created = self.created_at(rng)
+        user = {
+            "id": self.id("users", i), "email": f"user{i}@{EMAIL_DOMAIN}", "password_hash": self.password_hash,
+            "first_name": rng.choice(FIRST_NAMES), "last_name": rng.choice(LAST_NAMES),
+            "role": "admin" if i == ADMIN_INDEX else "customer", "is_active": rng.random() < 0.98,
+            **self._stamp("users", i, created)
+        }
+        if rng.random() < 0.7:
+            user["last_login"] = timestamp(self.created_at(rng, after=created))
+        yield "users", user
+
+    def _product(self, i: int) -> dict:
+        rng = self.rng("products", i)
+        vendor = self.vendor(self.popular(rng, "vendors"))
+        category = rng.randrange(self.params["categories"])
+        country = rng.choice(COUNTRIES)
+        price = round(max(1.0, rng.lognormvariate(3.4, 0.9)), 2)
+        created = self.created_at(rng, after=vendor["_id"].generation_time)
+        product_id = self.id("products", i)
+        return {
+            "id": product_id,
+            "vendor_id": vendor["id"],
+            "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}",
+            "description": " ".join(rng.choices(ADJECTIVES + NOUNS, k=rng.randint(8, 30))),
+            "price": price,
+            "compare_price": round(price * rng.uniform(1.1, 1.6), 2) if rng.random() < 0.3 else None,
+            "category_id": self.id("categories", category),
+            "images": [f"https://res.cloudinary.com/afrovending/image/upload/synthetic/{product_id}-{n}.jpg"
+                       for n in range(rng.randint(1, 5))],
+            "stock": rng.choice([0, rng.randrange(1, 10), rng.randrange(10, 500)]),
+            "tags": rng.sample([n.split()[-1].lower() for n in NOUNS], rng.randint(0, 4)),
+            "fulfillment_option": rng.choices(["FBV", "FBA"], [85, 15])[0],
+            "is_active": rng.random() < 0.97,
+            "average_rating": 0,
+            "review_count": 0,
+            "sales_count": 0,
+            "view_count": 0,
+            "country_code": country["code"],
+            "country_name": country["name"],
+            **vendor_attributes(vendor),
+            **self._stamp("products", i, created),
+        }
+
+    def products(self, i: int):
+        yield "products", self.product(i)
+
+    def carts(self, i: int):
+        rng = self.rng("carts", i)
+        # A permutation of users, so every cart belongs to a different user
+        user_index = i * self.strides["users"] % self.params["users"]
+        created = self.created_at(rng)
+        yield "carts", {
+            "user_id": self.id("users", user_index),
+            "items": [
+                {"product_id": self.id("products", p), "quantity": rng.choices([1, 2, 3], [80, 15, 5])[0]}
+                for p in {self.popular(rng, "products") for _ in range(rng.randint(1, 5))}
+            ],
+            **self._stamp("carts", i, created),
+        }
+
+    def orders(self, i: int):
+        rng = self.rng("orders", i)
+        user_index = self.popular(rng, "users")
+        created = self.created_at(rng)
+        lines = rng.choices(range(1, 7), LINE_COUNT_WEIGHTS)[0]
+        items = []
+        for product_index in {self.popular(rng, "products") for _ in range(lines)}:
+            product = self.product(product_index)
+            items.append({
+                "product_id": product["id"],
+                "name": product["name"],
+                "price": product["price"],
+                "quantity": rng.choices([1, 2, 3], [82, 13, 5])[0],
+                "image": product["images"][0],
+                "vendor_id": product["vendor_id"],
+            })
+
+        age_days = (self.end - created).total_seconds() / 86400
+        if age_days < 1:
+            status = rng.choices(["pending", "confirmed"], [40, 60])[0]
+        elif age_days < 7:
+            status = rng.choices(["confirmed", "processing", "shipped", "cancelled"], [20, 30, 45, 5])[0]
+        else:
+            status = rng.choices(["delivered", "cancelled", "pending"], [91, 5, 4])[0]
+        payment_status = {"pending": "pending", "cancelled": rng.choice(["failed", "paid"])}.get(status, "paid")
+
+        subtotal = round(sum(item["price"] * item["quantity"] for item in items), 2)
+        shipping_cost = rng.choice([0, 7.99, 12.4, 15.9, 24.5])
+        city, state, zip_code = rng.choice(CITIES)
+        order = {
+            "id": self.id("orders", i),
+            "user_id": self.id("users", user_index),
+            "items": items,
+            "subtotal": subtotal,
+            "shipping_cost": shipping_cost,
+            "total": round(subtotal + shipping_cost, 2),
+            "status": status,
+            "payment_status": payment_status,
+            "shipping_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "shipping_address": f"{rng.randint(1, 9999)} Market Street",
+            "shipping_city": city,
+            "shipping_state": state,
+            "shipping_zip": zip_code,
+            "shipping_country": "CA" if state == "ON" else "GB" if state == "LDN" else "US",
+            **self._stamp("orders", i, created),
+        }
+        yield "orders", order
+        for sub_order in build_vendor_orders(order):
+            key = f"{i}:{sub_order['vendor_id']}"
+            sub_order.update({
+                "id": self.id("vendor_orders", key),
+                "_id": object_id(self.seed, "vendor_orders", key, created),
+            })
+            yield "vendor_orders", sub_order
+
+    def reviews(self, i: int):
+        rng = self.rng("reviews", i)
+        product = self.product(self.popular(rng, "products"))
+        rating = rng.choices(range(1, 6), RATING_WEIGHTS)[0]
+        created = self.created_at(rng, after=product["_id"].generation_time)
+        yield "reviews", {
+            "id": self.id("reviews", i),
+            "product_id": product["id"],
+            "vendor_id": product["vendor_id"],
+            "user_id": self.id("users", self.popular(rng, "users")),
+            "user_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)[0]}.",
+            "rating": rating,
+            "title": REVIEW_TITLES[rating],
+            "comment": " ".join(rng.choices(ADJECTIVES + NOUNS, k=rng.randint(5, 60))),
+            "images": [],
+            "would_recommend": rating >= 4,
+            "helpful_votes": zipf_rank(rng.random(), 200, 2.0),
+            "verified_purchase": rng.random() < 0.75,
+            **self._stamp("reviews", i, created),
+        }
+
+    def notifications(self, i: int):
+        rng = self.rng("notifications", i)
+        created = self.created_at(rng)
+        kind = rng.choices(["order", "price_alert"], [85, 15])[0]
+        if kind == "order":
+            status = rng.choice(["placed", "confirmed", "shipped", "delivered"])
+            title, message = "Order Update", f"Your order is {status}"
+            link = f"/orders/{self.id('orders', rng.randrange(self.params['orders']))}"
+        else:
+            title, message = "Price Drop Alert!", "An item on your watch list is now cheaper"
+            link = f"/products/{self.id('products', self.popular(rng, 'products'))}"
+        read = rng.random() < (0.85 if (self.end - created).days > 3 else 0.3)
+        notification = {
+            "id": self.id("notifications", i),
+            "user_id": self.id("users", self.popular(rng, "users")),
+            "title": title,
+            "message": message,
+            "type": kind,
+            "link": link,
+            "read": read,
+            **self._stamp("notifications", i, created),
+        }
+        if read:
+            notification["read_at"] = timestamp(self.created_at(rng, after=created))
+        yield "notifications", notification
+
+
+# ==================== WRITING ====================
+
+async def _insert(db, collection: str, docs: list):
+    """Unordered insert that tolerates documents already written by an interrupted run"""
+    try:
+        await db[collection].insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+
+
+async def write_chunk(db, generator: Generator, stage: str, chunk: int) -> int:
+    batch_size = generator.params["batch_size"]
+    start = chunk * batch_size
+    by_collection = {}
+    for i in range(start, min(generator.params[stage], start + batch_size)):
+        for collection, doc in getattr(generator, stage)(i):
+            by_collection.setdefault(collection, []).append(doc)
+    for collection, docs in by_collection.items():
+        await _insert(db, collection, docs)
+    await db.synthetic_progress.update_one(
+        {"id": f"{stage}:{chunk}"},
+        {"$set": {"stage": stage, "chunk": chunk, "completed_at": timestamp()}},
+        upsert=True
+    )
+    return sum(len(docs) for docs in by_collection.values())
+
+
+async def _write_chunks(db, params: dict, stage: str, chunks: list) -> int:
+    generator = Generator(params)
+    written = 0
+    for chunk in chunks:
+        written += await write_chunk(db, generator, stage, chunk)
+    return written
+
+
+def _worker(mongo_url: str, db_name: str, params: dict, stage: str, chunks: list) -> int:
+    """Process entry point: own event loop and client"""
+    async def run():
+        client = AsyncIOMotorClient(mongo_url)
+        try:
+            return await _write_chunks(client[db_name], params, stage, chunks)
+        finally:
+            client.close()
+    return asyncio.run(run())
+
+
+async def finalize(db, batch_size: int = 1000):
+    """Derived fields: rating summaries and product ratings, sales counts, vendor product counts"""
+    now = timestamp()
+    summaries = {}
+    pipeline = [{"$group": {"_id": {"product_id": "$product_id", "rating": "$rating"}, "count": {"$sum": 1}}}]
+    async for row in db.reviews.aggregate(pipeline, allowDiskUse=True):
+        product_id, rating = row["_id"]["product_id"], row["_id"]["rating"]
+        summary = summaries.setdefault(product_id, {
+            "product_id": product_id, "count": 0, "sum": 0, "stars": {}, "updated_at": now
+        })
+        summary["count"] += row["count"]
+        summary["sum"] += rating * row["count"]
+        summary["stars"][str(rating)] = row["count"]
+
+    summary_list = list(summaries.values())
+    for start in range(0, len(summary_list), batch_size):
+        batch = summary_list[start:start + batch_size]
+        await db.rating_summaries.bulk_write(
+            [ReplaceOne({"product_id": s["product_id"]}, s, upsert=True) for s in batch], ordered=False
+        )
+        await db.products.bulk_write([
+            UpdateOne({"id": s["product_id"]}, {"$set": {
+                "average_rating": round(s["sum"] / s["count"], 1), "review_count": s["count"]
+            }}) for s in batch
+        ], ordered=False)
+
+    sales = db.orders.aggregate([
+        {"$match": {"payment_status": "paid"}},
+        {"$unwind": "$items"},
+        {"$group": {"_id": "$items.product_id", "sold": {"$sum": "$items.quantity"}}}
+    ], allowDiskUse=True)
+    batch = []
+    async for row in sales:
+        batch.append(UpdateOne({"id": row["_id"]}, {"$set": {"sales_count": row["sold"]}}))
+        if len(batch) == batch_size:
+            await db.products.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.products.bulk_write(batch, ordered=False)
+
+    counts = [row async for row in db.products.aggregate(
+        [{"$group": {"_id": "$vendor_id", "count": {"$sum": 1}}}], allowDiskUse=True
+    )]
+    for start in range(0, len(counts), batch_size):
+        await db.vendors.bulk_write([
+            UpdateOne({"id": row["_id"]}, {"$set": {"product_count": row["count"]}})
+            for row in counts[start:start + batch_size]
+        ], ordered=False)
+    return {"rating_summaries": len(summaries), "vendors": len(counts)}
+
+
+async def generation_state(db):
+    return await db.synthetic_runs.find_one({"id": "current"}, {"_id": 0})
+
+
+async def generate(db, params: dict, workers: int = 0, mongo_url: str = MONGO_URL,
+                   indexes: bool = True, log=print) -> dict:
+    """Generate (or resume generating) the data set described by params into db
+
+    With workers > 1 chunks are written by that many processes, each with its
+    own client on mongo_url; otherwise they are written in this event loop.
+    """
+    state = await generation_state(db)
+    if state:
+        stored = state["params"]
+        changed = [k for k in stored if k not in RUN_FIELDS and params.get(k) != stored[k]]
+        if changed:
+            raise ValueError(f"{db.name} holds synthetic data generated with different {', '.join(changed)}; reset it first")
+        params = stored
+        if state.get("completed_at"):
+            return state
+    else:
+        # One bcrypt hash (random salt) per run, so every worker and resume writes the same users
+        params = {**params, "password_hash": hash_password(PASSWORD)}
+        await db.synthetic_runs.insert_one({"id": "current", "params": params, "started_at": timestamp()})
+
+    log(f"Generating into {db.name}: " + ", ".join(f"{k}={params[k]}" for k in STAGES))
+    executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) if workers > 1 else None
+    loop = asyncio.get_running_loop()
+    totals = {}
+    try:
+        for stage in STAGES:
+            chunk_count = math.ceil(params[stage] / params["batch_size"])
+            done = set(await db.synthetic_progress.distinct("chunk", {"stage": stage}))
+            pending = [c for c in range(chunk_count) if c not in done]
+            if not pending:
+                continue
+            started = time.perf_counter()
+            if executor:
+                shares = [pending[w::workers] for w in range(workers) if pending[w::workers]]
+                written = sum(await asyncio.gather(*(
+                    loop.run_in_executor(executor, _worker, mongo_url, db.name, params, stage, share)
+                    for share in shares
+                )))
+            else:
+                written = await _write_chunks(db, params, stage, pending)
+            elapsed = time.perf_counter() - started
+            totals[stage] = written
+            log(f"  {stage:<14}{written:>12,} documents in {elapsed:8.1f}s ({written / elapsed:,.0f}/s)")
+    finally:
+        if executor:
+            executor.shutdown()
+
+    if not await db.synthetic_progress.find_one({"id": "finalize"}):
+        started = time.perf_counter()
+        result = await finalize(db)
+        await db.synthetic_progress.insert_one({"id": "finalize", "stage": "finalize", "completed_at": timestamp()})
+        log(f"  derived fields for {result['rating_summaries']:,} products, {result['vendors']:,} vendors "
+            f"in {time.perf_counter() - started:.1f}s")
+
+    if indexes:
+        for collection, keys, options in INDEXES:
+            await db[collection].create_index(keys, **options)
+        log(f"  {len(INDEXES)} indexes ensured")
+
+    await db.synthetic_runs.update_one({"id": "current"}, {"$set": {"completed_at": timestamp(), "written": totals}})
+    return await generation_state(db)
+
+
+async def print_status(db):
+    state = await generation_state(db)
+    if not state:
+        print(f"{db.name}: no synthetic data")
+        return
+    params = state["params"]
+    print(f"{db.name}: seed {params['seed']}, until {params['until']}, "
+          f"{'complete' if state.get('completed_at') else 'incomplete'}")
+    for stage in STAGES:
+        chunks = math.ceil(params[stage] / params["batch_size"])
+        done = await db.synthetic_progress.count_documents({"stage": stage})
+        print(f"  {stage:<14}{params[stage]:>12,}  {done}/{chunks} chunks")
+
+
+async def main(args):
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[args.db]
+    try:
+        if args.status:
+            await print_status(db)
+            return
+        if args.reset:
+            print(f"Dropping {args.db}")
+            await client.drop_database(args.db)
+        volumes = {k: getattr(args, k) if getattr(args, k) is not None else int(v * args.scale)
+                   for k, v in DEFAULT_VOLUMES.items()}
+        options = {"seed": args.seed, "days": args.days, "zipf": args.zipf,
+                   "batch_size": args.batch_size, "until": args.until}
+        started = time.perf_counter()
+        await generate(db, resolve_params(volumes, options), workers=args.workers, indexes=not args.skip_indexes)
+        print(f"Done in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate production-sized synthetic data")
+    parser.add_argument("--db", default=SYNTHETIC_DB_NAME, help="target database")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for the default volumes")
+    for name in DEFAULT_VOLUMES:
+        parser.add_argument(f"--{name}", type=int, help=f"number of {name} (default {DEFAULT_VOLUMES[name]:,} x scale)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_PARAMS["seed"])
+    parser.add_argument("--days", type=int, default=DEFAULT_PARAMS["days"], help="length of the date window")
+    parser.add_argument("--until", help="last day of the date window (YYYY-MM-DD, default today)")
+    parser.add_argument("--zipf", type=float, default=DEFAULT_PARAMS["zipf"], help="popularity skew exponent")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_PARAMS["batch_size"], help="documents per chunk")
+    parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1), help="writer processes")
+    parser.add_argument("--skip-indexes", action="store_true", help="don't create database.INDEXES afterwards")
+    parser.add_argument("--reset", action="store_true", help="drop the target database first")
+    parser.add_argument("--status", action="store_true", help="show progress and exit")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,59 @@
+"""
+Streaming admin export tests
+Tests:
+- /admin/export/orders streams CSV with the declared header
+- gzip=true returns a gzipped NDJSON download
+- Unknown datasets and bad dates are rejected
+"""
+import pytest
+import requests
+import gzip
+import json
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+ADMIN_EMAIL = "admin@afrovending.com"
+ADMIN_PASSWORD = "AfroAdmin2024!"
+
+
+@pytest.fixture
+def admin_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": ADMIN_EMAIL,
+        "password": ADMIN_PASSWORD
+    })
+    if response.status_code != 200:
+        pytest.skip("Admin login failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestAdminExports:
+    """GET /api/admin/export/{dataset}"""
+
+    def test_orders_csv(self, admin_headers):
+        response = requests.get(f"{BASE_URL}/api/admin/export/orders", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+        assert response.text.splitlines()[0].startswith("id,user_id,status")
+        print(f"PASS: Orders CSV streamed ({len(response.text.splitlines()) - 1} rows)")
+
+    def test_users_ndjson_gzip(self, admin_headers):
+        response = requests.get(
+            f"{BASE_URL}/api/admin/export/users?format=ndjson&gzip=true&date_from=2020-01-01",
+            headers=admin_headers
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/gzip"
+        lines = gzip.decompress(response.content).decode("utf-8").splitlines()
+        for line in lines[:10]:
+            user = json.loads(line)
+            assert "password_hash" not in user
+        print(f"PASS: Gzipped NDJSON export with {len(lines)} users")
+
+    def test_rejects_unknown_dataset_and_bad_date(self, admin_headers):
+        assert requests.get(f"{BASE_URL}/api/admin/export/secrets", headers=admin_headers).status_code == 404
+        bad_date = requests.get(f"{BASE_URL}/api/admin/export/orders?date_from=yesterday", headers=admin_headers)
+        assert bad_date.status_code == 400
+        print("PASS: Unknown dataset and bad date rejected")
@@ -0,0 +1,50 @@
+"""
+Conditional GET tests
+Tests:
+- Static reference lists return a strong ETag and 304 on If-None-Match
+- Categories honor If-None-Match
+- Product detail returns ETag/Last-Modified and 304 on a matching validator
+"""
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestConditionalGet:
+    """ETag / Last-Modified on catalogue resources"""
+
+    def test_static_lists(self):
+        for path in ("/api/countries", "/api/shipping/countries", "/api/shipping/regions"):
+            response = requests.get(f"{BASE_URL}{path}")
+            assert response.status_code == 200
+            etag = response.headers["ETag"]
+            assert not etag.startswith("W/")
+
+            cached = requests.get(f"{BASE_URL}{path}", headers={"If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.content == b""
+        print("PASS: Static reference lists revalidate with 304")
+
+    def test_categories(self):
+        response = requests.get(f"{BASE_URL}/api/categories")
+        assert response.status_code == 200
+        cached = requests.get(f"{BASE_URL}/api/categories", headers={"If-None-Match": response.headers["ETag"]})
+        assert cached.status_code == 304
+        print("PASS: Categories revalidate with 304")
+
+    def test_product_detail(self):
+        products = requests.get(f"{BASE_URL}/api/products?limit=1").json()
+        if not products:
+            print("SKIP: No products")
+            return
+        url = f"{BASE_URL}/api/products/{products[0]['id']}"
+
+        response = requests.get(url)
+        assert response.status_code == 200
+        assert "Last-Modified" in response.headers
+
+        assert requests.get(url, headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+        assert requests.get(url, headers={"If-Modified-Since": response.headers["Last-Modified"]}).status_code == 304
+        assert requests.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+        print("PASS: Product detail revalidates with 304")
@@ -0,0 +1,46 @@
+"""
+Homepage bundle tests
+Tests:
+- GET /api/homepage/bundle returns every homepage section in one payload
+- ETag / Cache-Control headers and If-None-Match revalidation (304)
+- Legacy homepage endpoints serve the same snapshot data
+"""
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestHomepageBundle:
+    """GET /api/homepage/bundle"""
+
+    def test_bundle_contains_all_sections(self):
+        response = requests.get(f"{BASE_URL}/api/homepage/bundle")
+        assert response.status_code == 200
+
+        data = response.json()
+        for key in ["platform_stats", "stats", "recently_sold", "vendor_success",
+                    "featured_products", "featured_vendors", "product_categories",
+                    "service_categories", "built_at"]:
+            assert key in data, f"Missing section: {key}"
+        print(f"PASS: Bundle built at {data['built_at']}")
+
+    def test_bundle_cache_headers(self):
+        response = requests.get(f"{BASE_URL}/api/homepage/bundle")
+        assert response.status_code == 200
+        assert response.headers.get("ETag"), "Bundle should carry an ETag"
+        assert "max-age" in response.headers.get("Cache-Control", "")
+        print(f"PASS: ETag {response.headers['ETag']}")
+
+    def test_bundle_if_none_match_returns_304(self):
+        first = requests.get(f"{BASE_URL}/api/homepage/bundle")
+        etag = first.headers.get("ETag")
+        response = requests.get(f"{BASE_URL}/api/homepage/bundle", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        print("PASS: Unchanged bundle revalidates with 304")
+
+    def test_platform_stats_match_bundle(self):
+        bundle = requests.get(f"{BASE_URL}/api/homepage/bundle").json()
+        stats = requests.get(f"{BASE_URL}/api/stats/platform").json()
+        assert stats == bundle["platform_stats"]
+        print("PASS: /stats/platform served from snapshot")
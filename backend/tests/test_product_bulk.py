@@ -0,0 +1,140 @@
+"""
+Bulk product import/export tests
+Tests:
+- /vendor/products/import dry run validates CSV rows and reports row errors
+- CSV import reads a bare " inside an unquoted field as a literal character
+- JSON Lines import updates an exported product in place
+- /vendor/products/export streams CSV with the import header
+- /vendor/products/bulk-edit previews a percentage price change
+"""
+import pytest
+import requests
+import json
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+VENDOR_EMAIL = "vendor@afrovending.com"
+VENDOR_PASSWORD = "AfroVendor2024!"
+
+
+@pytest.fixture
+def vendor_headers():
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": VENDOR_EMAIL,
+        "password": VENDOR_PASSWORD
+    })
+    if response.status_code != 200:
+        pytest.skip("Vendor login failed")
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class TestProductImport:
+    """POST /api/vendor/products/import"""
+
+    def test_csv_dry_run_reports_row_errors(self, vendor_headers):
+        categories = requests.get(f"{BASE_URL}/api/categories").json()
+        if not categories:
+            pytest.skip("No categories")
+        body = "\n".join([
+            "name,description,price,category_id,stock,tags",
+            f'Bulk Test,"Line one\nline two",12.5,{categories[0]["id"]},3,a|b',
+            f"Bad Price,desc,abc,{categories[0]['id']},1,",
+        ])
+        response = requests.post(
+            f"{BASE_URL}/api/vendor/products/import?dry_run=true",
+            data=body.encode(),
+            headers={**vendor_headers, "Content-Type": "text/csv"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["dry_run"] is True
+        assert data["rows"] == 2 and data["created"] == 1 and data["failed"] == 1
+        assert data["errors"][0]["row"] == 2
+        print("PASS: Dry run validated rows and reported the bad price")
+
+    def test_csv_literal_quote_in_unquoted_field(self, vendor_headers):
+        categories = requests.get(f"{BASE_URL}/api/categories").json()
+        if not categories:
+            pytest.skip("No categories")
+        category_id = categories[0]["id"]
+        body = "\n".join([
+            "name,description,price,category_id,stock",
+            f'12" Djembe drum,Hand carved,50,{category_id},3',
+            f"Kente scarf,Handwoven,20,{category_id},2",
+            f"Mask,Carved wood,30,{category_id},1",
+        ])
+        response = requests.post(
+            f"{BASE_URL}/api/vendor/products/import?dry_run=true",
+            data=body.encode(),
+            headers={**vendor_headers, "Content-Type": "text/csv"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["rows"] == 3 and data["created"] == 3 and data["failed"] == 0
+        print("PASS: Bare inch mark read as a literal quote, all rows imported")
+
+    def test_unknown_format_rejected(self, vendor_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/vendor/products/import",
+            data=b"{}",
+            headers={**vendor_headers, "Content-Type": "application/octet-stream"}
+        )
+        assert response.status_code == 415
+        print("PASS: Unknown upload format rejected")
+
+    def test_jsonl_round_trip_update(self, vendor_headers):
+        export = requests.get(f"{BASE_URL}/api/vendor/products/export?format=jsonl", headers=vendor_headers)
+        assert export.status_code == 200
+        lines = export.text.splitlines()
+        if not lines:
+            pytest.skip("Vendor has no products")
+        product = json.loads(lines[0])
+
+        response = requests.post(
+            f"{BASE_URL}/api/vendor/products/import?format=jsonl",
+            data=(json.dumps(product) + "\n").encode(),
+            headers=vendor_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["updated"] == 1 and data["created"] == 0
+        print("PASS: Exported product imported back as an update")
+
+
+class TestProductExport:
+    """GET /api/vendor/products/export"""
+
+    def test_csv_export_header(self, vendor_headers):
+        response = requests.get(f"{BASE_URL}/api/vendor/products/export?format=csv", headers=vendor_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.text.splitlines()[0].startswith("id,name,description,price")
+        print("PASS: CSV export streamed with the import header")
+
+
+class TestProductBulkEdit:
+    """POST /api/vendor/products/bulk-edit"""
+
+    def test_percent_price_dry_run(self, vendor_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/vendor/products/bulk-edit",
+            json={"selection": {}, "price_change_percent": -10, "dry_run": True},
+            headers=vendor_headers
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["modified"] == 0
+        for item in data["preview"]:
+            old, new = item["price"]
+            assert new == max(0.01, round(old * 0.9, 2))
+        print(f"PASS: Dry run previewed {data['matched']} price changes")
+
+    def test_conflicting_changes_rejected(self, vendor_headers):
+        response = requests.post(
+            f"{BASE_URL}/api/vendor/products/bulk-edit",
+            json={"selection": {}, "stock": 5, "stock_change": 1},
+            headers=vendor_headers
+        )
+        assert response.status_code == 400
+        print("PASS: stock and stock_change together rejected")
@@ -0,0 +1,42 @@
+"""
+Product facet tests
+Tests:
+- /products/facets returns the page, total and every facet group
+- Price range buckets add up to the filtered total
+- get_products keeps its plain list response unless facets=true
+"""
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestProductFacets:
+    """GET /api/products/facets"""
+
+    def test_facets_shape(self):
+        response = requests.get(f"{BASE_URL}/api/products/facets?limit=5")
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["products"]) <= 5
+        assert isinstance(data["total"], int)
+        for group in ("categories", "countries", "price_ranges", "ratings"):
+            assert group in data["facets"]
+        print(f"PASS: Facets returned for {data['total']} products")
+
+    def test_price_buckets_cover_total(self):
+        response = requests.get(f"{BASE_URL}/api/products/facets?limit=1")
+        assert response.status_code == 200
+        data = response.json()
+        assert sum(b["count"] for b in data["facets"]["price_ranges"]) == data["total"]
+        print("PASS: Price buckets add up to total")
+
+    def test_products_facets_flag(self):
+        plain = requests.get(f"{BASE_URL}/api/products?limit=3")
+        assert plain.status_code == 200
+        assert isinstance(plain.json(), list)
+
+        faceted = requests.get(f"{BASE_URL}/api/products?limit=3&facets=true")
+        assert faceted.status_code == 200
+        assert "facets" in faceted.json()
+        print("PASS: facets=true opt-in on /products")
@@ -0,0 +1,68 @@
+"""
+Realtime push channel tests
+Tests:
+- User notification stream requires authentication
+- User notification stream opens as text/event-stream (header and ?token= auth)
+- Public order tracking stream returns 404 for unknown orders
+"""
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+VENDOR_EMAIL = "vendor@afrovending.com"
+VENDOR_PASSWORD = "AfroVendor2024!"
+
+
+@pytest.fixture(scope="module")
+def user_token():
+    """Any signed-in user can open their own stream"""
+    response = requests.post(f"{BASE_URL}/api/auth/login", json={
+        "email": VENDOR_EMAIL,
+        "password": VENDOR_PASSWORD
+    })
+    if response.status_code != 200:
+        pytest.skip(f"Login failed: {response.status_code}")
+    return response.json().get("access_token")
+
+
+class TestNotificationStream:
+    """GET /api/notifications/stream"""
+
+    def test_stream_requires_auth(self):
+        response = requests.get(f"{BASE_URL}/api/notifications/stream", timeout=10)
+        assert response.status_code == 401
+        print("PASS: Stream rejects anonymous clients")
+
+    def test_stream_with_bearer_header(self, user_token):
+        with requests.get(
+            f"{BASE_URL}/api/notifications/stream",
+            headers={"Authorization": f"Bearer {user_token}"},
+            stream=True,
+            timeout=10
+        ) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            first = next(response.iter_lines(decode_unicode=True))
+            assert first.startswith("retry:")
+        print("PASS: Stream opens with bearer token")
+
+    def test_stream_with_query_token(self, user_token):
+        with requests.get(
+            f"{BASE_URL}/api/notifications/stream?token={user_token}",
+            stream=True,
+            timeout=10
+        ) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+        print("PASS: Stream opens with ?token= for EventSource clients")
+
+
+class TestOrderTrackingStream:
+    """GET /api/notifications/orders/{order_id}/stream"""
+
+    def test_unknown_order_returns_404(self):
+        response = requests.get(f"{BASE_URL}/api/notifications/orders/does-not-exist/stream", timeout=10)
+        assert response.status_code == 404
+        print("PASS: Unknown order stream returns 404")
@@ -2,6 +2,7 @@
 AfroVending - Scheduler and Webhooks Test Suite
 Tests:
 - Scheduler status endpoint (GET /api/admin/scheduler/status)
+- Scheduler leadership (lease holder and fencing token in the status)
 - Manual payout trigger (POST /api/admin/scheduler/trigger-payouts)
 - Scheduler logs endpoint (GET /api/admin/scheduler/logs)
 - Stripe webhook endpoint (POST /api/webhooks/stripe)
@@ -77,6 +78,23 @@ class TestSchedulerEndpoints:
         
         print(f"Payout job found: {payout_job['name']}, next_run: {payout_job['next_run']}")
     
+    def test_scheduler_status_shows_leadership(self):
+        """GET /api/admin/scheduler/status - Verify the scheduler lease is reported"""
+        response = self.session.get(f"{BASE_URL}/api/admin/scheduler/status")
+    
+        assert response.status_code == 200
+    
+        leadership = response.json().get("leadership")
+        assert leadership is not None, "Response should contain 'leadership'"
+        assert leadership.get("instance"), "Leadership should name this instance"
+        assert leadership.get("holder"), "Some instance should hold the scheduler lease"
+        assert isinstance(leadership.get("holder_token"), int), "Lease should carry a fencing token"
+        if leadership["is_leader"]:
+            assert leadership["token"] == leadership["holder_token"]
+    
+        print(f"Scheduler lease: holder={leadership['holder']}, token={leadership['holder_token']}, "
+              f"this instance leader={leadership['is_leader']}")
+    
     def test_manual_payout_trigger_works(self):
         """POST /api/admin/scheduler/trigger-payouts - Manually trigger payout processing"""
         response = self.session.post(f"{BASE_URL}/api/admin/scheduler/trigger-payouts")
@@ -8,6 +8,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from conditional import versioned
+
 # Image mappings
 PRODUCT_IMAGES = {
     "Moringa Powder": "https://static.prod-images.emergentagent.com/jobs/54dd1b4f-e2a6-479b-856b-fd34b195f9d5/images/64e263012d922ad73463903998aa945be6381bdd64c789cbc4364507861a6504.png",
@@ -59,7 +61,7 @@ async def update_products():
         # Update product
         await db.products.update_one(
             {"id": product["id"]},
-            {"$set": {"images": [image_url]}}
+            versioned({"$set": {"images": [image_url]}})
         )
         print(f"Updated: {name} with image")
         updated += 1
@@ -0,0 +1,76 @@
+"""
+AfroVending - Denormalized Vendor Attributes
+Copies the vendor fields that catalogue filters use onto products and services
+
+Products already carry their own origin `country_code` / `country_name`, so
+the vendor's values are stored under a `vendor_` prefix:
+    vendor_country, vendor_country_code, vendor_is_verified, vendor_is_approved
+
+Stamp them on insert with `vendor_attributes(vendor)`, re-propagate with
+`propagate_vendor_attributes` whenever one of the source fields changes, and
+run `python vendor_attributes.py` to backfill the whole catalogue.
+"""
+from pymongo import UpdateMany
+import asyncio
+import logging
+
+from database import get_db
+from conditional import versioned
+
+logger = logging.getLogger(__name__)
+
+# vendor field -> field on product/service documents
+VENDOR_ATTRIBUTE_FIELDS = {
+    "country": "vendor_country",
+    "country_code": "vendor_country_code",
+    "is_verified": "vendor_is_verified",
+    "is_approved": "vendor_is_approved",
+}
+
+VENDOR_ATTRIBUTE_PROJECTION = {"_id": 0, "id": 1, **{field: 1 for field in VENDOR_ATTRIBUTE_FIELDS}}
+
+
+def vendor_attributes(vendor: dict) -> dict:
+    """The denormalized fields for a vendor, ready to merge into a product/service"""
+    return {target: vendor.get(source) for source, target in VENDOR_ATTRIBUTE_FIELDS.items()}
+
+
+def touches_vendor_attributes(update_fields: dict) -> bool:
+    return any(field in update_fields for field in VENDOR_ATTRIBUTE_FIELDS)
+
+
+async def propagate_vendor_attributes(db, vendor_id: str):
+    """Rewrite the vendor's attributes on all of their products and services"""
+    vendor = await db.vendors.find_one({"id": vendor_id}, VENDOR_ATTRIBUTE_PROJECTION)
+    if not vendor:
+        return
+    attributes = vendor_attributes(vendor)
+    await db.products.update_many({"vendor_id": vendor_id}, versioned({"$set": attributes}))
+    await db.services.update_many({"vendor_id": vendor_id}, {"$set": attributes})
+
+
+async def backfill_vendor_attributes(db=None, batch_size: int = 500) -> dict:
+    """Stamp every vendor's attributes on their catalogue with bulk writes"""
+    db = db if db is not None else get_db()
+    vendors = 0
+    batch = []
+
+    async def flush():
+        if batch:
+            await db.products.bulk_write(batch, ordered=False)
+            await db.services.bulk_write(batch, ordered=False)
+            batch.clear()
+
+    async for vendor in db.vendors.find({}, VENDOR_ATTRIBUTE_PROJECTION):
+        batch.append(UpdateMany({"vendor_id": vendor["id"]}, versioned({"$set": vendor_attributes(vendor)})))
+        vendors += 1
+        if len(batch) >= batch_size:
+            await flush()
+    await flush()
+
+    logger.info(f"Backfilled vendor attributes for {vendors} vendors")
+    return {"vendors": vendors}
+
+
+if __name__ == "__main__":
+    print(asyncio.run(backfill_vendor_attributes()))
@@ -0,0 +1,118 @@
+"""
+AfroVending - Vendor Sub-Order Service
+Per-vendor slices of customer orders, stored in `vendor_orders`
+
+A multi-vendor order gets one sub-order per vendor holding only that
+vendor's items, their subtotal and a status kept in sync with the parent.
+Vendor dashboards and earnings read this collection by (vendor_id,
+created_at) instead of scanning `orders.items.vendor_id`.
+
+Run `python vendor_order_service.py` to backfill sub-orders for orders
+created before this collection existed.
+"""
+from pymongo import UpdateOne
+import asyncio
+import logging
+import uuid
+
+from database import get_db
+from datetimes import timestamp
+
+logger = logging.getLogger(__name__)
+
+# Parent order fields a vendor needs to fulfil their part of the order
+SHARED_ORDER_FIELDS = [
+    "user_id", "status", "payment_status", "created_at",
+    "shipping_name", "shipping_address", "shipping_address2", "shipping_city",
+    "shipping_state", "shipping_zip", "shipping_country", "shipping_phone"
+]
+
+
+def build_vendor_orders(order: dict) -> list:
+    """Split an order into one sub-order document per vendor"""
+    by_vendor = {}
+    for item in order.get("items", []):
+        vendor_id = item.get("vendor_id")
+        if vendor_id:
+            by_vendor.setdefault(vendor_id, []).append(item)
+
+    sub_orders = []
+    for vendor_id, items in by_vendor.items():
+        sub_order = {
+            "id": str(uuid.uuid4()),
+            "order_id": order["id"],
+            "vendor_id": vendor_id,
+            "items": items,
+            "subtotal": sum(float(i.get("price", 0)) * int(i.get("quantity", 1)) for i in items),
+            "item_count": sum(int(i.get("quantity", 1)) for i in items)
+        }
+        for field in SHARED_ORDER_FIELDS:
+            sub_order[field] = order.get(field)
+        sub_orders.append(sub_order)
+    return sub_orders
+
+
+async def create_vendor_orders(db, order: dict) -> list:
+    """Write the vendor sub-orders for a freshly created order"""
+    sub_orders = build_vendor_orders(order)
+    if sub_orders:
+        await db.vendor_orders.insert_many([dict(s) for s in sub_orders])
+    return sub_orders
+
+
+async def sync_vendor_orders(db, order_id: str, fields: dict, vendor_id: str = None):
+    """Mirror parent order changes (status, payment, tracking) onto its sub-orders"""
+    query = {"order_id": order_id}
+    if vendor_id:
+        query["vendor_id"] = vendor_id
+    await db.vendor_orders.update_many(query, {"$set": {
+        **fields,
+        "updated_at": timestamp()
+    }})
+
+
+async def delete_vendor_orders(db, order_id: str):
+    await db.vendor_orders.delete_many({"order_id": order_id})
+
+
+def as_vendor_order_view(sub_order: dict) -> dict:
+    """Shape a sub-order like the order documents the vendor UI already renders"""
+    return {
+        **sub_order,
+        "id": sub_order["order_id"],
+        "sub_order_id": sub_order["id"],
+        "total": sub_order["subtotal"]
+    }
+
+
+async def backfill_vendor_orders(db=None, batch_size: int = 500) -> dict:
+    """Create sub-orders for orders that don't have any yet"""
+    db = db if db is not None else get_db()
+    existing = set(await db.vendor_orders.distinct("order_id"))
+
+    created = 0
+    batch = []
+    async for order in db.orders.find({}, {"_id": 0}).batch_size(batch_size):
+        if order["id"] in existing:
+            continue
+        for sub_order in build_vendor_orders(order):
+            batch.append(UpdateOne(
+                {"order_id": sub_order["order_id"], "vendor_id": sub_order["vendor_id"]},
+                {"$setOnInsert": sub_order},
+                upsert=True
+            ))
+        if len(batch) >= batch_size:
+            result = await db.vendor_orders.bulk_write(batch, ordered=False)
+            created += result.upserted_count
+            batch = []
+
+    if batch:
+        result = await db.vendor_orders.bulk_write(batch, ordered=False)
+        created += result.upserted_count
+
+    logger.info(f"Backfilled {created} vendor sub-orders")
+    return {"created": created}
+
+
+if __name__ == "__main__":
+    print(asyncio.run(backfill_vendor_orders()))
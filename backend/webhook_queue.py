@@ -0,0 +1,169 @@
+"""
+AfroVending - Webhook Ingestion Queue
+Durable, idempotent queue for Stripe webhook events
+
+Webhook endpoints verify the signature, store the event in `webhook_events`
+keyed by the Stripe event id (unique index) and return 200 straight away.
+A background worker claims pending events and runs the handler registered
+for their source. Delivery is at-least-once: failed events are retried with
+exponential backoff, events whose worker died are reclaimed once their lock
+expires, and duplicates from Stripe retries never get a second row.
+"""
+from datetime import datetime, timezone, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import logging
+import os
+import uuid
+
+from database import get_db
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_LOCK_SECONDS = 300
+WEBHOOK_POLL_SECONDS = 5
+WEBHOOK_RETENTION_DAYS = 7  # comfortably longer than Stripe's 3 day retry window
+
+# source -> async handler(db, event)
+_handlers = {}
+
+
+def register_handler(source: str, handler):
+    _handlers[source] = handler
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class WebhookWorker:
+    """Background task draining `webhook_events`"""
+
+    def __init__(self):
+        self._task = None
+        self._wake = asyncio.Event()
+
+    def notify(self):
+        self._wake.set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Webhook worker started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                job = await claim_next_event(get_db())
+                if job is None:
+                    self._wake.clear()
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=WEBHOOK_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await process_event(get_db(), job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook worker error: {e}")
+                await asyncio.sleep(WEBHOOK_POLL_SECONDS)
+
+
+webhook_worker = WebhookWorker()
+
+
+async def enqueue_event(db, source: str, event: dict) -> bool:
+    """Persist a verified event; False when Stripe re-sent one we already have"""
+    now = _now().isoformat()
+    try:
+        await db.webhook_events.insert_one({
+            "event_id": event.get("id") or str(uuid.uuid4()),
+            "source": source,
+            "type": event.get("type"),
+            "event": event,
+            "status": "pending",
+            "attempts": 0,
+            "received_at": now,
+            "available_at": now
+        })
+    except DuplicateKeyError:
+        return False
+    webhook_worker.notify()
+    return True
+
+
+async def claim_next_event(db):
+    """Atomically lock the oldest due event (or one whose worker died)"""
+    now = _now()
+    return await db.webhook_events.find_one_and_update(
+        {"$or": [
+            {"status": "pending", "available_at": {"$lte": now.isoformat()}},
+            {"status": "processing", "locked_until": {"$lt": now.isoformat()}}
+        ]},
+        {
+            "$set": {
+                "status": "processing",
+                "locked_until": (now + timedelta(seconds=WEBHOOK_LOCK_SECONDS)).isoformat()
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("available_at", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def process_event(db, job: dict):
+    """Run the handler for a claimed event and record the outcome"""
+    handler = _handlers.get(job["source"])
+    try:
+        if handler is None:
+            raise RuntimeError(f"No webhook handler registered for {job['source']}")
+        await handler(db, job["event"])
+    except Exception as e:
+        attempts = job.get("attempts", 1)
+        failed = attempts >= WEBHOOK_MAX_ATTEMPTS
+        retry_at = _now() + timedelta(seconds=min(5 * 2 ** attempts, 3600))
+        await db.webhook_events.update_one(
+            {"event_id": job["event_id"]},
+            {"$set": {
+                "status": "failed" if failed else "pending",
+                "available_at": retry_at.isoformat(),
+                "last_error": str(e)
+            }, "$unset": {"locked_until": ""}}
+        )
+        logger.error(f"Webhook {job['event_id']} ({job.get('type')}) attempt {attempts} failed: {e}")
+        return False
+
+    await db.webhook_events.update_one(
+        {"event_id": job["event_id"]},
+        {"$set": {
+            "status": "done",
+            "processed_at": _now().isoformat(),
+            "expire_at": _now() + timedelta(days=WEBHOOK_RETENTION_DAYS)
+        }, "$unset": {"locked_until": "", "last_error": ""}}
+    )
+    return True
+
+
+async def retry_event(db, event_id: str) -> bool:
+    """Put a failed event back on the queue"""
+    result = await db.webhook_events.update_one(
+        {"event_id": event_id, "status": "failed"},
+        {"$set": {"status": "pending", "attempts": 0, "available_at": _now().isoformat()}}
+    )
+    if result.modified_count:
+        webhook_worker.notify()
+    return bool(result.modified_count)
@@ -8,13 +8,23 @@ import { ShoppingBag, MapPin, Clock } from 'lucide-react';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL || '';
 
-const RecentlySold = () => {
+const RecentlySold = ({ bundled = false, initialItems = null }) => {
   const { formatPrice } = useCurrency();
   const [items, setItems] = useState([]);
   const [loading, setLoading] = useState(true);
 
+  // On the homepage the items arrive with /homepage/bundle, so first paint needs no extra request
   useEffect(() => {
-    fetchRecentlySold();
+    if (initialItems) {
+      setItems(initialItems);
+      setLoading(false);
+    }
+  }, [initialItems]);
+
+  useEffect(() => {
+    if (!bundled) {
+      fetchRecentlySold();
+    }
     // Refresh every 2 minutes for dynamic feel
     const interval = setInterval(fetchRecentlySold, 120000);
     return () => clearInterval(interval);
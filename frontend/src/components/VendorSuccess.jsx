@@ -9,14 +9,20 @@ import { Store, DollarSign, Package, Quote, ArrowRight, BadgeCheck } from 'lucid
 
 const API_URL = process.env.REACT_APP_BACKEND_URL || '';
 
-const VendorSuccess = () => {
+const VendorSuccess = ({ bundled = false, initialVendors = null }) => {
   const { formatPrice } = useCurrency();
   const [vendors, setVendors] = useState([]);
   const [loading, setLoading] = useState(true);
 
+  // On the homepage the stories arrive with /homepage/bundle
   useEffect(() => {
-    fetchVendorSuccess();
-  }, []);
+    if (initialVendors) {
+      setVendors(initialVendors);
+      setLoading(false);
+    } else if (!bundled) {
+      fetchVendorSuccess();
+    }
+  }, [bundled, initialVendors]);
 
   const fetchVendorSuccess = async () => {
     try {
@@ -185,11 +185,11 @@ const CategoryLandingPage = () => {
         if (cat) {
           setCategoryId(cat.id);
           // Fetch products for this category
-          const productsRes = await api.get(`/products?category_id=${cat.id}&limit=12`);
+          const productsRes = await api.get(`/products?category_id=${cat.id}&limit=12&view=card`);
           setProducts(productsRes.data);
         } else {
           // Fallback: fetch all products
-          const productsRes = await api.get('/products?limit=12');
+          const productsRes = await api.get('/products?limit=12&view=card');
           setProducts(productsRes.data);
         }
       } catch (error) {
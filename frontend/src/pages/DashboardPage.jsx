@@ -15,7 +15,7 @@ const DashboardPage = () => {
     const fetchData = async () => {
       try {
         const [ordersRes, bookingsRes] = await Promise.all([
-          api.get('/orders'),
+          api.get('/orders?view=summary'),
           api.get('/bookings'),
         ]);
         setOrders(ordersRes.data.slice(0, 5));
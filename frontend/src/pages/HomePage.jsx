@@ -28,26 +28,25 @@ const HomePage = () => {
   const [spotlightVendor, setSpotlightVendor] = useState(null);
   const [productCategories, setProductCategories] = useState([]);
   const [serviceCategories, setServiceCategories] = useState([]);
+  const [recentlySold, setRecentlySold] = useState(null);
+  const [vendorSuccess, setVendorSuccess] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [statsRes, productsRes, vendorsRes, productCatsRes, serviceCatsRes] = await Promise.all([
-          api.get('/stats/platform'),
-          api.get('/products?limit=8'),
-          api.get('/vendors?limit=6'),
-          api.get('/categories?type=product'),
-          api.get('/categories?type=service'),
-        ]);
-        setStats(statsRes.data);
-        setFeaturedProducts(productsRes.data);
-        setFeaturedVendors(vendorsRes.data);
-        setProductCategories(productCatsRes.data);
-        setServiceCategories(serviceCatsRes.data.filter(c => c.name !== 'Services'));
+        // One request: the bundle is a precomputed snapshot served from server memory
+        const { data: bundle } = await api.get('/homepage/bundle');
+        setStats(bundle.platform_stats);
+        setRecentlySold(bundle.recently_sold);
+        setVendorSuccess(bundle.vendor_success);
+        setFeaturedProducts(bundle.featured_products);
+        setFeaturedVendors(bundle.featured_vendors);
+        setProductCategories(bundle.product_categories);
+        setServiceCategories(bundle.service_categories.filter(c => c.name !== 'Services'));
         
         // Find vendor with story for spotlight
-        const vendorWithStory = vendorsRes.data.find(v => v.story);
+        const vendorWithStory = bundle.featured_vendors.find(v => v.story);
         if (vendorWithStory) {
           setSpotlightVendor(vendorWithStory);
         }
@@ -280,7 +279,7 @@ const HomePage = () => {
       </section>
 
       {/* Recently Sold - Social Proof */}
-      <RecentlySold />
+      <RecentlySold bundled initialItems={recentlySold} />
 
       {/* Vendor Spotlight Section */}
       {spotlightVendor && (
@@ -480,7 +479,7 @@ const HomePage = () => {
       </section>
 
       {/* Vendor Success Stories - Social Proof */}
-      <VendorSuccess />
+      <VendorSuccess bundled initialVendors={vendorSuccess} />
 
       {/* CTA Section */}
       <section className="py-16 bg-gradient-to-r from-red-600 to-red-800 text-white">
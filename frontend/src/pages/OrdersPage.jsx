@@ -12,7 +12,7 @@ const OrdersPage = () => {
   useEffect(() => {
     const fetchOrders = async () => {
       try {
-        const response = await api.get('/orders');
+        const response = await api.get('/orders?view=summary');
         setOrders(response.data);
       } catch (error) {
         console.error('Error fetching orders:', error);
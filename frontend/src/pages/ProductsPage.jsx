@@ -61,6 +61,7 @@ const ProductsPage = () => {
         if (filters.maxPrice < 1000) params.append('max_price', filters.maxPrice);
         params.append('sort_by', filters.sortBy);
         params.append('limit', '50');
+        params.append('view', 'summary');
 
         const response = await api.get(`/products?${params.toString()}`);
         setProducts(response.data);
@@ -41,6 +41,7 @@ const ServicesPage = () => {
         if (filters.category) params.append('category_id', filters.category);
         if (filters.locationType) params.append('location_type', filters.locationType);
         params.append('limit', '50');
+        params.append('view', 'summary');
 
         const response = await api.get(`/services?${params.toString()}`);
         setServices(response.data);
@@ -23,8 +23,8 @@ const VendorStorePage = () => {
       try {
         const [vendorRes, productsRes, servicesRes] = await Promise.all([
           api.get(`/vendors/${id}`),
-          api.get(`/products?vendor_id=${id}`),
-          api.get(`/services?vendor_id=${id}`),
+          api.get(`/products?vendor_id=${id}&view=card`),
+          api.get(`/services?vendor_id=${id}&view=summary`),
         ]);
         setVendor(vendorRes.data);
         setProducts(productsRes.data);
@@ -21,6 +21,7 @@ const VendorsPage = () => {
       try {
         const params = new URLSearchParams();
         if (country && country !== 'all') params.append('country', country);
+        params.append('view', 'summary');
         const response = await api.get(`/vendors?${params.toString()}`);
         setVendors(response.data);
         